@@ -2,6 +2,10 @@ import logging
 import config
 from log_config import setup_logging
 from rag.vector_store import VectorStore
+from rag.lexical_index import LexicalIndex
+from rag.query_embedding_cache import QueryEmbeddingCache
+from rag.sql_filters import SqlFilterBackend
+from data.database import EventDatabase
 from rag.rag_engine import RagEngine
 from rag.query_intent import diagnose_missing
 from llm.llm_client import LLMClient
@@ -94,6 +98,16 @@ def create_profile():
     return profile
 
 
+def print_response(response, fallback=""):
+    """Print the LLM text chunk by chunk as it streams in."""
+    if response is None:
+        print(fallback)
+        return
+    for chunk in response:
+        print(chunk, end="", flush=True)
+    print()
+
+
 def main():
     setup_logging()
 
@@ -101,7 +115,8 @@ def main():
     print("  CulturAI — Ton conseiller culturel")
     print("=" * 50)
 
-    vector_store = VectorStore(embedding_model="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    vector_store = VectorStore(embedding_model="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+                               query_cache=QueryEmbeddingCache(spill_path="db/cache.db"))
 
     if vector_store.load():
         print(f"Base chargee : {vector_store.count()} evenements indexes.")
@@ -126,16 +141,21 @@ def main():
     log.info("Requete utilisateur : %s", user_query)
     print("\nAnalyse de ta recherche...")
 
-    llm_client = LLMClient(config.OPENAI_API_KEY)
-    rag_engine = RagEngine(vector_store, llm_client, api_key=config.OPENAI_API_KEY)
+    llm_client = LLMClient(config.OPENAI_API_KEY, prompt_budget=config.PROMPT_TOKEN_BUDGET)
+    filter_backend = SqlFilterBackend(EventDatabase()) if config.FILTER_BACKEND == "sql" else None
+    lexical_index = LexicalIndex.load(vector_store.persist_dir)
+    if lexical_index is None:
+        log.info("Index lexical absent -> recherche FAISS seule (relance python ingest.py)")
+    rag_engine = RagEngine(vector_store, llm_client, api_key=config.OPENAI_API_KEY,
+                           filter_backend=filter_backend, lexical_index=lexical_index)
 
     # PASS 1: query-only
-    response, is_good, intent = rag_engine.generate_response(user_query, profile=profile)
+    response, is_good, intent = rag_engine.generate_response(user_query, profile=profile, stream=True)
 
     if response and is_good:
         # Good results — display directly
         log.info("Passe 1 suffisante -> affichage direct")
-        print(response)
+        print_response(response)
         return
 
     if response:
@@ -159,21 +179,22 @@ def main():
                 log.info("Precision utilisateur : %s", refinement)
                 print("\nNouvelle recherche...")
                 response2 = rag_engine.generate_refined_response(
-                    user_query, refinement, profile=profile)
-                print(response2 or "Toujours rien... essaie autre chose !")
+                    user_query, refinement, profile=profile, stream=True)
+                print_response(response2, "Toujours rien... essaie autre chose !")
             return
 
         if choice == "e" and profile:
             log.info("Enrichissement avec profil demande")
             print("\nRecherche enrichie avec ton profil...")
             response2 = rag_engine.generate_enriched_response(
-                user_query, profile, intent)
-            print(response2 or "Rien de mieux avec le profil.")
+                user_query, profile, intent, stream=True)
+            print_response(response2, "Rien de mieux avec le profil.")
             return
 
         # [v] or other — show mediocre results
         log.info("Affichage des resultats mediocres")
-        print(f"\n{response}")
+        print()
+        print_response(response)
     else:
         # No results at all
         log.info("Passe 1 : aucun resultat")
@@ -187,8 +208,8 @@ def main():
             if enrich == "o":
                 log.info("Enrichissement avec profil demande (depuis 0 resultats)")
                 response2 = rag_engine.generate_enriched_response(
-                    user_query, profile, intent)
-                print(response2 or "Rien non plus avec le profil.")
+                    user_query, profile, intent, stream=True)
+                print_response(response2, "Rien non plus avec le profil.")
 
 
 if __name__ == "__main__":
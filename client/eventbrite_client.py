@@ -1,8 +1,14 @@
+import logging
 import requests
-from data.event import Event
+from client.http import ApiSession
+from data.event import Event, parse_event_time
 from datetime import datetime, timezone, timedelta
 
+log = logging.getLogger("culturai.eventbrite")
+
+
 class EventbriteClient:
+    SOURCE = "eventbrite"
     BASE_URL = "https://www.eventbriteapi.com/v3/"
     AUTH_ENDPOINT= "/users/me/"
     SEARCH_ENDPOINT = "events/search/"
@@ -13,58 +19,92 @@ class EventbriteClient:
     DEFAULT_DAYS_START = 0
     DEFAULT_DAYS_END = 30
     DEFAULT_MAX_PAGES = 3
+    # Venue (name, city, coordinates) and prices come inline with each event
+    EXPAND = "venue,ticket_availability"
 
     ERROR_FETCH = "Error while retrieving events: "
     ERROR_EVENT_PARSE = "Error while parsing event: "
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, timeout=ApiSession.DEFAULT_TIMEOUT):
         self.api_key = api_key
         self.headers = {
             self.AUTH_HEADER: f"Bearer {self.api_key}",
             self.CONTENT_TYPE_HEADER: self.CONTENT_TYPE
         }
+        self.http = ApiSession(headers=self.headers, timeout=timeout)
 
     def fetch_events(self, query, location, start_days=DEFAULT_DAYS_START, end_days=DEFAULT_DAYS_END, max_pages=DEFAULT_MAX_PAGES):
+        events = []
+        for page in self.iter_pages(query, location, start_days, end_days, max_pages):
+            events.extend(page)
+        return events
+
+    def iter_pages(self, query, location, start_days=DEFAULT_DAYS_START, end_days=DEFAULT_DAYS_END,
+                   max_pages=DEFAULT_MAX_PAGES):
+        """Yield the parsed events of each page (max_pages=None: no limit); the
+        generator returns True when the search was read to its end (no failed
+        page, not cut at max_pages)."""
         url = f"{self.BASE_URL}{self.SEARCH_ENDPOINT}"
 
         now = datetime.now(timezone.utc)
         range_start = (now + timedelta(days=start_days)).isoformat() + self.DATE_FORMAT_SUFFIX
         range_end = (now + timedelta(days=end_days)).isoformat() + self.DATE_FORMAT_SUFFIX
 
-        events = []
         page = 1
 
-        while page <= max_pages:
+        while max_pages is None or page <= max_pages:
             params = {
                 "q": query,
                 "location.address": location,
                 "start_date.range_start": range_start,
                 "start_date.range_end": range_end,
+                "expand": self.EXPAND,
                 "page": page
             }
 
-            response = requests.get(url, headers=self.headers, params=params)
+            try:
+                response = self.http.get(url, params=params)
+            except requests.RequestException as e:
+                log.error("%s%s (page %d)", self.ERROR_FETCH, e, page)
+                return False
 
             if response.status_code != 200:
-                print(self.ERROR_FETCH + str(response.status_code))
-                break
+                log.error("%s%s (page %d)", self.ERROR_FETCH, response.status_code, page)
+                return False
 
             data = response.json()
+            events = []
             for event in data.get("events", []):
                 try:
-                    events.append(Event(
-                        id=event["id"],
-                        name=event["name"]["text"],
-                        description=event["description"]["text"] if event.get("description") else "",
-                        date=event["start"]["local"],
-                        url=event["url"]
-                    ))
+                    events.append(self._parse_event(event))
                 except Exception as ex:
-                    print(self.ERROR_EVENT_PARSE + str(ex))
+                    log.warning("%s%s", self.ERROR_EVENT_PARSE, ex)
+            yield events
 
             if not data.get("pagination", {}).get("has_more_items", False):
-                break
+                return True
 
             page += 1
 
-        return events
+        return False
+
+    def _parse_event(self, event):
+        venue = event.get("venue") or {}
+        address = venue.get("address") or {}
+        price = 0
+        if not event.get("is_free"):
+            minimum = (event.get("ticket_availability") or {}).get("minimum_ticket_price") or {}
+            price = float(minimum.get("major_value", 0) or 0)
+        return Event(
+            id=event["id"],
+            name=event["name"]["text"],
+            description=event["description"]["text"] if event.get("description") else "",
+            date=event["start"]["local"],
+            url=event["url"],
+            venue=venue.get("name", "") or "",
+            city=address.get("city", "") or "",
+            price=price,
+            latitude=float(address.get("latitude", 0) or 0),
+            longitude=float(address.get("longitude", 0) or 0),
+            end_timestamp=parse_event_time((event.get("end") or {}).get("local", "")),
+        )
@@ -0,0 +1,93 @@
+import random
+import time
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger("culturai.http")
+
+
+class ApiSession:
+    """Pooled HTTP session shared by the API clients.
+
+    Keeps connections alive (one TLS handshake per host and pooled
+    connection), asks for gzip, applies (connect, read) timeouts and retries
+    transient failures (connection errors, timeouts, 429, 5xx) with
+    exponential backoff and full jitter. 429 responses honour Retry-After.
+    """
+
+    DEFAULT_TIMEOUT = (5, 30)   # seconds: connect, read
+    MAX_RETRIES = 3
+    BACKOFF_BASE = 0.5          # seconds, doubled at each attempt
+    BACKOFF_MAX = 30
+    POOL_SIZE = 16
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, headers=None, timeout=DEFAULT_TIMEOUT, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, rate_limiter=None, pool_size=POOL_SIZE):
+        """rate_limiter: optional shared TokenBucket, acquired before every attempt."""
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.rate_limiter = rate_limiter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        if headers:
+            self.session.headers.update(headers)
+        self.requests = 0
+        self.retries = 0
+
+    def get(self, url, params=None):
+        """GET with retries. Returns the last response, or raises the last
+        connection error once retries are exhausted."""
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    log.error("GET %s echoue apres %d essais : %s", url, attempt + 1, e)
+                    raise
+                self._wait(attempt, None, f"{type(e).__name__}", url)
+                continue
+            finally:
+                self.requests += 1
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            log.debug("GET %s -> %d en %.0f ms (essai %d)", url, response.status_code, elapsed_ms, attempt + 1,
+                      extra={"json_data": {"url": url, "status": response.status_code,
+                                           "latency_ms": round(elapsed_ms, 1), "attempt": attempt + 1}})
+            if response.status_code not in self.RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            retry_after = response.headers.get("Retry-After") if response.status_code == 429 else None
+            self._wait(attempt, retry_after, str(response.status_code), url)
+        return response
+
+    def _wait(self, attempt, retry_after, reason, url):
+        delay = _retry_after(retry_after)
+        if delay is None:
+            delay = random.uniform(0, min(self.BACKOFF_MAX, self.backoff_base * 2 ** attempt))
+        self.retries += 1
+        log.warning("GET %s : %s, nouvel essai %d/%d dans %.2fs",
+                    url, reason, attempt + 1, self.max_retries, delay)
+        if self.rate_limiter is not None and retry_after is not None:
+            # Server-side throttling: hold every thread sharing the limiter
+            self.rate_limiter.pause(delay)
+        else:
+            time.sleep(delay)
+
+    def close(self):
+        self.session.close()
+
+
+def _retry_after(value):
+    """Retry-After header in seconds (delta-seconds form), or None."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
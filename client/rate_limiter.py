@@ -0,0 +1,47 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket: at most `rate` requests per second on
+    average, with bursts of up to `capacity` requests.
+
+    pause() empties the bucket for a while (e.g. on a 429 Retry-After), so
+    that every thread sharing the limiter backs off, not only the one that
+    got the error.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError(f"rate doit etre positif (recu {rate})")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._blocked_until:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    wait = self._blocked_until - now
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold every caller for `seconds`, then restart from an empty bucket."""
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._blocked_until:
+                self._blocked_until = until
+                self._tokens = 0.0
+                self._updated = until
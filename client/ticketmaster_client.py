@@ -1,28 +1,77 @@
 import time
+import logging
 import requests
-from data.event import Event
+from client.http import ApiSession
+from data.event import Event, parse_event_time
 
+log = logging.getLogger("culturai.ticketmaster")
 
 class TicketmasterClient:
+    SOURCE = "ticketmaster"
     BASE_URL = "https://app.ticketmaster.com/discovery/v2/"
     SEARCH_ENDPOINT = "events.json"
     DEFAULT_PAGE_SIZE = 200
     MAX_PAGE = 5
     LOCALE = "*"
     REQUEST_DELAY = 0.25
+    # The Discovery API has no "updated since" filter on event search: new
+    # listings are picked up through their on-sale start date instead (edits
+    # and removals are not: see ingest.MAX_INCREMENTAL_RUNS).
+    DELTA_PARAM = "onsaleStartDateTime"
+    API_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 
     ERROR_FETCH = "Erreur lors de la recuperation des evenements : "
     ERROR_EVENT_PARSE = "Erreur lors du parsing d'un evenement : "
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, base_url=BASE_URL, rate_limiter=None, timeout=ApiSession.DEFAULT_TIMEOUT):
+        """rate_limiter: optional shared TokenBucket; replaces the fixed delay between pages."""
         self.api_key = api_key
+        self.base_url = base_url
+        self.rate_limiter = rate_limiter
+        self.http = ApiSession(timeout=timeout, rate_limiter=rate_limiter)
 
     def fetch_events(self, country_code="FR", classification_name=None,
-                     keyword=None, genre_id=None, page_size=DEFAULT_PAGE_SIZE):
-        url = f"{self.BASE_URL}{self.SEARCH_ENDPOINT}"
+                     keyword=None, genre_id=None, page_size=DEFAULT_PAGE_SIZE, since=None):
+        return self.fetch(country_code, classification_name, keyword, genre_id,
+                          page_size=page_size, since=since)[0]
 
+    def reachable(self, page_size=DEFAULT_PAGE_SIZE):
+        """Most events a single query can page through."""
+        return page_size * (self.MAX_PAGE + 1)
+
+    def fetch(self, *args, **kwargs):
+        """Like fetch_events, returns (events, complete, total_elements).
+
+        Takes the arguments of iter_pages.
+        """
         events = []
-        page = 0
+        pages = self.iter_pages(*args, **kwargs)
+        while True:
+            try:
+                events.extend(next(pages))
+            except StopIteration as stop:
+                complete, total_elements = stop.value
+                return events, complete, total_elements
+
+    def iter_pages(self, country_code="FR", classification_name=None, keyword=None, genre_id=None,
+                   segment_id=None, page_size=DEFAULT_PAGE_SIZE, since=None, start=None, end=None,
+                   probe=False, start_page=0, raw=False):
+        """Yield the parsed events of each page as it arrives; the generator
+        returns (complete, total_elements).
+
+        since: optional datetime (UTC); only events put on sale after it.
+        start/end: optional datetimes (UTC) bounding the event start date.
+        probe: stop after the first page when the query matches more events
+        than reachable(), so that the caller can split the date range.
+        start_page: resume paging from this page.
+        raw: yield (events, response payload) instead, e.g. to archive it.
+        complete is False when a page failed or MAX_PAGE cut the results.
+        """
+        url = f"{self.base_url}{self.SEARCH_ENDPOINT}"
+
+        page = start_page
+        complete = False
+        total_elements = 0
 
         while page <= self.MAX_PAGE:
             params = {
@@ -38,32 +87,57 @@ class TicketmasterClient:
                 params["keyword"] = keyword
             if genre_id:
                 params["genreId"] = genre_id
-
-            response = requests.get(url, params=params)
+            if segment_id:
+                params["segmentId"] = segment_id
+            if since:
+                params[self.DELTA_PARAM] = since.strftime(self.API_TIME_FORMAT)
+            if start:
+                params["startDateTime"] = start.strftime(self.API_TIME_FORMAT)
+            if end:
+                params["endDateTime"] = end.strftime(self.API_TIME_FORMAT)
+
+            try:
+                response = self.http.get(url, params=params)
+            except requests.RequestException as e:
+                log.error("%s%s (page %d)", self.ERROR_FETCH, e, page)
+                break
 
             if response.status_code != 200:
-                print(f"{self.ERROR_FETCH}{response.status_code} (page {page})")
+                log.error("%s%s (page %d)", self.ERROR_FETCH, response.status_code, page)
                 break
 
             data = response.json()
             embedded = data.get("_embedded")
             if not embedded:
+                complete = True
                 break
 
-            for event in embedded.get("events", []):
-                try:
-                    events.append(self._parse_event(event))
-                except Exception as ex:
-                    print(self.ERROR_EVENT_PARSE + str(ex))
+            events = self.parse_page(data)
+            yield (events, data) if raw else events
 
             page_info = data.get("page", {})
             total_pages = page_info.get("totalPages", 1)
+            total_elements = page_info.get("totalElements", total_elements)
             page += 1
             if page >= total_pages:
+                complete = True
                 break
+            if probe and total_elements > self.reachable(page_size):
+                break
+
+            if self.rate_limiter is None:
+                time.sleep(self.REQUEST_DELAY)
 
-            time.sleep(self.REQUEST_DELAY)
+        return complete, total_elements
 
+    def parse_page(self, data):
+        """Events of one decoded search response (live or archived)."""
+        events = []
+        for event in (data.get("_embedded") or {}).get("events", []):
+            try:
+                events.append(self._parse_event(event))
+            except Exception as ex:
+                log.warning("%s%s", self.ERROR_EVENT_PARSE, ex)
         return events
 
     def _parse_event(self, event):
@@ -98,6 +172,9 @@ class TicketmasterClient:
         local_time = start.get("localTime", "")
         if local_time:
             date = f"{date} {local_time}"
+        # Given for runs over several days (exhibitions, festivals)
+        end = dates.get("end", {})
+        end_date = " ".join(part for part in (end.get("localDate", ""), end.get("localTime", "")) if part)
 
         description = event.get("description", "") or event.get("info", "")
         if not description:
@@ -127,4 +204,5 @@ class TicketmasterClient:
             price=price,
             latitude=latitude,
             longitude=longitude,
+            end_timestamp=parse_event_time(end_date),
         )
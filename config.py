@@ -5,3 +5,10 @@ load_dotenv()
 
 TICKETMASTER_API_KEY = os.getenv("TICKETMASTER_CONSUMER_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+EVENTBRITE_API_KEY = os.getenv("EVENTBRITE_PRIVATE_TOKEN")
+
+# "memory": filters on the in-memory event columns; "sql": pushed down to db/events.db
+FILTER_BACKEND = os.getenv("CULTURAI_FILTER_BACKEND", "memory")
+
+# Token budget of the recommendation prompt: events are packed in rank order until it is reached
+PROMPT_TOKEN_BUDGET = int(os.getenv("CULTURAI_PROMPT_TOKENS", "2000"))
@@ -1,7 +1,39 @@
 import os
+import queue
 import sqlite3
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from data.event import Event
+from data.event import Event, parse_event_time
+
+# Applied to every connection
+CONNECTION_PRAGMAS = (
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",        # 64 MB
+    "PRAGMA mmap_size=268435456",      # 256 MB
+    "PRAGMA busy_timeout=5000",
+)
+# Writer only. WAL lets readers run while an ingest writes; with WAL,
+# synchronous=NORMAL only risks the last transactions on power loss.
+WRITER_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+)
+FETCH_BATCH = 1000
+
+
+def _row_to_event(r):
+    return Event(id=r[0], name=r[1], description=r[2], date=r[3],
+                 url=r[4], venue=r[5], city=r[6], genre=r[7],
+                 price=r[8] or 0, latitude=r[9] or 0, longitude=r[10] or 0,
+                 timestamp=r[11] or 0, end_timestamp=r[12] or 0)
+
+
+def _iter_rows(cursor, batch=FETCH_BATCH):
+    while True:
+        rows = cursor.fetchmany(batch)
+        if not rows:
+            return
+        yield from rows
 
 
 class EventDatabase:
@@ -20,8 +52,61 @@ class EventDatabase:
             price REAL DEFAULT 0,
             latitude REAL DEFAULT 0,
             longitude REAL DEFAULT 0,
+            timestamp INTEGER DEFAULT 0,
+            end_timestamp INTEGER DEFAULT 0,
             classification TEXT DEFAULT '',
-            fetched_at TEXT NOT NULL
+            fetched_at TEXT NOT NULL,
+            stale INTEGER DEFAULT 0
+        )
+    """
+
+    CREATE_EMBEDDINGS = """
+        CREATE TABLE IF NOT EXISTS embeddings (
+            event_id TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            vector BLOB NOT NULL
+        )
+    """
+
+    CREATE_META = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """
+
+    CREATE_SYNC_STATE = """
+        CREATE TABLE IF NOT EXISTS sync_state (
+            query_key TEXT PRIMARY KEY,
+            last_sync TEXT NOT NULL,
+            last_full_sync TEXT
+        )
+    """
+
+    CREATE_CHECKPOINTS = """
+        CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+            task_key TEXT PRIMARY KEY,
+            segment TEXT NOT NULL,
+            label TEXT NOT NULL,
+            params TEXT NOT NULL,
+            window_start TEXT,
+            window_end TEXT,
+            since TEXT,
+            probe INTEGER NOT NULL,
+            next_page INTEGER NOT NULL,
+            status TEXT NOT NULL
+        )
+    """
+
+    # Listings behind each canonical event (one per source that returned it)
+    CREATE_SOURCES = """
+        CREATE TABLE IF NOT EXISTS event_sources (
+            source TEXT NOT NULL,
+            source_id TEXT NOT NULL,
+            event_id TEXT NOT NULL,
+            url TEXT DEFAULT '',
+            fetched_at TEXT NOT NULL,
+            PRIMARY KEY (source, source_id)
         )
     """
 
@@ -29,62 +114,302 @@ class EventDatabase:
         "ALTER TABLE events ADD COLUMN price REAL DEFAULT 0",
         "ALTER TABLE events ADD COLUMN latitude REAL DEFAULT 0",
         "ALTER TABLE events ADD COLUMN longitude REAL DEFAULT 0",
+        "ALTER TABLE events ADD COLUMN timestamp INTEGER DEFAULT 0",
+        "ALTER TABLE events ADD COLUMN stale INTEGER DEFAULT 0",
+        "ALTER TABLE events ADD COLUMN end_timestamp INTEGER DEFAULT 0",
     ]
 
     UPSERT = """
-        INSERT INTO events (id, name, description, date, url, venue, city, genre, price, latitude, longitude, classification, fetched_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO events (id, name, description, date, url, venue, city, genre, price, latitude, longitude, timestamp, end_timestamp, classification, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            name=excluded.name, description=excluded.description,
+            date=excluded.date, url=excluded.url, venue=excluded.venue,
+            city=excluded.city, genre=excluded.genre,
+            price=excluded.price, latitude=excluded.latitude, longitude=excluded.longitude,
+            timestamp=excluded.timestamp, end_timestamp=excluded.end_timestamp,
+            classification=excluded.classification, fetched_at=excluded.fetched_at,
+            stale=0
+    """
+
+    # Archived responses (ingest --replay): the stale flag is kept, and a
+    # snapshot older than the stored row does not overwrite it
+    UPSERT_SNAPSHOT = """
+        INSERT INTO events (id, name, description, date, url, venue, city, genre, price, latitude, longitude, timestamp, end_timestamp, classification, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ON CONFLICT(id) DO UPDATE SET
             name=excluded.name, description=excluded.description,
             date=excluded.date, url=excluded.url, venue=excluded.venue,
             city=excluded.city, genre=excluded.genre,
             price=excluded.price, latitude=excluded.latitude, longitude=excluded.longitude,
+            timestamp=excluded.timestamp, end_timestamp=excluded.end_timestamp,
             classification=excluded.classification, fetched_at=excluded.fetched_at
+        WHERE excluded.fetched_at >= events.fetched_at
     """
 
-    SELECT_ALL = "SELECT id, name, description, date, url, venue, city, genre, price, latitude, longitude FROM events"
+    CREATE_INDEXES = [
+        "CREATE INDEX IF NOT EXISTS idx_events_city ON events(city)",
+        "CREATE INDEX IF NOT EXISTS idx_events_genre ON events(genre)",
+        "CREATE INDEX IF NOT EXISTS idx_events_classification ON events(classification)",
+        "CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_events_end_timestamp ON events(end_timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_events_fetched_at ON events(fetched_at)",
+        "CREATE INDEX IF NOT EXISTS idx_event_sources_event ON event_sources(event_id)",
+    ]
+
+    # Bounding-box index over located events (rowid -> point), kept in sync by triggers
+    CREATE_GEO = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS events_geo USING rtree(id, min_lat, max_lat, min_lon, max_lon)",
+        """CREATE TRIGGER IF NOT EXISTS events_geo_insert AFTER INSERT ON events
+           WHEN NEW.latitude != 0 AND NEW.longitude != 0 BEGIN
+               INSERT OR REPLACE INTO events_geo
+               VALUES (NEW.rowid, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS events_geo_update AFTER UPDATE OF latitude, longitude ON events BEGIN
+               DELETE FROM events_geo WHERE id = OLD.rowid;
+               INSERT INTO events_geo SELECT NEW.rowid, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+               WHERE NEW.latitude != 0 AND NEW.longitude != 0;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS events_geo_delete AFTER DELETE ON events BEGIN
+               DELETE FROM events_geo WHERE id = OLD.rowid;
+           END""",
+    ]
+
+    UPSERT_BATCH = 1000
+
+    SELECT_ALL = "SELECT id, name, description, date, url, venue, city, genre, price, latitude, longitude, timestamp, end_timestamp FROM events"
+    WHERE_CURRENT = " WHERE stale = 0"
+    MAX_SQL_PARAMS = 900  # below SQLite's default limit of 999 host parameters
 
     def __init__(self, db_path=DEFAULT_PATH):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         self.conn = sqlite3.connect(db_path)
+        for pragma in WRITER_PRAGMAS + CONNECTION_PRAGMAS:
+            self.conn.execute(pragma)
         self.conn.execute(self.CREATE_TABLE)
+        self.conn.execute(self.CREATE_EMBEDDINGS)
+        self.conn.execute(self.CREATE_META)
+        self.conn.execute(self.CREATE_SYNC_STATE)
+        self.conn.execute(self.CREATE_CHECKPOINTS)
         self.conn.commit()
         self._migrate()
+        self._create_sources()
+        for stmt in self.CREATE_INDEXES:
+            self.conn.execute(stmt)
+        self._create_geo_index()
+        self.conn.commit()
+        self._readers = None
+
+    def _create_sources(self):
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'event_sources'").fetchone()
+        self.conn.execute(self.CREATE_SOURCES)
+        if not exists:
+            # Databases created before multi-source ingestion only hold Ticketmaster events
+            self.conn.execute(
+                "INSERT INTO event_sources (source, source_id, event_id, url, fetched_at) "
+                "SELECT 'ticketmaster', id, id, url, fetched_at FROM events")
+
+    def _create_geo_index(self):
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'events_geo'").fetchone()
+        for stmt in self.CREATE_GEO:
+            self.conn.execute(stmt)
+        if not exists:
+            # Databases created before the R*Tree: index the located events once
+            self.conn.execute(
+                "INSERT INTO events_geo SELECT rowid, latitude, latitude, longitude, longitude "
+                "FROM events WHERE latitude != 0 AND longitude != 0")
 
     def _migrate(self):
-        """Add columns that may be missing from older databases."""
+        """Add columns that may be missing from older databases, and fill their timestamps."""
         existing = {row[1] for row in self.conn.execute("PRAGMA table_info(events)").fetchall()}
         for stmt in self.MIGRATE_COLUMNS:
             col = stmt.split("ADD COLUMN ")[1].split()[0]
             if col not in existing:
                 self.conn.execute(stmt)
+        # Rows stored before the timestamp column: parsed like at ingest
+        # (Europe/Paris local time) so date filters do not treat them as undated
+        undated = self.conn.execute(
+            "SELECT rowid, date FROM events WHERE timestamp = 0 AND date != ''").fetchall()
+        backfill = [(ts, rowid) for rowid, ts in ((r, parse_event_time(d)) for r, d in undated) if ts]
+        self.conn.executemany("UPDATE events SET timestamp = ? WHERE rowid = ?", backfill)
+        self.conn.commit()
+
+    @contextmanager
+    def transaction(self):
+        """One explicit write transaction (BEGIN IMMEDIATE ... COMMIT, rolled back on error)."""
+        if self.conn.in_transaction:
+            self.conn.commit()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.rollback()
+            raise
         self.conn.commit()
 
-    def upsert_events(self, events, classification=""):
-        now = datetime.now(timezone.utc).isoformat()
+    def readers(self, size=None):
+        """Pool of read-only connections, for lookups running alongside an ingest."""
+        if self._readers is None:
+            self._readers = ReadOnlyPool(self.db_path, size or ReadOnlyPool.DEFAULT_SIZE)
+        return self._readers
+
+    def upsert_events(self, events, classification="", fetched_at=None):
+        """fetched_at: ISO time the events were fetched at, for archived
+        responses; their rows keep their stale flag (see UPSERT_SNAPSHOT)."""
+        statement = self.UPSERT if fetched_at is None else self.UPSERT_SNAPSHOT
+        fetched_at = fetched_at or datetime.now(timezone.utc).isoformat()
         rows = [
             (e.id, e.name, e.description, e.date, e.url, e.venue, e.city, e.genre,
-             e.price, e.latitude, e.longitude, classification, now)
+             e.price, e.latitude, e.longitude, e.timestamp, e.end_timestamp, classification, fetched_at)
             for e in events
         ]
-        self.conn.executemany(self.UPSERT, rows)
-        self.conn.commit()
+        with self.transaction():
+            for i in range(0, len(rows), self.UPSERT_BATCH):
+                self.conn.executemany(statement, rows[i:i + self.UPSERT_BATCH])
+
+    def iter_events(self, classification=None):
+        """Stream current (non-stale) events, optionally of one classification."""
+        if classification is None:
+            cursor = self.conn.execute(self.SELECT_ALL + self.WHERE_CURRENT)
+        else:
+            cursor = self.conn.execute(
+                self.SELECT_ALL + self.WHERE_CURRENT + " AND classification = ?", (classification,))
+        return map(_row_to_event, _iter_rows(cursor))
 
     def get_all_events(self):
-        cursor = self.conn.execute(self.SELECT_ALL)
-        return [Event(id=r[0], name=r[1], description=r[2], date=r[3],
-                      url=r[4], venue=r[5], city=r[6], genre=r[7],
-                      price=r[8] or 0, latitude=r[9] or 0, longitude=r[10] or 0)
-                for r in cursor.fetchall()]
+        """Events still listed by the source (stale ones are left out)."""
+        return list(self.iter_events())
 
     def get_events_by_classification(self, classification):
-        cursor = self.conn.execute(
-            self.SELECT_ALL + " WHERE classification = ?", (classification,))
-        return [Event(id=r[0], name=r[1], description=r[2], date=r[3],
-                      url=r[4], venue=r[5], city=r[6], genre=r[7],
-                      price=r[8] or 0, latitude=r[9] or 0, longitude=r[10] or 0)
-                for r in cursor.fetchall()]
+        return list(self.iter_events(classification))
+
+    def get_embeddings(self, event_ids=None):
+        """Cached embeddings as {event_id: (content_hash, vector_bytes)}, all or for event_ids."""
+        if event_ids is None:
+            cursor = self.conn.execute("SELECT event_id, content_hash, vector FROM embeddings")
+            return {r[0]: (r[1], r[2]) for r in cursor.fetchall()}
+        event_ids = list(event_ids)
+        found = {}
+        for i in range(0, len(event_ids), self.MAX_SQL_PARAMS):
+            chunk = event_ids[i:i + self.MAX_SQL_PARAMS]
+            cursor = self.conn.execute(
+                "SELECT event_id, content_hash, vector FROM embeddings WHERE event_id IN "
+                f"({','.join('?' * len(chunk))})", chunk)
+            found.update({r[0]: (r[1], r[2]) for r in cursor.fetchall()})
+        return found
+
+    def get_embedding_hashes(self, event_ids):
+        """{event_id: content_hash} of the cached embeddings among event_ids."""
+        event_ids = list(event_ids)
+        found = {}
+        for i in range(0, len(event_ids), self.MAX_SQL_PARAMS):
+            chunk = event_ids[i:i + self.MAX_SQL_PARAMS]
+            found.update(self.conn.execute(
+                "SELECT event_id, content_hash FROM embeddings WHERE event_id IN "
+                f"({','.join('?' * len(chunk))})", chunk).fetchall())
+        return found
+
+    def save_embeddings(self, rows):
+        """rows: iterable of (event_id, content_hash, vector_bytes)."""
+        with self.transaction():
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (event_id, content_hash, vector) VALUES (?, ?, ?)", rows)
+
+    def count_embeddings(self):
+        return self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+        self.conn.commit()
+
+    def get_last_sync(self, query_key):
+        """ISO time of the last successful sync of a query, or None."""
+        row = self.conn.execute("SELECT last_sync FROM sync_state WHERE query_key = ?", (query_key,)).fetchone()
+        return row[0] if row else None
+
+    def set_last_sync(self, query_key, synced_at, full=False):
+        self.conn.execute(
+            "INSERT INTO sync_state (query_key, last_sync, last_full_sync) VALUES (?, ?, ?) "
+            "ON CONFLICT(query_key) DO UPDATE SET last_sync = excluded.last_sync, "
+            "last_full_sync = COALESCE(excluded.last_full_sync, last_full_sync)",
+            (query_key, synced_at, synced_at if full else None))
+        self.conn.commit()
+
+    def link_sources(self, links, fetched_at=None):
+        """links: iterable of (source, source_id, event_id, url), seen at
+        fetched_at (ISO time, default now). An older sighting does not
+        replace a newer one."""
+        fetched_at = fetched_at or datetime.now(timezone.utc).isoformat()
+        with self.transaction():
+            self.conn.executemany(
+                "INSERT INTO event_sources (source, source_id, event_id, url, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT(source, source_id) DO UPDATE SET "
+                "event_id=excluded.event_id, url=excluded.url, fetched_at=excluded.fetched_at "
+                "WHERE excluded.fetched_at >= event_sources.fetched_at",
+                [(*link, fetched_at) for link in links])
+
+    def iter_source_links(self):
+        """Stream (source, source_id, event_id) of every listing."""
+        return _iter_rows(self.conn.execute("SELECT source, source_id, event_id FROM event_sources"))
+
+    def get_sources(self, event_id):
+        """[(source, source_id, url)] of the listings merged into an event."""
+        return self.conn.execute(
+            "SELECT source, source_id, url FROM event_sources WHERE event_id = ? ORDER BY source",
+            (event_id,)).fetchall()
+
+    def count_by_source(self):
+        return self.conn.execute(
+            "SELECT source, COUNT(*) FROM event_sources GROUP BY source ORDER BY COUNT(*) DESC").fetchall()
+
+    def mark_stale(self, fetched_before, sources=None):
+        """Flag events not seen since fetched_before (ISO time). Returns the number flagged.
+
+        sources: the sources fully fetched since then. An event stays current
+        while one of its listings was seen since fetched_before or comes
+        from another source.
+        """
+        listed = "s.fetched_at >= ?"
+        params = [fetched_before, fetched_before]
+        if sources is not None:
+            listed += f" OR s.source NOT IN ({','.join('?' * len(sources))})"
+            params += list(sources)
+        with self.transaction():
+            cursor = self.conn.execute(
+                "UPDATE events SET stale = 1 WHERE stale = 0 AND fetched_at < ? AND NOT EXISTS ("
+                f"SELECT 1 FROM event_sources s WHERE s.event_id = events.id AND ({listed}))", params)
+        return cursor.rowcount
+
+    def save_checkpoints(self, rows):
+        """rows: iterable of (task_key, segment, label, params, window_start, window_end,
+        since, probe, next_page, status)."""
+        with self.transaction():
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO ingest_checkpoints (task_key, segment, label, params, window_start, "
+                "window_end, since, probe, next_page, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def get_checkpoints(self):
+        return self.conn.execute(
+            "SELECT task_key, segment, label, params, window_start, window_end, since, probe, next_page, status "
+            "FROM ingest_checkpoints").fetchall()
+
+    def clear_checkpoints(self):
+        self.conn.execute("DELETE FROM ingest_checkpoints")
+        self.conn.commit()
+
+    def get_events_fetched_since(self, fetched_at):
+        cursor = self.conn.execute(self.SELECT_ALL + self.WHERE_CURRENT + " AND fetched_at >= ?", (fetched_at,))
+        return list(map(_row_to_event, _iter_rows(cursor)))
+
+    def count_stale(self):
+        return self.conn.execute("SELECT COUNT(*) FROM events WHERE stale = 1").fetchone()[0]
 
     def count(self):
         return self.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
@@ -102,4 +427,46 @@ class EventDatabase:
         return {"genres": genres, "cities": cities, "classifications": classifications}
 
     def close(self):
+        if self._readers is not None:
+            self._readers.close()
         self.conn.close()
+
+
+class ReadOnlyPool:
+    """Fixed-size pool of read-only connections to one database.
+
+    With WAL, each reader sees the last committed state and never blocks
+    (nor is blocked by) the writer connection of an ingest.
+    """
+
+    DEFAULT_SIZE = 4
+
+    def __init__(self, db_path, size=DEFAULT_SIZE):
+        self.db_path = db_path
+        self._idle = queue.Queue()
+        self._all = []
+        for _ in range(size):
+            conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True,
+                                   check_same_thread=False)
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            conn.execute("PRAGMA query_only=ON")
+            self._all.append(conn)
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def query(self, sql, params=()):
+        """Run a read query on a pooled connection; returns the rows."""
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def close(self):
+        for conn in self._all:
+            conn.close()
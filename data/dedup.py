@@ -0,0 +1,195 @@
+import re
+import unicodedata
+import logging
+from dataclasses import replace
+from datetime import datetime
+from geo.distance import haversine
+from data.event import EVENT_TZ
+
+log = logging.getLogger("culturai.dedup")
+
+# Highest priority first: a listing from an earlier source supplies the
+# canonical event's fields, later ones only add a source link.
+SOURCE_PRIORITY = ("ticketmaster", "eventbrite")
+# Ticketmaster ids predate multi-source ingestion and stay unprefixed
+UNQUALIFIED_SOURCE = "ticketmaster"
+
+NAME_THRESHOLD = 0.8        # share of the shorter name's tokens found in the other
+MAX_DISTANCE_KM = 0.5
+MAX_TIME_GAP = 2 * 3600     # seconds, when both listings give a start time
+GRID = 100                  # coordinate blocking cells of 1/100 degree (~1 km)
+STOPWORDS = frozenset("le la les l de du des d et a au aux en the of and at in".split())
+
+
+def qualified_id(source, source_id):
+    """Canonical id of an event first seen on source."""
+    return source_id if source == UNQUALIFIED_SOURCE else f"{source}:{source_id}"
+
+
+def normalize(text):
+    """Lowercase, accents and punctuation stripped, single spaces."""
+    text = "".join(c for c in unicodedata.normalize("NFKD", text or "") if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+def _day(event):
+    if len(event.date) >= 10:
+        return event.date[:10]
+    if event.timestamp:
+        return datetime.fromtimestamp(event.timestamp, EVENT_TZ).strftime("%Y-%m-%d")
+    return ""
+
+
+class _Entry:
+    """What matching needs to know about a canonical event."""
+
+    __slots__ = ("id", "source", "day", "name", "tokens", "venue", "lat", "lon", "timestamp", "has_time")
+
+    def __init__(self, event_id, source, event):
+        self.id = event_id
+        self.source = source
+        self.day = _day(event)
+        self.name = normalize(event.name)
+        self.tokens = frozenset(t for t in self.name.split() if t not in STOPWORDS) or frozenset(self.name.split())
+        self.venue = normalize(event.venue)
+        self.lat, self.lon = event.latitude, event.longitude
+        self.timestamp = event.timestamp
+        self.has_time = len(event.date) > 10
+
+    @property
+    def located(self):
+        return self.lat != 0 and self.lon != 0
+
+    def cell(self, dlat=0, dlon=0):
+        return int(self.lat * GRID) + dlat, int(self.lon * GRID) + dlon
+
+    def keys(self):
+        """Blocking keys: only entries sharing one are compared."""
+        if not self.day:
+            return []
+        keys = [("name", self.day, self.name)]
+        if self.venue:
+            keys.append(("venue", self.day, self.venue))
+        if self.located:
+            keys.append(("cell", self.day, self.cell()))
+        return keys
+
+    def candidate_keys(self):
+        keys = self.keys()
+        if self.located:
+            # Neighbouring cells too: two listings of one venue can straddle a cell edge
+            keys += [("cell", self.day, self.cell(dlat, dlon))
+                     for dlat in (-1, 0, 1) for dlon in (-1, 0, 1) if dlat or dlon]
+        return keys
+
+
+def name_similarity(a, b):
+    if not a.tokens or not b.tokens:
+        return 0.0
+    return len(a.tokens & b.tokens) / min(len(a.tokens), len(b.tokens))
+
+
+def same_event(a, b):
+    """Whether two listings of the same day describe one event."""
+    if a.name != b.name and name_similarity(a, b) < NAME_THRESHOLD:
+        return False
+    if a.has_time and b.has_time and a.timestamp and b.timestamp \
+            and abs(a.timestamp - b.timestamp) > MAX_TIME_GAP:
+        return False
+    if a.venue and a.venue == b.venue:
+        return True
+    if a.located and b.located:
+        return haversine(a.lat, a.lon, b.lat, b.lon) <= MAX_DISTANCE_KM
+    # Nothing to compare the places with: only an identical name is trusted
+    return a.name == b.name and not (a.venue and b.venue)
+
+
+class Deduplicator:
+    """Cross-source duplicate detection with blocking keys.
+
+    Each canonical event is indexed under a few blocking keys (same day +
+    normalized name, same day + normalized venue, same day + ~1 km
+    coordinate cell). A listing from another source is only compared with
+    the canonical events sharing one of its keys, then matched on name
+    tokens and place (venue, or coordinates within MAX_DISTANCE_KM).
+
+    Listings of one source are never merged together: only cross-source
+    duplicates are detected.
+    """
+
+    def __init__(self, priority=SOURCE_PRIORITY):
+        self.priority = {source: rank for rank, source in enumerate(priority)}
+        self.entries = {}   # canonical id -> _Entry
+        self.blocks = {}    # blocking key -> [canonical ids]
+        self.links = {}     # (source, source id) -> canonical id
+        self.duplicates = 0
+
+    @classmethod
+    def from_db(cls, db, priority=SOURCE_PRIORITY):
+        """Index the canonical events and source links already stored in db."""
+        dedup = cls(priority)
+        owners = {}
+        for source, source_id, event_id in db.iter_source_links():
+            dedup.links[(source, source_id)] = event_id
+            if event_id not in owners or dedup._rank(source) < dedup._rank(owners[event_id]):
+                owners[event_id] = source
+        for event in db.iter_events():
+            dedup._index(_Entry(event.id, owners.get(event.id, UNQUALIFIED_SOURCE), event))
+        return dedup
+
+    def _rank(self, source):
+        return self.priority.get(source, len(self.priority))
+
+    def _index(self, entry):
+        self.entries[entry.id] = entry
+        for key in entry.keys():
+            ids = self.blocks.setdefault(key, [])
+            if entry.id not in ids:
+                ids.append(entry.id)
+
+    def match(self, source, event):
+        """Canonical entry of another source that event duplicates, or None."""
+        probe = _Entry(None, source, event)
+        best, best_score = None, 0.0
+        seen = set()
+        for key in probe.candidate_keys():
+            for event_id in self.blocks.get(key, ()):
+                if event_id in seen:
+                    continue
+                seen.add(event_id)
+                entry = self.entries[event_id]
+                if entry.source == source or not same_event(probe, entry):
+                    continue
+                score = name_similarity(probe, entry)
+                if score > best_score:
+                    best, best_score = entry, score
+        return best
+
+    def resolve(self, source, events):
+        """Map one source's listings onto canonical events.
+
+        Returns (events to upsert, with canonical ids; source links as
+        (source, source_id, event_id, url)). A listing supplies the canonical
+        event's fields unless a higher-priority source already does.
+        """
+        canonical = []
+        links = []
+        for event in events:
+            event_id = self.links.get((source, event.id))
+            entry = self.entries.get(event_id) if event_id else None
+            if entry is None:
+                entry = self.match(source, event)
+                if entry is not None:
+                    self.duplicates += 1
+                    log.debug("Doublon : %s %s -> %s", source, event.id, entry.id)
+            if entry is None:
+                entry = _Entry(qualified_id(source, event.id), source, event)
+                self._index(entry)
+                canonical.append(replace(event, id=entry.id))
+            elif self._rank(source) <= self._rank(entry.source):
+                updated = _Entry(entry.id, source, event)
+                self._index(updated)
+                canonical.append(replace(event, id=entry.id))
+            self.links[(source, event.id)] = entry.id
+            links.append((source, event.id, entry.id, event.url))
+        return canonical, links
@@ -0,0 +1,144 @@
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+log = logging.getLogger("culturai.embedding_cache")
+
+
+class EmbeddingCache:
+    """Event embeddings persisted in EventDatabase, keyed by Event.content_hash.
+
+    Only events whose text (or the model) changed since the last run are
+    sent to the encoder; the rest are read back from SQLite.
+    """
+
+    def __init__(self, db, model_name):
+        self.db = db
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+
+    def vectors_for(self, events, encode):
+        """Return a float32 matrix aligned with events. encode(texts) runs on misses only."""
+        rows, missing, hashes = self.lookup(events)
+        if missing:
+            encoded = np.asarray(encode([events[i].to_text() for i in missing]), dtype="float32")
+            self.store([events[i] for i in missing], [hashes[i] for i in missing], encoded)
+            for i, vec in zip(missing, encoded):
+                rows[i] = vec
+
+        log.info("Cache d'embeddings : %d hits, %d misses", len(events) - len(missing), len(missing))
+
+        if not rows:
+            return np.empty((0, 0), dtype="float32")
+        return np.ascontiguousarray(np.vstack(rows), dtype="float32")
+
+    def lookup(self, events):
+        """(rows, missing, hashes): cached vector or None per event, indices
+        of the misses, and each event's content hash. Counts hits and misses."""
+        cached = self.db.get_embeddings(e.id for e in events)
+        hashes = [e.content_hash(self.model_name) for e in events]
+
+        rows = [None] * len(events)
+        missing = []
+        for i, (event, h) in enumerate(zip(events, hashes)):
+            entry = cached.get(event.id)
+            if entry and entry[0] == h:
+                rows[i] = np.frombuffer(entry[1], dtype="float32")
+            else:
+                missing.append(i)
+
+        self.hits += len(events) - len(missing)
+        self.misses += len(missing)
+        return rows, missing, hashes
+
+    def cached_ids(self, events):
+        """Ids of the events whose current text already has a cached vector."""
+        hashes = self.db.get_embedding_hashes(e.id for e in events)
+        return {e.id for e in events if hashes.get(e.id) == e.content_hash(self.model_name)}
+
+    def store(self, events, hashes, vectors):
+        self.db.save_embeddings(
+            (e.id, h, np.asarray(vec, dtype="float32").tobytes()) for e, h, vec in zip(events, hashes, vectors))
+
+    def record_run(self):
+        """Persist this run's counters so that `ingest.py --stats` can report them."""
+        self.db.set_meta("embed_cache_hits", self.hits)
+        self.db.set_meta("embed_cache_misses", self.misses)
+
+
+class BackgroundEmbedder:
+    """Encodes events in fixed-size batches on a background thread while the
+    caller keeps fetching.
+
+    key: optional function (e.g. data.shows.show_key); events sharing a
+    non-None key are encoded once per run, since only one of them will be
+    indexed. Cache lookups and writes stay on the caller's thread (the SQLite
+    connection is not shared); only encode() runs in the background. At most
+    max_in_flight batches are queued, which bounds memory.
+    """
+
+    DEFAULT_BATCH_SIZE = 256
+    DEFAULT_MAX_IN_FLIGHT = 2
+
+    def __init__(self, cache, encode, batch_size=DEFAULT_BATCH_SIZE, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 key=None):
+        self.cache = cache
+        self.encode = encode
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedder")
+        self._buffer = []
+        self._in_flight = deque()   # (future, events, hashes)
+        self._submitted = set()     # content hashes already sent to the encoder
+        self.key = key
+        self._keys = set()          # keys of the events already taken
+        self.encoded = 0
+
+    def add(self, events):
+        if self.key is not None:
+            events = [e for e in events if self._first_of_key(e)]
+        self._buffer.extend(events)
+        while len(self._buffer) >= self.batch_size:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            self._submit(batch)
+        self._collect(block=False)
+
+    def _first_of_key(self, event):
+        k = self.key(event)
+        if k is None:
+            return True
+        if k in self._keys:
+            return False
+        self._keys.add(k)
+        return True
+
+    def _submit(self, batch):
+        _, missing, hashes = self.cache.lookup(batch)
+        todo = [(batch[i], hashes[i]) for i in missing if hashes[i] not in self._submitted]
+        if not todo:
+            return
+        events, hashes = [e for e, _ in todo], [h for _, h in todo]
+        self._submitted.update(hashes)
+        while len(self._in_flight) >= self.max_in_flight:
+            self._store(*self._in_flight.popleft())
+        future = self._pool.submit(self.encode, [e.to_text() for e in events])
+        self._in_flight.append((future, events, hashes))
+
+    def _collect(self, block):
+        while self._in_flight and (block or self._in_flight[0][0].done()):
+            self._store(*self._in_flight.popleft())
+
+    def _store(self, future, events, hashes):
+        self.cache.store(events, hashes, future.result())
+        self.encoded += len(events)
+        log.debug("Lot d'embeddings stocke : %d evenements", len(events))
+
+    def close(self):
+        """Encode what is left and wait for every batch."""
+        if self._buffer:
+            self._submit(self._buffer)
+            self._buffer = []
+        self._collect(block=True)
+        self._pool.shutdown()
@@ -1,4 +1,33 @@
+import hashlib
 from dataclasses import dataclass, field
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+EVENT_TZ = ZoneInfo("Europe/Paris")
+DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+
+
+def parse_event_time(date):
+    """Epoch seconds of an event's local date string ("YYYY-MM-DD HH:MM:SS"...), 0 if unknown."""
+    if not date:
+        return 0
+    for fmt in DATE_FORMATS:
+        try:
+            return int(datetime.strptime(date.strip(), fmt).replace(tzinfo=EVENT_TZ).timestamp())
+        except ValueError:
+            continue
+    return 0
+
+
+@dataclass(frozen=True)
+class Occurrence:
+    """One date of a show grouped from several listings (see data.shows)."""
+    id: str
+    date: str
+    timestamp: int = 0
+    price: float = 0
+    url: str = ""
+    end_timestamp: int = 0
 
 
 @dataclass
@@ -14,6 +43,14 @@ class Event:
     price: float = 0
     latitude: float = 0
     longitude: float = 0
+    timestamp: int = 0  # epoch seconds parsed from date, 0 if unknown
+    end_timestamp: int = 0  # epoch seconds of the end (exhibition, festival...), 0 if unknown
+    # Every date of a show, this event's included, in start order; empty for a one-off event
+    occurrences: tuple = ()
+
+    def __post_init__(self):
+        if not self.timestamp and self.date:
+            self.timestamp = parse_event_time(self.date)
 
     def to_text(self):
         parts = [f"Evenement : {self.name}"]
@@ -30,3 +67,7 @@ class Event:
         if self.description:
             parts.append(self.description)
         return ". ".join(parts)
+
+    def content_hash(self, model_name):
+        """Hash of the embedded text and model: changes iff the embedding must be recomputed."""
+        return hashlib.sha256(f"{model_name}\n{self.to_text()}".encode("utf-8")).hexdigest()
@@ -0,0 +1,287 @@
+"""
+Columnar, memory-mappable storage for event metadata (db/events.bin).
+
+Layout: a JSON header followed by fixed-width columns (live flag, price,
+coordinates, start and end timestamps, one int32 code per text field) and a shared string table
+(offsets + UTF-8 blob) that deduplicates repeated cities, genres, venues...
+The dates of a grouped show are one more text field (compact JSON, "" for
+one-off events).
+Columns are memory-mapped on load; an Event is only built when a row is read.
+
+Usage (conversion of the former JSON format):
+    python -m data.event_table db/events.json db/events.bin
+"""
+import json
+import struct
+import sys
+from collections.abc import MutableMapping
+import numpy as np
+from data.event import Event, Occurrence, parse_event_time
+
+MAGIC = b"CULTEVT1"
+ALIGN = 64
+
+STRING_FIELDS = ("id", "name", "description", "date", "url", "venue", "city", "genre")
+NUMERIC_FIELDS = {"price": np.float64, "latitude": np.float64, "longitude": np.float64,
+                  "timestamp": np.int64, "end_timestamp": np.int64}
+OCCURRENCES = "occurrences"
+TEXT_COLUMNS = STRING_FIELDS + (OCCURRENCES,)
+
+
+def encode_occurrences(occurrences):
+    if not occurrences:
+        return ""
+    return json.dumps([[o.id, o.date, o.timestamp, o.price, o.url, o.end_timestamp] for o in occurrences],
+                      ensure_ascii=False, separators=(",", ":"))
+
+
+def decode_occurrences(text):
+    return tuple(Occurrence(*values) for values in json.loads(text)) if text else ()
+
+
+def _text(event, name):
+    value = getattr(event, name)
+    return encode_occurrences(value) if name == OCCURRENCES else value
+
+
+class EventTable(MutableMapping):
+    """row -> Event mapping over columnar arrays.
+
+    Keys are the live rows. Rows loaded from disk stay memory-mapped;
+    rows set afterwards live in memory until the next save(). Deleting a
+    row only clears its live flag (tombstone).
+    """
+
+    def __init__(self, columns=None, offsets=None, blob=None):
+        self._columns = columns or {}
+        self._offsets = offsets if offsets is not None else np.zeros(1, dtype=np.int64)
+        self._blob = blob if blob is not None else np.zeros(0, dtype=np.uint8)
+        self._base_rows = len(self._columns.get("live", ()))
+        self._base_strings = len(self._offsets) - 1
+        # The live flags are small and mutable: keep them in memory, with
+        # spare capacity so that appends are amortised O(1)
+        self._live = np.array(self._columns.get("live", np.zeros(0, dtype=np.uint8)), dtype=bool)
+        self._n_rows = len(self._live)
+        self._n_live = int(self._live.sum())
+        self._extra = {}            # row >= _base_rows -> Event
+        self._extra_strings = []
+        self._codes = None          # string -> code, built on first append
+
+    # --- Mapping protocol ---
+
+    def __getitem__(self, row):
+        if not 0 <= row < self._n_rows or not self.live[row]:
+            raise KeyError(row)
+        if row >= self._base_rows:
+            return self._extra[row]
+        values = {f: self.string(int(self._columns[f][row])) for f in STRING_FIELDS}
+        values.update({f: dtype(self._columns[f][row]).item() for f, dtype in NUMERIC_FIELDS.items()})
+        values[OCCURRENCES] = decode_occurrences(self.string(int(self._columns[OCCURRENCES][row])))
+        return Event(**values)
+
+    def __setitem__(self, row, event):
+        if row != self._n_rows:
+            raise KeyError(f"EventTable est en ajout seul (ligne {row}, attendu {self._n_rows})")
+        self._extra[row] = event
+        self._append_row(True)
+
+    def _append_row(self, live):
+        if self._n_rows == len(self._live):
+            grown = np.zeros(max(16, 2 * len(self._live)), dtype=bool)
+            grown[:self._n_rows] = self._live[:self._n_rows]
+            self._live = grown
+        self._live[self._n_rows] = live
+        self._n_rows += 1
+        self._n_live += int(live)
+
+    def __delitem__(self, row):
+        if not 0 <= row < self._n_rows or not self.live[row]:
+            raise KeyError(row)
+        self.live[row] = False
+        self._extra.pop(row, None)
+        self._n_live -= 1
+
+    def __contains__(self, row):
+        return isinstance(row, (int, np.integer)) and 0 <= row < self._n_rows and bool(self.live[row])
+
+    def __iter__(self):
+        return iter(self.live_rows().tolist())
+
+    def __len__(self):
+        return self._n_live
+
+    # --- Columnar access ---
+
+    @property
+    def live(self):
+        """Boolean live flag per row (a view: tombstones are False)."""
+        return self._live[:self._n_rows]
+
+    @property
+    def n_rows(self):
+        """Rows including tombstones."""
+        return self._n_rows
+
+    def live_rows(self):
+        return np.flatnonzero(self.live)
+
+    def string(self, code):
+        if code < self._base_strings:
+            return self._blob[self._offsets[code]:self._offsets[code + 1]].tobytes().decode("utf-8")
+        return self._extra_strings[code - self._base_strings]
+
+    def strings(self):
+        """The whole string table, code order."""
+        return [self.string(c) for c in range(self._base_strings + len(self._extra_strings))]
+
+    def _code(self, value):
+        if self._codes is None:
+            self._codes = {s: c for c, s in enumerate(self.strings())}
+        code = self._codes.get(value)
+        if code is None:
+            code = self._base_strings + len(self._extra_strings)
+            self._extra_strings.append(value)
+            self._codes[value] = code
+        return code
+
+    def column(self, name):
+        """Full column (all rows, tombstones included) as a numpy array.
+
+        Text fields are returned as int32 codes into the string table.
+        """
+        dtype = np.int32 if name in TEXT_COLUMNS else NUMERIC_FIELDS[name]
+        base = self._columns.get(name)
+        if base is None:
+            base = np.zeros(self._base_rows, dtype=dtype)
+        if self._n_rows == self._base_rows:
+            return base
+
+        # Rows appended then deleted are no longer in _extra: padded with 0
+        extra_rows = range(self._base_rows, self._n_rows)
+        if name in TEXT_COLUMNS:
+            extra = [self._code(_text(self._extra[r], name)) if r in self._extra else 0
+                     for r in extra_rows]
+        else:
+            extra = [(getattr(self._extra[r], name) or 0) if r in self._extra else 0
+                     for r in extra_rows]
+        return np.concatenate([base, np.array(extra, dtype=dtype)])
+
+    def occurrences(self):
+        """(row, occurrences) of the live rows grouping several dates."""
+        codes = self.column(OCCURRENCES)
+        live = self.live_rows()
+        decoded = {int(c): decode_occurrences(self.string(int(c))) for c in np.unique(codes[live])}
+        one_off = [c for c, occurrences in decoded.items() if not occurrences]
+        for row in live[~np.isin(codes[live], one_off)].tolist():
+            yield row, decoded[int(codes[row])]
+
+    def ids(self):
+        """{event id: row} for live rows."""
+        codes = self.column("id")
+        return {self.string(int(codes[row])): int(row) for row in self.live_rows()}
+
+    # --- Persistence ---
+
+    @staticmethod
+    def from_events(events):
+        """Build from a list of Event or None (tombstone), one entry per row."""
+        table = EventTable()
+        for row, event in enumerate(events):
+            if event is None:
+                table._append_row(False)
+            else:
+                table[row] = event
+        return table
+
+    def save(self, path):
+        codes = {f: self.column(f) for f in TEXT_COLUMNS}
+        # Drop strings only referenced by tombstoned rows
+        live = self.live.copy()
+        used = np.unique(np.concatenate([codes[f][live] for f in TEXT_COLUMNS]))
+        remap = np.zeros(self._base_strings + len(self._extra_strings) + 1, dtype=np.int32)
+        remap[used] = np.arange(len(used), dtype=np.int32)
+
+        encoded = [self.string(int(c)).encode("utf-8") for c in used]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+        arrays = {"live": live.astype(np.uint8)}
+        for f, dtype in NUMERIC_FIELDS.items():
+            arrays[f] = self.column(f).astype(dtype)
+        for f in TEXT_COLUMNS:
+            arrays[f] = np.where(live, remap[codes[f]], 0).astype(np.int32)
+        arrays["_offsets"] = offsets
+        arrays["_blob"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        header = {"n_rows": len(live), "columns": {}}
+        position = 0
+        for name, arr in arrays.items():
+            header["columns"][name] = {"dtype": arr.dtype.str, "shape": len(arr), "offset": position}
+            position += _aligned(arr.nbytes)
+        header_bytes = json.dumps(header).encode("utf-8")
+        data_start = _aligned(len(MAGIC) + 8 + len(header_bytes))
+
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header_bytes)))
+            f.write(header_bytes)
+            for name, arr in arrays.items():
+                f.seek(data_start + header["columns"][name]["offset"])
+                f.write(arr.tobytes())
+            f.truncate(data_start + position)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} n'est pas un fichier EventTable")
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len))
+        data_start = _aligned(len(MAGIC) + 8 + header_len)
+
+        arrays = {}
+        for name, spec in header["columns"].items():
+            if spec["shape"] == 0:
+                arrays[name] = np.zeros(0, dtype=spec["dtype"])
+            else:
+                arrays[name] = np.memmap(path, dtype=spec["dtype"], mode="r",
+                                         offset=data_start + spec["offset"], shape=(spec["shape"],))
+        offsets = arrays.pop("_offsets")
+        blob = arrays.pop("_blob")
+        table = EventTable(arrays, offsets, blob)
+        if "timestamp" not in arrays:
+            # Files written before timestamps existed: parse each distinct date once
+            unique, inverse = np.unique(arrays["date"], return_inverse=True)
+            parsed = np.array([parse_event_time(table.string(int(c))) for c in unique], dtype=np.int64)
+            table._columns["timestamp"] = parsed[inverse]
+        if "end_timestamp" not in arrays:
+            # Files written before end dates were kept: none known
+            table._columns["end_timestamp"] = np.zeros(table._base_rows, dtype=np.int64)
+        if OCCURRENCES not in arrays:
+            # Files written before shows were grouped: every row is a one-off event
+            table._columns[OCCURRENCES] = np.full(table._base_rows, table._code(""), dtype=np.int32)
+        return table
+
+    @staticmethod
+    def from_json(path):
+        """Read the former pretty-printed events.json (one entry per row, null = tombstone)."""
+        with open(path, "r", encoding="utf-8") as f:
+            events_data = json.load(f)
+        return EventTable.from_events([None if ed is None else Event(**ed) for ed in events_data])
+
+
+def _aligned(n):
+    return -(-n // ALIGN) * ALIGN
+
+
+def convert_json(json_path, bin_path):
+    table = EventTable.from_json(json_path)
+    table.save(bin_path)
+    return len(table)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage : python -m data.event_table db/events.json db/events.bin")
+        sys.exit(1)
+    print(f"{convert_json(sys.argv[1], sys.argv[2])} evenements convertis.")
@@ -0,0 +1,76 @@
+import gzip
+import json
+import os
+import threading
+import logging
+from datetime import datetime, timezone
+
+log = logging.getLogger("culturai.raw_archive")
+
+
+class RawArchive:
+    """Raw API pages appended to a gzip-compressed JSONL file.
+
+    One line per page: the query it answers (segment, label, fetch kwargs,
+    date window, page number), when it was fetched and the decoded response
+    as returned by the API. Writes are serialized, so fetch threads can
+    share one archive.
+    """
+
+    DEFAULT_DIR = os.path.join("db", "raw")
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.file = gzip.open(path, "at", encoding="utf-8")
+        self.lock = threading.Lock()
+        self.pages = 0
+
+    @classmethod
+    def for_run(cls, directory=DEFAULT_DIR, source="ticketmaster"):
+        """New archive named after the source and the current time (UTC)."""
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        return cls(os.path.join(directory, f"{source}-{stamp}.jsonl.gz"))
+
+    def write(self, segment, label, kwargs, window, page, response):
+        record = {
+            "segment": segment,
+            "label": label,
+            "query": kwargs,
+            "window": [dt.isoformat() if dt else None for dt in window],
+            "page": page,
+            "fetched_at": datetime.now(timezone.utc).isoformat(),
+            "response": response,
+        }
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.pages += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def archive_files(path):
+    """The archive at path, or every *.jsonl.gz under a directory (oldest first by name)."""
+    if os.path.isdir(path):
+        return [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".jsonl.gz")]
+    return [path]
+
+
+def iter_records(path):
+    """Yield the archived page records under path (file or directory).
+
+    An archive cut short (interrupted run) yields the pages before the cut.
+    """
+    for file_path in archive_files(path):
+        try:
+            with gzip.open(file_path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        except (EOFError, json.JSONDecodeError) as e:
+            log.warning("Archive %s tronquee (%s) : lecture arretee", file_path, e)
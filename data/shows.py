@@ -0,0 +1,49 @@
+from dataclasses import replace
+from data.dedup import normalize
+from data.event import Occurrence
+
+
+def show_key(event):
+    """Events sharing this key are dates of one show (same name, same venue).
+    None for events that cannot be grouped (no venue)."""
+    if not event.venue or not event.name:
+        return None
+    return normalize(event.name), normalize(event.venue)
+
+
+def _start(event):
+    # Undated listings sort last
+    return (event.timestamp or float("inf"), event.id)
+
+
+def group_shows(events, prefer=()):
+    """Collapse the dates of each show into one Event.
+
+    A show is represented by one of its listings (the first whose id is in
+    one of the prefer sets, tried in order, else the earliest), with
+    occurrences holding every date in start order. One-off events are
+    returned unchanged. Output order follows the first listing of each show.
+    """
+    groups = {}
+    order = []
+    for event in events:
+        key = show_key(event)
+        if key is None:
+            order.append([event])
+        elif key in groups:
+            groups[key].append(event)
+        else:
+            groups[key] = [event]
+            order.append(groups[key])
+
+    shows = []
+    for members in order:
+        if len(members) == 1:
+            shows.append(members[0])
+            continue
+        members.sort(key=_start)
+        lead = next((e for ids in prefer for e in members if e.id in ids), members[0])
+        occurrences = tuple(Occurrence(e.id, e.date, e.timestamp, e.price, e.url, e.end_timestamp)
+                            for e in members)
+        shows.append(replace(lead, occurrences=occurrences))
+    return shows
@@ -1,4 +1,5 @@
 import math
+import numpy as np
 
 # Coordinates of major French cities (latitude, longitude)
 CITY_COORDS = {
@@ -73,6 +74,24 @@ def haversine(lat1, lon1, lat2, lon2):
     return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
 
+def haversine_array(lat1, lon1, lats, lons, cos_lats=None):
+    """Vectorized haversine from one point to arrays of points (degrees), in km.
+
+    Same operations as haversine(); cos_lats = cos(radians(lats)) may be
+    passed precomputed.
+    """
+    R = 6371
+
+    if cos_lats is None:
+        cos_lats = np.cos(np.radians(lats))
+    dlat = np.radians(lats - lat1)
+    dlon = np.radians(lons - lon1)
+    a = (np.sin(dlat / 2) ** 2 +
+         math.cos(math.radians(lat1)) * cos_lats *
+         np.sin(dlon / 2) ** 2)
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
 def get_city_coords(city_name):
     """Look up coordinates for a French city. Returns (lat, lon) or None."""
     if not city_name:
@@ -0,0 +1,102 @@
+import math
+import numpy as np
+from geo.distance import haversine_array
+
+EARTH_RADIUS_KM = 6371
+
+
+def angular_extent(lat, km):
+    """(dlat, dlon) in degrees of the bounding box of a km radius around a
+    point at latitude lat (J. Matuschek, "Finding Points Within a Distance").
+    dlon is 180 when the circle reaches a pole."""
+    angular = km / EARTH_RADIUS_KM
+    dlat = math.degrees(angular)
+    ratio = math.sin(min(angular, math.pi / 2)) / max(math.cos(math.radians(lat)), 1e-12)
+    reaches_pole = abs(lat) + dlat >= 90
+    dlon = 180 if reaches_pole or ratio >= 1 else math.degrees(math.asin(ratio))
+    return dlat, dlon
+
+
+def lon_ranges(lon, dlon):
+    """Inclusive longitude ranges covering [lon - dlon, lon + dlon], split at the antimeridian."""
+    if dlon >= 180:
+        return [(-180.0, 180.0)]
+    lo, hi = lon - dlon, lon + dlon
+    if lo < -180:
+        return [(lo + 360, 180.0), (-180.0, hi)]
+    if hi > 180:
+        return [(lo, 180.0), (-180.0, hi - 360)]
+    return [(lo, hi)]
+
+
+class GridIndex:
+    """Fixed lat/lon grid over points, for radius queries.
+
+    Rows are sorted by cell so that each latitude band of a query's bounding
+    box is one contiguous slice (two binary searches); only the points in
+    those cells get the exact haversine check.
+    """
+
+    DEFAULT_CELL_DEG = 0.25  # ~28 km of latitude
+
+    def __init__(self, latitudes, longitudes, rows=None, cell_deg=DEFAULT_CELL_DEG):
+        """latitudes/longitudes in degrees; rows: id of each point (defaults to its position)."""
+        lats = np.asarray(latitudes, dtype=np.float64)
+        lons = np.asarray(longitudes, dtype=np.float64)
+        rows = np.arange(len(lats)) if rows is None else np.asarray(rows)
+
+        self.cell_deg = cell_deg
+        self.n_lon = int(math.ceil(360 / cell_deg))
+        self.n_lat = int(math.ceil(180 / cell_deg))
+
+        cells = self._lat_cell(lats) * self.n_lon + self._lon_cell(lons)
+        order = np.argsort(cells, kind="stable")
+        self.cells = cells[order]
+        self.rows = rows[order]
+        self.latitudes = lats[order]
+        self.longitudes = lons[order]
+        self.cos_lat = np.cos(np.radians(self.latitudes))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _lat_cell(self, lat):
+        return np.clip(np.floor((np.asarray(lat) + 90) / self.cell_deg), 0, self.n_lat - 1).astype(np.int64)
+
+    def _lon_cell(self, lon):
+        return np.floor(((np.asarray(lon) + 180) % 360) / self.cell_deg).astype(np.int64) % self.n_lon
+
+    def _lon_ranges(self, lon, dlon):
+        """Inclusive lon-cell ranges covering [lon - dlon, lon + dlon], split at the antimeridian."""
+        if dlon >= 180:
+            return [(0, self.n_lon - 1)]
+        lo = int(self._lon_cell(lon - dlon))
+        hi = int(self._lon_cell(lon + dlon))
+        if lo <= hi:
+            return [(lo, hi)]
+        return [(lo, self.n_lon - 1), (0, hi)]
+
+    def within_radius(self, lat, lon, km):
+        """Points within km of (lat, lon). Returns (rows, distances_km), unsorted."""
+        if len(self.rows) == 0:
+            return self.rows[:0], np.empty(0)
+
+        dlat, dlon = angular_extent(lat, km)
+
+        lat_lo = int(self._lat_cell(lat - dlat))
+        lat_hi = int(self._lat_cell(lat + dlat))
+        slices = []
+        for lat_cell in range(lat_lo, lat_hi + 1):
+            for lon_lo, lon_hi in self._lon_ranges(lon, dlon):
+                start = np.searchsorted(self.cells, lat_cell * self.n_lon + lon_lo, side="left")
+                end = np.searchsorted(self.cells, lat_cell * self.n_lon + lon_hi, side="right")
+                if end > start:
+                    slices.append(np.arange(start, end))
+
+        if not slices:
+            return self.rows[:0], np.empty(0)
+        candidates = np.concatenate(slices)
+        d = haversine_array(lat, lon, self.latitudes[candidates], self.longitudes[candidates],
+                            self.cos_lat[candidates])
+        inside = d <= km
+        return self.rows[candidates[inside]], d[inside]
@@ -1,143 +1,572 @@
 """
-Ingestion complete des evenements Ticketmaster en France.
+Ingestion complete des evenements Ticketmaster (et Eventbrite) en France.
 
-Recupere tous les segments par genre (pour depasser la limite de 1200
-evenements par requete), stocke dans SQLite, puis genere l'index FAISS.
+Recupere chaque segment, decoupe par periodes de dates quand il depasse la
+limite de 1200 evenements par requete, fusionne les evenements publies sur
+plusieurs sources, stocke dans SQLite, puis genere l'index FAISS.
 
 Usage:
     python ingest.py                  # ingestion complete
-    python ingest.py --embed-only     # re-generer FAISS depuis SQLite (sans fetch)
+    python ingest.py --embed-only     # re-generer FAISS depuis SQLite (sans fetch,
+                                      # seuls les evenements modifies sont re-encodes)
     python ingest.py --stats          # afficher les stats de la base
+    python ingest.py --embed-only --index-type hnsw --ef-search 128
+    python ingest.py --embed-only --rebuild   # reconstruire l'index au lieu du delta
+    python ingest.py --workers 8 --rate 4     # requetes paralleles, limitees a 4/s
+    python ingest.py --incremental    # seulement les evenements mis en vente depuis la derniere
+                                      # synchro (run complet force tous les 6 runs)
+    python ingest.py --resume         # reprendre une ingestion interrompue
+    python ingest.py --archive        # archiver les pages brutes dans db/raw/ (JSONL gzip)
+    python ingest.py --replay db/raw  # re-parser et re-ingerer les archives, sans reseau
+    python ingest.py --sources ticketmaster   # sans Eventbrite
 """
 import argparse
-import time
+import itertools
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from sentence_transformers import SentenceTransformer
 import config
+from client.eventbrite_client import EventbriteClient
+from client.rate_limiter import TokenBucket
 from client.ticketmaster_client import TicketmasterClient
 from data.database import EventDatabase
+from data.dedup import Deduplicator
+from data.embedding_cache import EmbeddingCache, BackgroundEmbedder
+from data.event import EVENT_TZ
+from data.raw_archive import RawArchive, iter_records
+from data.shows import group_shows, show_key
+from rag.lexical_index import LexicalIndex
 from rag.vector_store import VectorStore
 
-# Segments with few events in FR — fetch by segment name (fits in 1200)
-SMALL_SEGMENTS = [
-    "sports",
-    "film",
+EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+# Ticketmaster Discovery quota: 5 requests/second
+REQUESTS_PER_SECOND = 4
+FETCH_WORKERS = 8
+# Streaming: pages waiting for the main thread, events per upsert transaction
+PAGE_QUEUE_SIZE = 32
+UPSERT_BATCH = 1000
+# Delta fetches start a little before the last sync, to absorb clock skew
+SYNC_OVERLAP = timedelta(hours=1)
+# The delta filter is the on-sale start date, not a change date: events edited
+# or delisted since are only caught by a full run, forced after this many
+# incremental runs in a row
+MAX_INCREMENTAL_RUNS = 6
+
+# Discovery API segments (segment_name, segment_id). Queries larger than
+# what paging can reach are split by date range (see split_window)
+SEGMENTS = [
+    ("music", "KZFzniwnSyZfZ7v7nJ"),
+    ("arts", "KZFzniwnSyZfZ7v7na"),
+    ("sports", "KZFzniwnSyZfZ7v7nE"),
+    ("film", "KZFzniwnSyZfZ7v7nn"),
+    ("miscellaneous", "KZFzniwnSyZfZ7v7n1"),
 ]
 
-# Segments with many events — fetch by individual genre ID to get full coverage
-# (segment_name, genre_id, genre_label)
-GENRE_QUERIES = [
-    # Music (24 genres)
-    ("music", "KnvZfZ7vAvv", "Alternative"),
-    ("music", "KnvZfZ7vAve", "Ballads/Romantic"),
-    ("music", "KnvZfZ7vAvd", "Blues"),
-    ("music", "KnvZfZ7vAvA", "Chanson Francaise"),
-    ("music", "KnvZfZ7vAvk", "Children's Music"),
-    ("music", "KnvZfZ7vAeJ", "Classical"),
-    ("music", "KnvZfZ7vAv6", "Country"),
-    ("music", "KnvZfZ7vAvF", "Dance/Electronic"),
-    ("music", "KnvZfZ7vAva", "Folk"),
-    ("music", "KnvZfZ7vAv1", "Hip-Hop/Rap"),
-    ("music", "KnvZfZ7vAvJ", "Holiday"),
-    ("music", "KnvZfZ7vAvE", "Jazz"),
-    ("music", "KnvZfZ7vAJ6", "Latin"),
-    ("music", "KnvZfZ7vAvI", "Medieval/Renaissance"),
-    ("music", "KnvZfZ7vAvt", "Metal"),
-    ("music", "KnvZfZ7vAvn", "New Age"),
-    ("music", "KnvZfZ7vAvl", "Other"),
-    ("music", "KnvZfZ7vAev", "Pop"),
-    ("music", "KnvZfZ7vAee", "R&B"),
-    ("music", "KnvZfZ7vAed", "Reggae"),
-    ("music", "KnvZfZ7vAe7", "Religious"),
-    ("music", "KnvZfZ7vAeA", "Rock"),
-    ("music", "KnvZfZ7vAe6", "Undefined"),
-    ("music", "KnvZfZ7vAeF", "World"),
-    # Arts & Theatre (20 genres)
-    ("arts", "KnvZfZ7v7na", "Children's Theatre"),
-    ("arts", "KnvZfZ7v7n1", "Circus & Specialty Acts"),
-    ("arts", "KnvZfZ7v7nJ", "Classical"),
-    ("arts", "KnvZfZ7vAe1", "Comedy"),
-    ("arts", "KnvZfZ7v7nE", "Cultural"),
-    ("arts", "KnvZfZ7v7nI", "Dance"),
-    ("arts", "KnvZfZ7v7nt", "Espectaculo"),
-    ("arts", "KnvZfZ7v7nn", "Fashion"),
-    ("arts", "KnvZfZ7v7nl", "Fine Art"),
-    ("arts", "KnvZfZ7v7lv", "Magic & Illusion"),
-    ("arts", "KnvZfZ7v7le", "Miscellaneous"),
-    ("arts", "KnvZfZ7v7ld", "Miscellaneous Theatre"),
-    ("arts", "KnvZfZ7v7l7", "Multimedia"),
-    ("arts", "KnvZfZ7v7lA", "Music"),
-    ("arts", "KnvZfZ7v7lk", "Opera"),
-    ("arts", "KnvZfZ7v7l6", "Performance Art"),
-    ("arts", "KnvZfZ7v7lF", "Puppetry"),
-    ("arts", "KnvZfZ7v7la", "Spectacular"),
-    ("arts", "KnvZfZ7v7l1", "Theatre"),
-    ("arts", "KnvZfZ7v7lJ", "Variety"),
-    # Miscellaneous (16 genres)
-    ("miscellaneous", "KnvZfZ7vAAa", "Casino/Gaming"),
-    ("miscellaneous", "KnvZfZ7vAA1", "Comedy"),
-    ("miscellaneous", "KnvZfZ7vAAE", "Community/Civic"),
-    ("miscellaneous", "KnvZfZ7v7lE", "Community/Cultural"),
-    ("miscellaneous", "KnvZfZ7vAeE", "Fairs & Festivals"),
-    ("miscellaneous", "KnvZfZ7vA1n", "Family"),
-    ("miscellaneous", "KnvZfZ7vAAI", "Food & Drink"),
-    ("miscellaneous", "KnvZfZ7vAAl", "Health/Wellness"),
-    ("miscellaneous", "KnvZfZ7vAAJ", "Hobby/Special Interest Expos"),
-    ("miscellaneous", "KnvZfZ7vAAt", "Holiday"),
-    ("miscellaneous", "KnvZfZ7v7lI", "Ice Shows"),
-    ("miscellaneous", "KnvZfZ7vAJe", "Lecture/Seminar"),
-    ("miscellaneous", "KnvZfZ7vAAF", "Multimedia"),
-    ("miscellaneous", "KnvZfZ7vAAn", "Psychics/Mediums/Hypnotists"),
-    ("miscellaneous", "KnvZfZ7v7lt", "Special Interest/Hobby"),
-    ("miscellaneous", "KnvZfZ7v7ll", "Undefined"),
+# Eventbrite keyword searches (segment, keyword, location), run next to the
+# Ticketmaster queries; the same events listed on both are merged
+EVENTBRITE_QUERIES = [
+    ("music", "concert", "France"),
+    ("music", "festival", "France"),
+    ("arts", "theatre", "France"),
+    ("arts", "exposition", "France"),
+    ("miscellaneous", "atelier", "France"),
 ]
 
+# Date range split when a query is too large: events starting within
+# PARTITION_HORIZON are partitioned, earlier ones (already under way) go to
+# an open-ended head and later ones to an open-ended tail
+PARTITION_HORIZON = timedelta(days=730)
+MIN_WINDOW = timedelta(hours=1)
+
+
+def build_queries():
+    """(segment, label, fetch kwargs) for every Ticketmaster query of a full ingest."""
+    return [(segment, segment, {"segment_id": segment_id}) for segment, segment_id in SEGMENTS]
+
+
+def query_key(kwargs):
+    """Stable sync_state key of a query, e.g. "segment_id=KZFzniwnSyZfZ7v7nJ"."""
+    return "&".join(f"{k}={v}" for k, v in sorted(kwargs.items()))
+
+
+def split_window(window, total, reachable, now):
+    """Split a (start, end) date window (None = unbounded) into enough parts
+    for each to fit in `reachable` events if they were evenly spread.
+
+    An unbounded start keeps an unbounded head ending at `now` (or one
+    PARTITION_HORIZON before `end` when the window ends by then): the
+    unsplit query also returned events that started earlier, such as
+    festivals and exhibitions in progress.
+    Returns [] when the window is already at MIN_WINDOW."""
+    start, end = window
+    head, tail = [], []
+    if start is None:
+        start = now if end is None or end > now else end - PARTITION_HORIZON
+        head = [(None, start)]
+    if end is None:
+        end = start + PARTITION_HORIZON
+        tail = [(end, None)]
+    if end - start <= MIN_WINDOW:
+        return head + [(start, end)] + tail if head or tail else []
+    n = max(2, -(-total // reachable) + 1)
+    step = max((end - start) / n, MIN_WINDOW)
+    bounds = []
+    t = start
+    while t < end:
+        bounds.append(t)
+        t += step
+    bounds.append(end)
+    return head + [(a, b) for a, b in zip(bounds, bounds[1:])] + tail
+
+
+def _describe_window(window):
+    start, end = window
+    if start is None and end is None:
+        return ""
+    fmt = "%Y-%m-%d %H:%M"
+    return f" [{start.strftime(fmt) if start else '...'} -> {end.strftime(fmt) if end else '...'}]"
+
+
+class EventbriteSource:
+    """Eventbrite searches as an extra source of fetch_all."""
+
+    name = EventbriteClient.SOURCE
+
+    def __init__(self, client, queries=EVENTBRITE_QUERIES, max_pages=None):
+        """max_pages: pages read per search. By default each search is read to
+        its end: a search cut short leaves the whole source unreconciled, so
+        its vanished events would never be marked stale."""
+        self.client = client
+        self.queries = queries
+        self.max_pages = max_pages
+
+    def iter_pages(self, stop):
+        """Yield (segment, events) per page; returns True if every search completed."""
+        complete = True
+        for segment, keyword, location in self.queries:
+            pages = self.client.iter_pages(keyword, location, max_pages=self.max_pages)
+            while not stop.is_set():
+                try:
+                    events = next(pages)
+                except StopIteration as done:
+                    complete = complete and done.value
+                    break
+                yield segment, events
+        return complete and not stop.is_set()
+
+
+def build_sources(names):
+    """Extra sources of fetch_all among names, skipping those without credentials."""
+    sources = []
+    if EventbriteClient.SOURCE in names:
+        if config.EVENTBRITE_API_KEY:
+            sources.append(EventbriteSource(EventbriteClient(config.EVENTBRITE_API_KEY)))
+        else:
+            print("EVENTBRITE_PRIVATE_TOKEN absent : source Eventbrite ignoree.")
+    return sources
+
+
+def write_events(db, dedup, source, events, classification, embedder=None, fetched_at=None):
+    """Persist one source's events through dedup: canonical events are
+    upserted (and embedded), every listing gets its source link.
+    fetched_at: fetch time of archived events (see replay)."""
+    canonical, links = dedup.resolve(source, events)
+    if canonical:
+        db.upsert_events(canonical, classification=classification, fetched_at=fetched_at)
+        if embedder is not None:
+            embedder.add(canonical)
+    db.link_sources(links, fetched_at=fetched_at)
+
+
+@dataclass
+class FetchTask:
+    query: tuple            # (segment, label, fetch kwargs)
+    window: tuple           # (start, end) datetimes, None = unbounded
+    since: datetime = None
+    probe: bool = True
+    next_page: int = 0      # first page not yet persisted
+    fetched: int = 0
+    status: str = "pending"  # pending, done, incomplete
+
+    @property
+    def key(self):
+        start, end = self.window
+        return "|".join([query_key(self.query[2]), _iso(start), _iso(end), str(int(self.probe))])
+
+    def checkpoint(self):
+        segment, label, kwargs = self.query
+        return (self.key, segment, label, json.dumps(kwargs, sort_keys=True),
+                _iso(self.window[0]) or None, _iso(self.window[1]) or None, _iso(self.since) or None,
+                int(self.probe), self.next_page, self.status)
+
+    @staticmethod
+    def from_checkpoint(row):
+        _, segment, label, params, start, end, since, probe, next_page, status = row
+        return FetchTask((segment, label, json.loads(params)), (_dt(start), _dt(end)), _dt(since),
+                         bool(probe), next_page, status=status)
+
+
+def _iso(dt):
+    return dt.isoformat() if dt else ""
+
+
+def _dt(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def fetch_all(db, workers=FETCH_WORKERS, rate=REQUESTS_PER_SECOND, client=None, queries=None,
+              incremental=False, embedder=None, resume=False, archive=None, sources=(), dedup=None):
+    """Run the queries on a thread pool sharing one rate limiter.
+
+    Pages stream back through a bounded queue as they arrive: this thread
+    upserts them in batches of UPSERT_BATCH events (one transaction each)
+    and hands them to the optional BackgroundEmbedder, so encoding overlaps
+    with the network and memory does not grow with the catalogue.
+
+    A query matching more events than paging can reach (1200) is split by
+    date range, recursively, until every window fits. Sub-queries are
+    scheduled from this thread as results come back.
+
+    incremental: queries synced before only ask for events put on sale since
+    their last sync (the Discovery API has no change filter): events edited
+    or delisted since, or put on sale earlier, are missed. A full run (the
+    default, and forced after MAX_INCREMENTAL_RUNS incremental runs)
+    reconciles the catalogue: once every query has come back complete,
+    events it did not return are marked stale.
+
+    Progress (query, partition window, next page) is checkpointed in
+    ingest_checkpoints each time events are persisted. resume=True picks an
+    interrupted run up from there instead of starting over.
+
+    archive: optional RawArchive receiving every raw page (see replay).
+
+    sources: extra sources (e.g. EventbriteSource), each paged on a pool
+    thread of its own. Every page goes through dedup (a Deduplicator,
+    loaded from db by default), so an event listed on several sources is
+    stored once, with one source link per listing. Extra sources are
+    fetched again in full on resume.
+    """
+    client = client or TicketmasterClient(config.TICKETMASTER_API_KEY, rate_limiter=TokenBucket(rate))
+    queries = build_queries() if queries is None else queries
+    dedup = dedup or Deduplicator.from_db(db)
+    checkpoints = db.get_checkpoints() if resume else []
+    if checkpoints:
+        run_started = datetime.fromisoformat(db.get_meta("ingest_run_started"))
+        incremental = db.get_meta("ingest_run_incremental") == "1"
+        restored = [FetchTask.from_checkpoint(row) for row in checkpoints]
+        print(f"Reprise du run du {run_started:%Y-%m-%d %H:%M} : "
+              f"{sum(t.status == 'pending' for t in restored)} periodes restantes sur {len(restored)}")
+        if embedder is not None:
+            # Events persisted by the interrupted run; those already encoded are cache hits
+            embedder.add(db.get_events_fetched_since(run_started.isoformat()))
+    else:
+        if resume:
+            print("Aucun run interrompu : ingestion complete.")
+        run_started = datetime.now(timezone.utc)
+        restored = []
+        if incremental and int(db.get_meta("incremental_runs") or 0) >= MAX_INCREMENTAL_RUNS:
+            print(f"{MAX_INCREMENTAL_RUNS} runs incrementaux d'affilee : run complet avec reconciliation.")
+            incremental = False
+        db.clear_checkpoints()
+        db.set_meta("ingest_run_started", run_started.isoformat())
+        db.set_meta("ingest_run_incremental", int(incremental))
+    # Today's midnight in France, where the events take place
+    partition_start = (run_started.astimezone(EVENT_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+                       .astimezone(timezone.utc))
 
-def fetch_all(db):
-    client = TicketmasterClient(config.TICKETMASTER_API_KEY)
     total = 0
+    windows_fetched = 0
+    # query key -> [windows still pending, all complete so far]
+    progress = {}
+    messages = queue.Queue(maxsize=PAGE_QUEUE_SIZE)
+    stop = threading.Event()
+    buffers = {}    # (source, segment) -> events waiting to be upserted
+    tasks = {}      # task id -> FetchTask in flight
+    running = {}    # extra source name -> completed (None while running)
 
-    # Small segments: fetch by segment name (fits in 1200)
-    for segment in SMALL_SEGMENTS:
-        print(f"\n--- {segment.upper()} ---")
-        events = client.fetch_events(country_code="FR", classification_name=segment)
-        db.upsert_events(events, classification=segment)
-        print(f"  {len(events)} evenements")
-        total += len(events)
-        time.sleep(1)
+    def flush(segment, source=client.SOURCE):
+        events = buffers.pop((source, segment), None)
+        if events:
+            write_events(db, dedup, source, events, segment, embedder)
+        if source == client.SOURCE:
+            # The pages counted so far are now persisted
+            db.save_checkpoints(t.checkpoint() for t in tasks.values() if t.query[0] == segment)
+
+    def put(message):
+        while not stop.is_set():
+            try:
+                messages.put(message, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run(task_id, task):
+        complete, total_elements = False, 0
+        page = task.next_page
+        try:
+            pages = client.iter_pages(country_code="FR", since=task.since, start=task.window[0],
+                                      end=task.window[1], probe=task.probe, start_page=task.next_page,
+                                      raw=archive is not None, **task.query[2])
+            while not stop.is_set():
+                try:
+                    events = next(pages)
+                    if archive is not None:
+                        events, data = events
+                        archive.write(*task.query, task.window, page, data)
+                    page += 1
+                    if not put(("page", task_id, events)):
+                        return
+                except StopIteration as done:
+                    complete, total_elements = done.value
+                    break
+        except Exception as e:
+            print(f"  {task.query[1]}{_describe_window(task.window)}: erreur {e}")
+        finally:
+            put(("done", task_id, (complete, total_elements)))
+
+    def run_source(source):
+        complete = False
+        try:
+            pages = source.iter_pages(stop)
+            while not stop.is_set():
+                try:
+                    if not put(("source_page", source.name, next(pages))):
+                        return
+                except StopIteration as done:
+                    complete = done.value
+                    break
+        except Exception as e:
+            print(f"  {source.name}: erreur {e}")
+        finally:
+            put(("source_done", source.name, complete))
+
+    pool = ThreadPoolExecutor(max_workers=workers + len(sources))
+    task_ids = itertools.count()
+
+    def submit(task):
+        task_id = next(task_ids)
+        tasks[task_id] = task
+        progress[query_key(task.query[2])][0] += 1
+        pool.submit(run, task_id, task)
+
+    try:
+        for source in sources:
+            running[source.name] = None
+            pool.submit(run_source, source)
+        for query in queries:
+            progress[query_key(query[2])] = [0, True]
+        for task in restored:
+            progress.setdefault(query_key(task.query[2]), [0, True])
+            if task.status == "incomplete":
+                progress[query_key(task.query[2])][1] = False
+        if restored:
+            db.save_checkpoints(t.checkpoint() for t in restored)
+            for task in restored:
+                if task.status == "pending":
+                    submit(task)
+        else:
+            new_tasks = []
+            for query in queries:
+                last_sync = db.get_last_sync(query_key(query[2])) if incremental else None
+                since = datetime.fromisoformat(last_sync) - SYNC_OVERLAP if last_sync else None
+                new_tasks.append(FetchTask(query, (None, None), since))
+            db.save_checkpoints(t.checkpoint() for t in new_tasks)
+            for task in new_tasks:
+                submit(task)
+
+        while tasks or None in running.values():
+            # sender: task id of a Ticketmaster query, or name of an extra source
+            kind, sender, payload = messages.get()
+            if kind == "source_page":
+                segment, events = payload
+                total += len(events)
+                buffers.setdefault((sender, segment), []).extend(events)
+                if len(buffers[(sender, segment)]) >= UPSERT_BATCH:
+                    flush(segment, sender)
+                continue
+            if kind == "source_done":
+                for source, segment in [k for k in buffers if k[0] == sender]:
+                    flush(segment, source)
+                running[sender] = payload
+                print(f"  {sender}: {'termine' if payload else 'resultats incomplets'}")
+                continue
+
+            task_id = sender
+            task = tasks[task_id]
+            segment, label, kwargs = task.query
+
+            if kind == "page":
+                task.next_page += 1
+                task.fetched += len(payload)
+                total += len(payload)
+                buffers.setdefault((client.SOURCE, segment), []).extend(payload)
+                if len(buffers[(client.SOURCE, segment)]) >= UPSERT_BATCH:
+                    flush(segment)
+                continue
 
-    # Large segments: fetch by individual genre for full coverage
-    current_segment = None
-    for segment, genre_id, genre_label in GENRE_QUERIES:
-        if segment != current_segment:
-            current_segment = segment
-            print(f"\n--- {segment.upper()} (par genre) ---")
+            key = query_key(kwargs)
+            progress[key][0] -= 1
+            windows_fetched += 1
+            complete, total_elements = payload
+            reachable = client.reachable(kwargs.get("page_size", client.DEFAULT_PAGE_SIZE))
 
-        events = client.fetch_events(country_code="FR", genre_id=genre_id)
+            if task.probe and not complete and total_elements > reachable:
+                # Probe stopped after the first page: split, or page through what is reachable
+                parts = split_window(task.window, total_elements, reachable, partition_start)
+                if parts:
+                    print(f"  {label}{_describe_window(task.window)}: {total_elements} evenements, "
+                          f"decoupage en {len(parts)} periodes")
+                    children = [FetchTask(task.query, part, task.since) for part in parts]
+                else:
+                    print(f"  {label}{_describe_window(task.window)}: periode minimale atteinte, "
+                          f"{total_elements - reachable} evenements non recuperables")
+                    children = [FetchTask(task.query, task.window, task.since, probe=False)]
+                flush(segment)
+                task.status = "done"
+                db.save_checkpoints([task.checkpoint()] + [c.checkpoint() for c in children])
+                del tasks[task_id]
+                for child in children:
+                    submit(child)
+                continue
+
+            if task.fetched:
+                print(f"  {label}{_describe_window(task.window)}: {task.fetched} evenements")
+            if not complete:
+                progress[key][1] = False
+                print(f"  {label}{_describe_window(task.window)}: resultats incomplets")
+            flush(segment)
+            task.status = "done" if complete else "incomplete"
+            db.save_checkpoints([task.checkpoint()])
+            del tasks[task_id]
+            if progress[key][0] == 0 and progress[key][1]:
+                db.set_last_sync(key, run_started.isoformat(), full=not incremental)
+    except BaseException:
+        print("\nIngestion interrompue : relancer avec --resume pour reprendre.")
+        raise
+    finally:
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+        for source, segment in list(buffers):
+            flush(segment, source)
+
+    print(f"\n{windows_fetched} periodes interrogees pour {len(queries)} requetes.")
+    if dedup.duplicates:
+        print(f"{dedup.duplicates} evenements deja publies sur une autre source fusionnes.")
+    if incremental:
+        db.set_meta("incremental_runs", int(db.get_meta("incremental_runs") or 0) + 1)
+    else:
+        # Only sources read in full tell which events are gone
+        reconciled = [name for name, ok in running.items() if ok]
+        if all(ok for _, ok in progress.values()):
+            reconciled.insert(0, client.SOURCE)
+            db.set_meta("incremental_runs", 0)
+        if reconciled:
+            stale = db.mark_stale(run_started.isoformat(), sources=reconciled)
+            print(f"{stale} evenements absents du catalogue ({', '.join(reconciled)}) marques obsoletes.")
+        if len(reconciled) < 1 + len(sources):
+            print("Reconciliation partielle : certaines requetes sont incompletes.")
+    db.clear_checkpoints()
+    return total
+
+
+def replay(db, path, client=None, embedder=None, dedup=None):
+    """Re-parse the pages archived under path (file or directory, see
+    RawArchive) and upsert them, without any request.
+
+    Sync state and stale flags are left as they are: an archive is a
+    snapshot of past responses, not a reconciliation of the live catalogue.
+    Rows are stamped with the archived fetch time (the earliest of each
+    batch), and never overwrite a row fetched later.
+    """
+    client = client or TicketmasterClient(config.TICKETMASTER_API_KEY)
+    dedup = dedup or Deduplicator.from_db(db)
+    buffers = {}    # segment -> (events, earliest fetched_at)
+    pages = 0
+    total = 0
+
+    def flush(segment):
+        events, fetched_at = buffers.pop(segment, ([], None))
         if events:
-            db.upsert_events(events, classification=segment)
-            print(f"  {genre_label}: {len(events)} evenements")
-            total += len(events)
-        time.sleep(0.5)
+            write_events(db, dedup, client.SOURCE, events, segment, embedder, fetched_at=fetched_at)
 
+    for record in iter_records(path):
+        events = client.parse_page(record["response"])
+        pages += 1
+        total += len(events)
+        buffered, fetched_at = buffers.get(record["segment"], ([], record["fetched_at"]))
+        buffered.extend(events)
+        buffers[record["segment"]] = (buffered, min(fetched_at, record["fetched_at"]))
+        if len(buffered) >= UPSERT_BATCH:
+            flush(record["segment"])
+    for segment in list(buffers):
+        flush(segment)
+
+    print(f"{pages} pages rejouees depuis {path} : {total} evenements.")
     return total
 
 
-def embed(db):
-    events = db.get_all_events()
-    if not events:
+def embed(db, index_type="flat", nlist=0,
+          nprobe=VectorStore.DEFAULT_NPROBE, ef_search=VectorStore.DEFAULT_EF_SEARCH, rebuild=False,
+          embedding_model=EMBEDDING_MODEL):
+    """Build or update the FAISS index. embedding_model: name, or an already loaded model.
+
+    The dates of a show (data.shows) are indexed as one entry, embedded once:
+    its representative listing is the one already indexed if any, else one
+    with a cached vector, else the earliest.
+    """
+    listings = db.get_all_events()
+    if not listings:
         print("Aucun evenement en base.")
         return
 
-    print(f"\nCreation des embeddings pour {len(events)} evenements...")
-    vs = VectorStore(embedding_model="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
-    vs.add_events(events)
+    vs = VectorStore(embedding_model=embedding_model,
+                     index_type=index_type, nlist=nlist, nprobe=nprobe, ef_search=ef_search)
+    cache = EmbeddingCache(db, EMBEDDING_MODEL)
+    update = not rebuild and vs.load() and vs.index_type == index_type
+
+    events = group_shows(listings, prefer=(set(vs.rows) if update else set(), cache.cached_ids(listings)))
+    print(f"\n{len(listings)} evenements, {len(events)} apres regroupement des representations")
+
+    if update:
+        # Delta: only new/modified events go into the loaded index, vanished ones are dropped
+        vs.set_search_params(nprobe=nprobe, ef_search=ef_search)
+        changed = [e for e in events if vs.get(e.id) != e]
+        current_ids = {e.id for e in events}
+        gone = [event_id for event_id in vs.rows if event_id not in current_ids]
+        print(f"\nMise a jour de l'index : {len(changed)} nouveaux/modifies, {len(gone)} supprimes...")
+        if changed:
+            vs.upsert_events(changed, cache.vectors_for(changed, vs.encode))
+        vs.remove_events(gone)
+    else:
+        print(f"\nCreation des embeddings pour {len(events)} evenements (index {index_type})...")
+        vs = VectorStore(embedding_model=vs.embedding_model,
+                         index_type=index_type, nlist=nlist, nprobe=nprobe, ef_search=ef_search)
+        vs.add_events(events, cache.vectors_for(events, vs.encode))
+
+    cache.record_run()
+    print(f"Cache d'embeddings : {cache.hits} reutilises, {cache.misses} encodes")
     vs.save()
-    print(f"Index FAISS sauvegarde : {vs.count()} vecteurs dans db/")
+    print(f"Index FAISS {vs.index_type} sauvegarde : {vs.count()} vecteurs dans db/")
+    # Rebuilt on the saved rows: the BM25 index is keyed by store row
+    lexical = LexicalIndex.build(vs.event_map)
+    lexical.save(vs.persist_dir)
+    print(f"Index lexical sauvegarde : {len(lexical.vocabulary)} termes")
 
 
 def print_stats(db):
-    print(f"\nTotal : {db.count()} evenements")
+    print(f"\nTotal : {db.count()} evenements ({db.count_stale()} obsoletes)")
     stats = db.stats()
 
+    print("\nSources (annonces liees) :")
+    for source, c in db.count_by_source():
+        print(f"  {source}: {c}")
+
     print("\nClassifications :")
     for cls, c in stats["classifications"]:
         print(f"  {cls or '(aucune)'}: {c}")
@@ -150,13 +579,47 @@ def print_stats(db):
     for v, c in stats["cities"]:
         print(f"  {v or '(inconnue)'}: {c}")
 
+    hits = db.get_meta("embed_cache_hits")
+    misses = db.get_meta("embed_cache_misses")
+    print(f"\nCache d'embeddings : {db.count_embeddings()} vecteurs")
+    if hits is not None:
+        total = int(hits) + int(misses)
+        rate = int(hits) / total if total else 0
+        print(f"  Dernier run : {hits} hits, {misses} misses ({rate:.0%} hit rate)")
+
 
 def main():
-    parser = argparse.ArgumentParser(description="Ingestion des evenements Ticketmaster FR")
+    parser = argparse.ArgumentParser(description="Ingestion des evenements Ticketmaster (et Eventbrite) FR")
     parser.add_argument("--embed-only", action="store_true",
                         help="Re-generer FAISS depuis SQLite sans re-fetcher")
     parser.add_argument("--stats", action="store_true",
                         help="Afficher les stats de la base")
+    parser.add_argument("--index-type", choices=VectorStore.INDEX_TYPES, default="flat",
+                        help="Type d'index FAISS (flat = recherche exacte)")
+    parser.add_argument("--nlist", type=int, default=0,
+                        help="Nombre de listes IVF (0 = ~4*sqrt(N))")
+    parser.add_argument("--nprobe", type=int, default=VectorStore.DEFAULT_NPROBE,
+                        help="Listes IVF visitees par requete")
+    parser.add_argument("--ef-search", type=int, default=VectorStore.DEFAULT_EF_SEARCH,
+                        help="Taille de la file de recherche HNSW")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Reconstruire l'index FAISS au lieu de le mettre a jour")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Ne recuperer que les evenements mis en vente depuis la derniere synchro de "
+                             "chaque requete (ni modifications ni retraits : run complet force tous les "
+                             f"{MAX_INCREMENTAL_RUNS} runs)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Reprendre une ingestion interrompue depuis son dernier checkpoint")
+    parser.add_argument("--archive", nargs="?", const=RawArchive.DEFAULT_DIR, metavar="DIR",
+                        help=f"Archiver les reponses brutes (JSONL gzip) dans DIR (defaut : {RawArchive.DEFAULT_DIR})")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="Re-ingerer une archive (fichier ou dossier) au lieu d'interroger l'API")
+    parser.add_argument("--sources", default=f"{TicketmasterClient.SOURCE},{EventbriteClient.SOURCE}",
+                        help="Sources a interroger, separees par des virgules (Ticketmaster toujours inclus)")
+    parser.add_argument("--workers", type=int, default=FETCH_WORKERS,
+                        help="Requetes Ticketmaster en parallele")
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND,
+                        help="Requetes Ticketmaster par seconde (toutes threads confondues)")
     args = parser.parse_args()
 
     db = EventDatabase()
@@ -166,13 +629,35 @@ def main():
         db.close()
         return
 
+    model = EMBEDDING_MODEL
     if not args.embed_only:
-        print("Recuperation des evenements Ticketmaster FR...")
-        total = fetch_all(db)
-        print(f"\n{total} evenements recuperes au total (avant dedup).")
+        # Events are encoded in the background while pages keep coming;
+        # embed() then finds them in the embedding cache
+        model = SentenceTransformer(EMBEDDING_MODEL)
+        embedder = BackgroundEmbedder(EmbeddingCache(db, EMBEDDING_MODEL), model.encode, key=show_key)
+        archive = RawArchive.for_run(args.archive) if args.archive and not args.replay else None
+        try:
+            if args.replay:
+                print(f"Rejeu des archives {args.replay}...")
+                total = replay(db, args.replay, embedder=embedder)
+            else:
+                sources = build_sources(args.sources.split(","))
+                print(f"Recuperation des evenements FR "
+                      f"({', '.join([TicketmasterClient.SOURCE] + [s.name for s in sources])})...")
+                total = fetch_all(db, workers=args.workers, rate=args.rate, incremental=args.incremental,
+                                  embedder=embedder, resume=args.resume, archive=archive, sources=sources)
+        finally:
+            # Batches already encoded are persisted: a resumed run finds them in the cache
+            embedder.close()
+            if archive is not None:
+                archive.close()
+                print(f"{archive.pages} pages brutes archivees dans {archive.path}")
+        print(f"\n{total} evenements recuperes au total (avant dedup), {embedder.encoded} encodes au fil de l'eau, "
+              f"{embedder.cache.hits} deja en cache.")
 
     print_stats(db)
-    embed(db)
+    embed(db, index_type=args.index_type, nlist=args.nlist,
+          nprobe=args.nprobe, ef_search=args.ef_search, rebuild=args.rebuild, embedding_model=model)
     db.close()
     print("\nIngestion terminee.")
 
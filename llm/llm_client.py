@@ -1,14 +1,28 @@
 import logging
-from openai import OpenAI
+import time
+from openai import OpenAI, APIError
 from data.event import Event
+from llm.prompt_budget import EVENT_FORMAT, TokenCounter, compact_descriptions, pack
 
 log = logging.getLogger("culturai.llm_client")
 
 
 class LLMClient:
-    def __init__(self, api_key, model="gpt-3.5-turbo"):
+    MAX_DATES = 8  # dates listed per grouped show
+    DEFAULT_PROMPT_BUDGET = 2000  # tokens of the user prompt
+
+    def __init__(self, api_key, model="gpt-3.5-turbo", prompt_budget=DEFAULT_PROMPT_BUDGET):
         self.client = OpenAI(api_key=api_key)
         self.model = model
+        self.prompt_budget = prompt_budget
+        self._count_tokens = None
+
+    @property
+    def count_tokens(self):
+        # Built on first prompt: tiktoken may fetch its encoding file
+        if self._count_tokens is None:
+            self._count_tokens = TokenCounter(self.model)
+        return self._count_tokens
 
     def generate_suggestion(self, query, ranked_events, profile=None, distances=None):
         """Generate recommendation from ranked events.
@@ -16,14 +30,53 @@ class LLMClient:
         Args:
             ranked_events: list of (Event, l2_distance) tuples from FAISS
         """
+        messages = self._messages(query, ranked_events, profile, distances)
+        return self._complete(messages)
+
+    def stream_suggestion(self, query, ranked_events, profile=None, distances=None):
+        """Same recommendation as generate_suggestion, yielded as text chunks as they arrive.
+
+        Falls back to the blocking call (one chunk) when the stream cannot be opened.
+        """
+        messages = self._messages(query, ranked_events, profile, distances)
+        start = time.perf_counter()
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.8,
+                max_tokens=3000,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+        except APIError as e:
+            log.warning("Streaming indisponible (%s) -> appel bloquant", e)
+            yield self._complete(messages)
+            return
+
+        parts = []
+        usage = None
+        first_token_s = None
+        for chunk in stream:
+            # With include_usage, the last chunk carries the usage and no choices
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            if first_token_s is None:
+                first_token_s = time.perf_counter() - start
+            parts.append(chunk.choices[0].delta.content)
+            yield parts[-1]
+
+        total_s = time.perf_counter() - start
+        log.info("Latence LLM (streaming) : premier token %.0f ms, total %.0f ms",
+                 (first_token_s if first_token_s is not None else total_s) * 1000, total_s * 1000)
+        self._log_response("".join(parts).strip(), usage)
+
+    def _messages(self, query, ranked_events, profile, distances):
         prompt = self._build_prompt(query, ranked_events, profile, distances)
         system = self._system_prompt()
 
-        messages = [
-            {"role": "system", "content": system},
-            {"role": "user", "content": prompt},
-        ]
-
         log.info("--- Appel GPT recommandation ---")
         log.info("Modele : %s, temperature=0.8, max_tokens=3000", self.model)
         log.info("Evenements fournis au LLM : %d", len(ranked_events))
@@ -32,6 +85,13 @@ class LLMClient:
         log.debug("User prompt LLM",
                   extra={"json_data": {"user_prompt": prompt}})
 
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt},
+        ]
+
+    def _complete(self, messages):
+        start = time.perf_counter()
         response = self.client.chat.completions.create(
             model=self.model,
             messages=messages,
@@ -40,16 +100,19 @@ class LLMClient:
         )
 
         result = response.choices[0].message.content.strip()
+        log.info("Latence LLM (bloquant) : total %.0f ms", (time.perf_counter() - start) * 1000)
+        self._log_response(result, response.usage)
+        return result
 
+    @staticmethod
+    def _log_response(result, usage):
         log.debug("Reponse GPT recommandation",
                   extra={"json_data": {
                       "response_preview": result[:500],
                       "response_length": len(result),
-                      "usage": {"prompt_tokens": response.usage.prompt_tokens,
-                                "completion_tokens": response.usage.completion_tokens,
-                                "total_tokens": response.usage.total_tokens}}})
-
-        return result
+                      "usage": usage and {"prompt_tokens": usage.prompt_tokens,
+                                          "completion_tokens": usage.completion_tokens,
+                                          "total_tokens": usage.total_tokens}}})
 
     def _system_prompt(self):
         return (
@@ -75,43 +138,92 @@ class LLMClient:
         )
 
     def _build_prompt(self, query, ranked_events, profile=None, distances=None):
+        """User prompt with one compact line per event, packed in rank order
+        until the prompt reaches prompt_budget tokens."""
         count = len(ranked_events)
+        events = [e for e, _ in ranked_events]
+        lines = [
+            self._compact_event(rank, e, description, distances.get(e.id) if distances else None)
+            for rank, (e, description) in enumerate(zip(events, compact_descriptions(events)), 1)
+        ]
 
-        event_details = "\n\n".join([
-            self._format_event(e, distances.get(e.id) if distances else None)
-            for e, _ in ranked_events
-        ])
-
-        parts = []
-
+        head = []
         if profile:
-            parts.append(f"Profil de l'utilisateur :\n{profile.to_prompt_context()}")
-
-        parts.append(f"L'utilisateur cherche : \"{query}\"")
-
-        parts.append(f"{count} evenements correspondent a ses criteres.")
-
-        parts.append(f"Voici les {count} evenements tries par pertinence semantique :\n\n{event_details}")
-        parts.append(
+            head.append(f"Profil de l'utilisateur :\n{profile.to_prompt_context()}")
+        head.append(f"L'utilisateur cherche : \"{query}\"")
+        tail = (
             "Recommande tous les evenements qui valent le coup pour cette personne. "
             "Pour chacun, explique pourquoi ca va lui plaire en te basant sur ses gouts, "
             "donne envie avec une description vivante de l'ambiance, "
             "et inclus le lien de billetterie pour reserver. "
             "Si certains evenements ne sont vraiment pas adaptes, ecarte-les."
         )
-
-        return "\n\n".join(parts)
+        header = f"Voici les evenements tries par pertinence semantique, un par ligne ({EVENT_FORMAT}) :"
+        # The count line is charged at the full count: the packed count has no more digits
+        fixed_tokens = self.count_tokens("\n\n".join(head + [self._count_line(count), header, tail]))
+        lines, _ = pack(lines, self.prompt_budget - fixed_tokens, self.count_tokens)
+
+        head.append(self._count_line(len(lines)))
+        prompt = "\n\n".join(head + [header + "\n" + "\n".join(lines), tail])
+
+        # The same packed events in the detailed multi-line format, for the savings log
+        detailed = "\n\n".join(self._format_event(e, distances.get(e.id) if distances else None)
+                                for e in events[:len(lines)])
+        tokens = self.count_tokens(prompt)
+        detailed_tokens = fixed_tokens + self.count_tokens(detailed)
+        log.info("Prompt : %d/%d evenements, %d tokens (budget %d, format detaille %d, economie %d)",
+                 len(lines), count, tokens, self.prompt_budget, detailed_tokens, detailed_tokens - tokens)
+        return prompt
+
+    @staticmethod
+    def _count_line(count):
+        return f"{count} evenements correspondent a ses criteres."
+
+    def _compact_event(self, rank, e: Event, description, distance_km=None):
+        """One line in EVENT_FORMAT order, "-" for missing fields."""
+        if e.occurrences:
+            # A show on several dates is one entry with its date list
+            dates = ", ".join(o.date[:16] for o in e.occurrences[:self.MAX_DATES])
+            more = len(e.occurrences) - self.MAX_DATES
+            when = f"{len(e.occurrences)} dates : {dates}" + (f" et {more} autres" if more > 0 else "")
+            prices = [o.price for o in e.occurrences if o.price]
+            price = f"a partir de {min(prices):.0f} EUR" if prices else ""
+        else:
+            when = e.date[:16]
+            price = f"{e.price:.0f} EUR" if e.price else ""
+        fields = [
+            e.name,
+            e.genre,
+            ", ".join(part for part in (e.venue, e.city) if part),
+            when,
+            price,
+            f"{distance_km} km" if distance_km is not None else "",
+            description,
+            e.url,
+        ]
+        return f"{rank}. " + " | ".join(field or "-" for field in fields)
 
     def _format_event(self, e: Event, distance_km=None):
+        """Detailed multi-line block (the format used before compact lines)."""
         lines = [
             f"Titre : {e.name}",
             f"Genre : {e.genre}",
             f"Lieu : {e.venue}",
             f"Ville : {e.city}",
-            f"Date : {e.date}",
         ]
-        if e.price:
-            lines.append(f"Prix : {e.price:.0f} EUR")
+        if e.occurrences:
+            # A show on several dates is one entry with its date list
+            dates = ", ".join(o.date for o in e.occurrences[:self.MAX_DATES])
+            more = len(e.occurrences) - self.MAX_DATES
+            lines.append(f"Dates ({len(e.occurrences)} representations) : {dates}"
+                         + (f" et {more} autres" if more > 0 else ""))
+            prices = [o.price for o in e.occurrences if o.price]
+            if prices:
+                lines.append(f"Prix : a partir de {min(prices):.0f} EUR")
+        else:
+            lines.append(f"Date : {e.date}")
+            if e.price:
+                lines.append(f"Prix : {e.price:.0f} EUR")
         if distance_km is not None:
             lines.append(f"Distance : {distance_km} km")
         lines.append(f"Description : {e.description}")
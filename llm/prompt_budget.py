@@ -0,0 +1,72 @@
+import re
+import logging
+
+log = logging.getLogger("culturai.prompt_budget")
+
+MAX_DESCRIPTION_CHARS = 200
+# Header of the compact event list: one event per line, fields in this order
+EVENT_FORMAT = "rang. titre | genre | lieu, ville | date(s) | prix | distance | description | lien"
+
+
+class TokenCounter:
+    """Counts prompt tokens with the model's tiktoken encoding, or ~4 characters
+    per token when tiktoken is not installed."""
+
+    def __init__(self, model):
+        try:
+            import tiktoken
+        except ImportError:
+            log.info("tiktoken non installe -> estimation a 4 caracteres par token")
+            self.encoding = None
+            return
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("cl100k_base")
+
+    def __call__(self, text):
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text))
+
+
+def shorten(text, max_chars=MAX_DESCRIPTION_CHARS):
+    """One-line text cut at a word boundary."""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0].rstrip(",;:.") + "..."
+
+
+def _key(text):
+    return re.sub(r"\W+", " ", text.lower()).strip()
+
+
+def compact_descriptions(events):
+    """Per-event one-line descriptions, "" when empty, a repeat of the title, or
+    already given for an earlier event (venue or promoter boilerplate)."""
+    seen = set()
+    descriptions = []
+    for event in events:
+        description = shorten(event.description or "")
+        key = _key(description)
+        if not key or key == _key(event.name) or key in seen:
+            descriptions.append("")
+        else:
+            seen.add(key)
+            descriptions.append(description)
+    return descriptions
+
+
+def pack(lines, budget, count_tokens):
+    """Longest prefix of lines (rank order) whose token count fits in budget;
+    always at least one line. Returns (lines, tokens)."""
+    packed = []
+    total = 0
+    for line in lines:
+        tokens = count_tokens(line) + 1  # the newline
+        if packed and total + tokens > budget:
+            break
+        packed.append(line)
+        total += tokens
+    return packed, total
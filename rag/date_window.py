@@ -0,0 +1,120 @@
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from data.event import EVENT_TZ
+
+MONTHS = {
+    "janvier": 1, "fevrier": 2, "mars": 3, "avril": 4, "mai": 5, "juin": 6,
+    "juillet": 7, "aout": 8, "septembre": 9, "octobre": 10, "novembre": 11, "decembre": 12,
+}
+_MONTH_ALT = "|".join(MONTHS)
+
+_RANGE_PATTERN = re.compile(rf"\bdu (\d{{1,2}})(?: ({_MONTH_ALT}))? au (\d{{1,2}}) ({_MONTH_ALT})\b")
+_DAY_PATTERN = re.compile(rf"\b(\d{{1,2}}) ({_MONTH_ALT})\b")
+_MONTH_PATTERN = re.compile(rf"\ben ({_MONTH_ALT})\b")
+
+
+def _fold(text):
+    """Lowercase, strip accents and apostrophe variants."""
+    text = unicodedata.normalize("NFKD", text.lower().replace("’", "'"))
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _day(dt):
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _window(start, end_day):
+    """(start, last second of end_day) as epoch seconds."""
+    return int(start.timestamp()), int((_day(end_day) + timedelta(days=1)).timestamp()) - 1
+
+
+def _month_start(today, month):
+    """First day of the next occurrence of month (this year unless already over)."""
+    year = today.year if month >= today.month else today.year + 1
+    return today.replace(year=year, month=month, day=1)
+
+
+def _next_month(dt):
+    return dt.replace(year=dt.year + dt.month // 12, month=dt.month % 12 + 1, day=1)
+
+
+def _date(today, day, month):
+    year = today.year
+    try:
+        dt = today.replace(year=year, month=month, day=day)
+        if dt < today:
+            dt = dt.replace(year=year + 1)
+        return dt
+    except ValueError:
+        return None
+
+
+def start_of_today(now=None):
+    now = now or datetime.now(EVENT_TZ)
+    return int(_day(now).timestamp())
+
+
+def resolve_date_window(text, now=None):
+    """Turn a French date expression ("ce weekend", "demain", "du 15 au 20 mars"...)
+    into an epoch (start, end) window. Returns (0, 0) when nothing is recognised."""
+    if not text:
+        return 0, 0
+    text = _fold(text)
+    now = now or datetime.now(EVENT_TZ)
+    today = _day(now)
+    weekday = today.weekday()  # 0 = lundi
+
+    match = _RANGE_PATTERN.search(text)
+    if match:
+        end_month = MONTHS[match.group(4)]
+        start_month = MONTHS[match.group(2)] if match.group(2) else end_month
+        start = _date(today, int(match.group(1)), start_month)
+        end = _date(today, int(match.group(3)), end_month)
+        if start and end:
+            if end < start:
+                end = end.replace(year=end.year + 1)
+            return _window(start, end)
+
+    if "ce soir" in text or "cette nuit" in text:
+        return _window(today.replace(hour=18), today)
+    if "apres-demain" in text or "apres demain" in text:
+        return _window(today + timedelta(days=2), today + timedelta(days=2))
+    if "demain" in text:
+        return _window(today + timedelta(days=1), today + timedelta(days=1))
+    if "aujourd'hui" in text or "aujourdhui" in text or "aujourd hui" in text:
+        return _window(today, today)
+
+    if re.search(r"\bweek-?end prochain\b|\bprochain week-?end\b", text):
+        friday = today + timedelta(days=4 - weekday + 7)
+        return _window(friday.replace(hour=18), friday + timedelta(days=2))
+    if re.search(r"\bweek-?end\b", text):
+        if weekday >= 5:
+            return _window(today, today + timedelta(days=6 - weekday))
+        friday = today + timedelta(days=4 - weekday)
+        return _window(max(friday.replace(hour=18), now), friday + timedelta(days=2))
+
+    if "semaine prochaine" in text or "prochaine semaine" in text:
+        monday = today + timedelta(days=7 - weekday)
+        return _window(monday, monday + timedelta(days=6))
+    if "cette semaine" in text:
+        return _window(today, today + timedelta(days=6 - weekday))
+
+    if "mois prochain" in text or "prochain mois" in text:
+        first = _next_month(today)
+        return _window(first, _next_month(first) - timedelta(days=1))
+    if "ce mois" in text:
+        return _window(today, _next_month(today) - timedelta(days=1))
+
+    match = _DAY_PATTERN.search(text)
+    if match:
+        day = _date(today, int(match.group(1)), MONTHS[match.group(2)])
+        if day:
+            return _window(day, day)
+
+    match = _MONTH_PATTERN.search(text)
+    if match:
+        first = _month_start(today, MONTHS[match.group(1)])
+        return _window(max(first, today), _next_month(first) - timedelta(days=1))
+
+    return 0, 0
@@ -1,6 +1,10 @@
 import logging
-from dataclasses import dataclass, field
-from geo.distance import compute_distance
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+import numpy as np
+from data.event import EVENT_TZ
+from geo.distance import get_city_coords
+from geo.spatial import GridIndex
 
 log = logging.getLogger("culturai.filters")
 
@@ -14,10 +18,8 @@ class Filters:
     max_distance_km: int = 0
     genres: list = field(default_factory=list)
     budget_max: float = 0
-
-    @property
-    def is_empty(self):
-        return not self.city and not self.genres and self.budget_max <= 0
+    date_from: int = 0  # epoch seconds, 0 = unbounded
+    date_to: int = 0
 
     def describe(self):
         """Resume FR des filtres actifs pour les logs."""
@@ -28,9 +30,15 @@ class Filters:
             parts.append(f"genres={self.genres}")
         if self.budget_max > 0:
             parts.append(f"budget<={self.budget_max}")
+        if self.date_from or self.date_to:
+            parts.append(f"dates={_format_ts(self.date_from)}..{_format_ts(self.date_to)}")
         return ", ".join(parts) if parts else "(aucun filtre)"
 
 
+def _format_ts(ts):
+    return datetime.fromtimestamp(ts, EVENT_TZ).strftime("%Y-%m-%d %H:%M") if ts else ""
+
+
 def _match_genre(event_genre, filter_genres):
     """Match genre: exact or substring bidirectional."""
     if not event_genre or not filter_genres:
@@ -45,52 +53,190 @@ def _match_genre(event_genre, filter_genres):
     return False
 
 
-def apply_filters(event_map, filters):
-    """Apply hard filters to event_map. Returns (eligible_indices, distances_km).
+class FilterEngine:
+    """Event columns precomputed once per store load, for vectorized filtering.
 
+    Start times and prices are also kept per occurrence: a grouped show
+    (data.shows) has one row but one occurrence per date, a one-off event
+    one occurrence.
+    """
+
+    def __init__(self, latitude, longitude, price, genre_codes, genre_names, live, timestamps=None,
+                 occurrences=None, end_timestamps=None):
+        """occurrences: optional (row, timestamp, price, end_timestamp) arrays,
+        one entry per date; by default each row is its own single occurrence."""
+        self.latitude = np.asarray(latitude, dtype=np.float64)
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        self.has_coords = (self.latitude != 0) & (self.longitude != 0)
+        located = np.flatnonzero(self.has_coords)
+        self.spatial = GridIndex(self.latitude[located], self.longitude[located], rows=located)
+        self.price = np.asarray(price, dtype=np.float64)
+        self.genre_codes = np.asarray(genre_codes)
+        self.genre_names = genre_names  # {code: genre string} for codes present
+        self.live = np.asarray(live, dtype=bool)
+        timestamps = np.zeros(len(self.live), dtype=np.int64) if timestamps is None else timestamps
+        if end_timestamps is None:
+            end_timestamps = np.zeros(len(self.live), dtype=np.int64)
+        if occurrences is None:
+            occurrences = (np.arange(len(self.live)), timestamps, self.price, end_timestamps)
+        occ_row, occ_times, occ_price, occ_end = occurrences
+        self.occ_row = np.asarray(occ_row, dtype=np.int64)
+        self.occ_price = np.asarray(occ_price, dtype=np.float64)
+        occ_times = np.asarray(occ_times, dtype=np.int64)
+        self.occ_has_time = occ_times != 0
+        # Occurrences with a known end (exhibitions, festivals), checked apart
+        self.with_end = np.flatnonzero(np.asarray(occ_end) != 0)
+        self.with_end_times = occ_times[self.with_end]
+        self.with_end_ends = np.asarray(occ_end, dtype=np.int64)[self.with_end]
+        # Occurrences sorted by start time: a date window is one binary-search slice
+        self.time_order = np.argsort(occ_times, kind="stable")
+        self.sorted_times = occ_times[self.time_order]
+
+    @staticmethod
+    def from_table(table):
+        """Build from an EventTable (data.event_table)."""
+        genre_codes = table.column("genre")
+        genre_names = {int(c): table.string(int(c)) for c in np.unique(genre_codes[table.live])}
+        timestamps, price = table.column("timestamp"), table.column("price")
+        end_timestamps = table.column("end_timestamp")
+        occurrences = None
+        grouped = list(table.occurrences())
+        if grouped:
+            single = np.ones(table.n_rows, dtype=bool)
+            single[[row for row, _ in grouped]] = False
+            rows, times, prices, ends = zip(*[(row, o.timestamp, o.price, o.end_timestamp)
+                                              for row, occ in grouped for o in occ])
+            occurrences = (np.concatenate([np.flatnonzero(single), rows]),
+                           np.concatenate([timestamps[single], times]),
+                           np.concatenate([price[single], prices]),
+                           np.concatenate([end_timestamps[single], ends]))
+        return FilterEngine(table.column("latitude"), table.column("longitude"),
+                            price, genre_codes, genre_names, table.live.copy(),
+                            timestamps, occurrences, end_timestamps)
+
+    def __len__(self):
+        return int(self.live.sum())
+
+    def within(self, lat, lon, max_km):
+        """Rows whose rounded distance is <= max_km, and a per-row array of
+        rounded km (NaN outside the radius or without coordinates)."""
+        # Half a km of slack: the filter compares rounded distances
+        rows, d = self.spatial.within_radius(lat, lon, max_km + 0.5)
+        d = np.rint(d)
+        near = rows[d <= max_km]
+        distances = np.full(len(self.live), np.nan)
+        distances[rows] = d
+        return near, distances
+
+    def between(self, date_from, date_to):
+        """Occurrence mask: starting within [date_from, date_to] (0 = unbounded),
+        started before date_from but still running then (known end), or undated."""
+        lo = np.searchsorted(self.sorted_times, max(date_from, 1), side="left")
+        hi = (np.searchsorted(self.sorted_times, date_to, side="right")
+              if date_to else len(self.sorted_times))
+        in_window = ~self.occ_has_time
+        in_window[self.time_order[lo:hi]] = True
+        if date_from:
+            ongoing = (self.with_end_times < date_from) & (self.with_end_ends >= date_from)
+            in_window[self.with_end[ongoing]] = True
+        return in_window
+
+    def any_occurrence(self, occurrence_mask):
+        """Row mask: rows with at least one occurrence in occurrence_mask."""
+        rows = np.zeros(len(self.live), dtype=bool)
+        rows[self.occ_row[occurrence_mask]] = True
+        return rows
+
+    def genre_mask(self, filter_genres):
+        matching = [c for c, g in self.genre_names.items() if _match_genre(g, filter_genres)]
+        return np.isin(self.genre_codes, matching)
+
+
+def apply_filters(engine, filters):
+    """Apply hard filters as boolean masks. Returns (eligible_rows, distances_km) arrays.
+
+    distances_km is aligned with eligible_rows (NaN when not computable).
+    Date and budget apply per occurrence: a show passes if one of its dates
+    is both within the window and within budget.
+    - Date: events starting outside [date_from, date_to] are eliminated, unless
+      they started earlier and their known end is not past date_from (ongoing).
+      Events without date pass.
     - Distance: events beyond max_distance_km are eliminated. Events without coords pass.
     - Genre: events not matching any filter genre are eliminated.
     - Budget: events over budget_max are eliminated. Events with price=0 (unknown) pass.
     """
     log.info("--- Application des filtres ---")
     log.info("Filtres : %s", filters.describe())
-    log.info("Evenements totaux : %d", len(event_map))
+    log.info("Evenements totaux : %d", len(engine))
 
-    eligible = []
-    distances_km = {}
+    mask = engine.live.copy()
+    occ_ok = None  # occurrences passing the date filter
+    distances = None
     rejected_distance = 0
     rejected_genre = 0
     rejected_budget = 0
-
-    for idx, event in event_map.items():
-        # Distance filter
-        if filters.city and filters.max_distance_km > 0:
-            d = compute_distance(filters.city, event)
-            if d is not None:
-                distances_km[event.id] = d
-                if d > filters.max_distance_km:
-                    rejected_distance += 1
-                    continue
-            # d is None (no coords) → event passes
-
-        # Genre filter
-        if filters.genres:
-            if not _match_genre(event.genre, filters.genres):
-                rejected_genre += 1
-                continue
-
-        # Budget filter
-        if filters.budget_max > 0:
-            if event.price and event.price > filters.budget_max:
-                rejected_budget += 1
-                continue
-
-        eligible.append(idx)
-
-    log.info("Filtrage termine : %d eligibles, rejetes: distance=%d, genre=%d, budget=%d",
-             len(eligible), rejected_distance, rejected_genre, rejected_budget)
-
-    return eligible, distances_km
+    rejected_date = 0
+
+    # Date filter
+    if filters.date_from or filters.date_to:
+        occ_ok = engine.between(filters.date_from, filters.date_to)  # no date → passes
+        out_of_window = mask & ~engine.any_occurrence(occ_ok)
+        rejected_date = int(out_of_window.sum())
+        mask &= ~out_of_window
+
+    # Distance filter
+    origin = get_city_coords(filters.city) if filters.max_distance_km > 0 else None
+    if origin:
+        near, distances = engine.within(origin[0], origin[1], filters.max_distance_km)
+        in_radius = ~engine.has_coords  # no coords → passes
+        in_radius[near] = True
+        too_far = mask & ~in_radius
+        rejected_distance = int(too_far.sum())
+        mask &= ~too_far
+
+    # Genre filter
+    if filters.genres:
+        wrong_genre = mask & ~engine.genre_mask(filters.genres)
+        rejected_genre = int(wrong_genre.sum())
+        mask &= ~wrong_genre
+
+    # Budget filter
+    if filters.budget_max > 0:
+        affordable = (engine.occ_price == 0) | (engine.occ_price <= filters.budget_max)
+        if occ_ok is not None:
+            affordable &= occ_ok
+        over_budget = mask & ~engine.any_occurrence(affordable)
+        rejected_budget = int(over_budget.sum())
+        mask &= ~over_budget
+
+    eligible = np.flatnonzero(mask)
+
+    log.info("Filtrage termine : %d eligibles, rejetes: date=%d, distance=%d, genre=%d, budget=%d",
+             len(eligible), rejected_date, rejected_distance, rejected_genre, rejected_budget)
+
+    if distances is None:
+        return eligible, np.full(len(eligible), np.nan)
+    return eligible, distances[eligible]
+
+
+def matching_dates(event, filters):
+    """event limited to the occurrences that pass the date window and budget,
+    as apply_filters judges them, so that the prompt only lists (and prices)
+    those. A single remaining date makes it a plain one-off event."""
+    if not event.occurrences:
+        return event
+    kept = tuple(
+        o for o in event.occurrences
+        if (not o.timestamp or (max(o.timestamp, o.end_timestamp) >= filters.date_from
+                                and (not filters.date_to or o.timestamp <= filters.date_to)))
+        and (filters.budget_max <= 0 or not o.price or o.price <= filters.budget_max))
+    if not kept or kept == event.occurrences:
+        return event
+    if len(kept) == 1:
+        o = kept[0]
+        return replace(event, date=o.date, timestamp=o.timestamp, end_timestamp=o.end_timestamp,
+                       price=o.price, url=o.url, occurrences=())
+    return replace(event, occurrences=kept)
 
 
 def evaluate_results(count):
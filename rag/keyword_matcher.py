@@ -0,0 +1,64 @@
+import re
+
+
+class KeywordMatcher:
+    """Finds every keyword of a vocabulary in a text with one regex pass.
+
+    The keywords are compiled into a single trie-shaped pattern (shared
+    prefixes are factored, so matching at a position costs the depth of the
+    trie, not the size of the vocabulary), wrapped in a lookahead so that
+    overlapping occurrences are all seen. At each position the greedy
+    pattern yields the longest keyword; shorter keywords that are prefixes
+    of it are recovered from a precomputed table.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(dict.fromkeys(k for k in keywords if k))
+        self.rank = {k: i for i, k in enumerate(self.keywords)}
+
+        trie = {}
+        for word in self.keywords:
+            node = trie
+            for ch in word:
+                node = node.setdefault(ch, {})
+            node[""] = True
+
+        # keyword -> keywords that are a prefix of it (itself included)
+        self.prefixes = {}
+        for word in self.keywords:
+            node = trie
+            found = []
+            for i, ch in enumerate(word):
+                node = node[ch]
+                if "" in node:
+                    found.append(word[:i + 1])
+            self.prefixes[word] = found
+
+        body = _trie_pattern(trie) if self.keywords else "(?!)"
+        self.pattern = re.compile(f"(?=({body}))")
+
+    def find_all(self, text):
+        """Keywords occurring in text (substring semantics), in vocabulary order."""
+        found = set()
+        for match in self.pattern.finditer(text):
+            found.update(self.prefixes[match.group(1)])
+        return sorted(found, key=self.rank.__getitem__)
+
+    def longest(self, text):
+        """Longest keyword occurring in text (ties: first in vocabulary order), or None."""
+        best = None
+        for match in self.pattern.finditer(text):
+            word = match.group(1)
+            if best is None or (len(word), -self.rank[word]) > (len(best), -self.rank[best]):
+                best = word
+        return best
+
+
+def _trie_pattern(node):
+    alternatives = [re.escape(ch) + _trie_pattern(child)
+                    for ch, child in sorted(node.items()) if ch != ""]
+    if not alternatives:
+        return ""
+    body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+    # Greedy optional group: prefer the longer keyword, fall back to this one
+    return f"(?:{body})?" if "" in node else body
@@ -0,0 +1,153 @@
+import os
+import re
+import time
+import logging
+from collections import Counter
+import numpy as np
+from data.dedup import normalize
+
+log = logging.getLogger("culturai.lexical_index")
+
+# Elided articles and pronouns ("l'Olympia", "qu'il") are split off before folding
+ELISION = re.compile(r"\b(?:[cdjlmnst]|qu|jusqu|lorsqu|puisqu)['’]", re.IGNORECASE)
+STOPWORDS = frozenset("""
+    a au aux avec ce ces cet cette dans de des du en et il je la le les leur lui ma mes mon
+    ne nos notre on ou par pas pour qui que sa se ses son sur ta tes ton tu un une vos votre vous
+    the of and at in
+""".split())
+# Field weights of the BM25F-style term frequency
+FIELD_WEIGHTS = {"name": 3, "venue": 2, "description": 1}
+
+
+def tokenize(text):
+    """Accent-folded French tokens: elisions split, stopwords dropped, plurals stemmed."""
+    tokens = []
+    for token in normalize(ELISION.sub(" ", text or "")).split():
+        if token in STOPWORDS or len(token) < 2:
+            continue
+        if len(token) > 3 and token[-1] in "sx" and token[-2] != "s":
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked lists of rows: score(row) = sum of 1 / (k + rank). Returns rows, best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda row: -scores[row])
+
+
+class LexicalIndex:
+    """BM25 inverted index over Event.name, venue and description, keyed by store row.
+
+    Postings are stored as CSR arrays (term -> rows, weighted term
+    frequencies); a query scores every posting of its terms into one dense
+    array, so a candidate subset is a plain mask. Terms present in more than
+    max_df of the documents carry almost no BM25 weight and are skipped,
+    which bounds the work per query.
+    """
+
+    FILE = "lexical.npz"
+    K1 = 1.2
+    B = 0.75
+    MAX_DF = 0.25
+    BUDGET_MS = 20   # lexical search latency budget, logged when exceeded
+
+    def __init__(self, vocabulary, offsets, rows, tfs, doc_len, max_df=MAX_DF):
+        self.vocabulary = {term: i for i, term in enumerate(vocabulary)}
+        self.offsets = offsets
+        self.rows = rows
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.n_docs = int(np.count_nonzero(doc_len))
+        self.avg_len = float(doc_len.sum()) / max(self.n_docs, 1)
+        df = np.diff(offsets)
+        self.idf = np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self.max_postings = max(1, int(max_df * self.n_docs))
+
+    @property
+    def n_rows(self):
+        return len(self.doc_len)
+
+    @staticmethod
+    def build(table):
+        """Index the live rows of an EventTable (VectorStore.event_map)."""
+        start = time.perf_counter()
+        # Text fields are string codes: each distinct venue/description is tokenized once
+        tokenized = {}
+        columns = {field: table.column(field) for field in FIELD_WEIGHTS}
+        postings = {}
+        doc_len = np.zeros(table.n_rows, dtype=np.float32)
+        for row in table.live_rows().tolist():
+            counts = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                code = int(columns[field][row])
+                tokens = tokenized.get((field, code))
+                if tokens is None:
+                    tokens = tokenized[(field, code)] = tokenize(table.string(code))
+                for token in tokens:
+                    counts[token] += weight
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((row, tf))
+            doc_len[row] = sum(counts.values())
+
+        vocabulary = sorted(postings)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum([len(postings[t]) for t in vocabulary], out=offsets[1:])
+        flat = [p for t in vocabulary for p in postings[t]]
+        rows = np.array([r for r, _ in flat], dtype=np.int32)
+        tfs = np.array([tf for _, tf in flat], dtype=np.float32)
+        index = LexicalIndex(vocabulary, offsets, rows, tfs, doc_len)
+        log.info("Index lexical : %d termes, %d postings, %d documents en %.0f ms",
+                 len(vocabulary), len(rows), index.n_docs, (time.perf_counter() - start) * 1000)
+        return index
+
+    def search(self, text, rows=None, top_k=100):
+        """Top rows by BM25 for text, restricted to rows (array of store rows) if given.
+        Returns (rows, scores), best first; rows without any query term are left out."""
+        start = time.perf_counter()
+        scores = np.zeros(self.n_rows, dtype=np.float32)
+        for token in set(tokenize(text)):
+            term = self.vocabulary.get(token)
+            if term is None:
+                continue
+            lo, hi = self.offsets[term], self.offsets[term + 1]
+            if hi - lo > self.max_postings:
+                continue
+            docs, tf = self.rows[lo:hi], self.tfs[lo:hi]
+            norm = self.K1 * (1 - self.B + self.B * self.doc_len[docs] / self.avg_len)
+            # One posting per (term, row): plain fancy-index accumulation is safe
+            scores[docs] += self.idf[term] * tf * (self.K1 + 1) / (tf + norm)
+
+        candidates = np.flatnonzero(scores) if rows is None else np.asarray(rows, dtype=np.int64)
+        candidates = candidates[scores[candidates] > 0]
+        if top_k < len(candidates):
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms > self.BUDGET_MS:
+            log.warning("Recherche lexicale hors budget : %.1f ms (budget %d ms)", elapsed_ms, self.BUDGET_MS)
+        log.info("Recherche lexicale : %d resultats en %.1f ms", len(candidates), elapsed_ms)
+        return candidates, scores[candidates]
+
+    def save(self, persist_dir):
+        path = os.path.join(persist_dir, self.FILE)
+        vocabulary = sorted(self.vocabulary, key=self.vocabulary.get)
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez(f, vocabulary=np.array(vocabulary, dtype=str), offsets=self.offsets,
+                     rows=self.rows, tfs=self.tfs, doc_len=self.doc_len)
+        os.replace(f"{path}.tmp", path)
+
+    @staticmethod
+    def load(persist_dir):
+        """The index saved in persist_dir, or None."""
+        path = os.path.join(persist_dir, LexicalIndex.FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return LexicalIndex(data["vocabulary"].tolist(), data["offsets"], data["rows"],
+                                data["tfs"], data["doc_len"])
@@ -0,0 +1,104 @@
+import os
+import sqlite3
+import time
+import logging
+from collections import OrderedDict
+import numpy as np
+
+log = logging.getLogger("culturai.query_embedding_cache")
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU cache of query vectors, keyed by (model, text).
+
+    Entries live in memory; with spill_path, they are also written to an
+    SQLite table (bounded as well, LRU) so that later sessions reuse them.
+    """
+
+    DEFAULT_MAX_ENTRIES = 512
+    DEFAULT_MAX_SPILL_ENTRIES = 50_000
+
+    CREATE_TABLE = """
+        CREATE TABLE IF NOT EXISTS query_embeddings (
+            key TEXT PRIMARY KEY,
+            vector BLOB NOT NULL,
+            last_used REAL NOT NULL
+        )
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, spill_path=None,
+                 max_spill_entries=DEFAULT_MAX_SPILL_ENTRIES):
+        self.max_entries = max_entries
+        self.max_spill_entries = max_spill_entries
+        self._entries = OrderedDict()
+        self.conn = None
+        if spill_path:
+            os.makedirs(os.path.dirname(spill_path) or ".", exist_ok=True)
+            self.conn = sqlite3.connect(spill_path)
+            self.conn.execute(self.CREATE_TABLE)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_query_embeddings_last_used ON query_embeddings(last_used)")
+            self.conn.commit()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(model, text):
+        return f"{model}\n{text}"
+
+    def get(self, model, text):
+        key = self._key(model, text)
+        vec = self._entries.get(key)
+        if vec is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vec
+
+        if self.conn is not None:
+            row = self.conn.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+            if row:
+                self.conn.execute("UPDATE query_embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+                self.conn.commit()
+                vec = np.frombuffer(row[0], dtype=np.float32)
+                self._remember(key, vec)
+                self.disk_hits += 1
+                return vec
+
+        self.misses += 1
+        return None
+
+    def put(self, model, text, vec):
+        key = self._key(model, text)
+        vec = np.ascontiguousarray(vec, dtype=np.float32).ravel()
+        vec.flags.writeable = False
+        self._remember(key, vec)
+        if self.conn is not None:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                (key, vec.tobytes(), time.time()))
+            self.conn.execute(
+                "DELETE FROM query_embeddings WHERE key IN ("
+                "SELECT key FROM query_embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_spill_entries,))
+            self.conn.commit()
+
+    def _remember(self, key, vec):
+        self._entries[key] = vec
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.disk_hits + self.misses
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / total, 3) if total else 0.0,
+                "size": len(self._entries)}
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
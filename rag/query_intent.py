@@ -3,9 +3,14 @@ import logging
 from dataclasses import dataclass, field
 from openai import OpenAI
 from rag.filters import Filters, DEFAULT_RADIUS_KM
+from rag.date_window import resolve_date_window, start_of_today
+from rag.keyword_matcher import KeywordMatcher
+from geo.distance import CITY_COORDS
 
 log = logging.getLogger("culturai.query_intent")
 
+REFORMULATION_MODEL = "gpt-3.5-turbo"
+
 
 GENRE_KEYWORDS = {
     "musique": "Music", "musical": "Music", "musicale": "Music", "concert": "Music",
@@ -25,6 +30,18 @@ GENRE_KEYWORDS = {
     "festival": "Fairs & Festivals",
 }
 
+# Matchers compiled once per vocabulary: id(mapping) -> (mapping, size, matcher)
+_MATCHERS = {}
+
+
+def _matcher_for(mapping):
+    cached = _MATCHERS.get(id(mapping))
+    if cached is None or cached[0] is not mapping or cached[1] != len(mapping):
+        cached = (mapping, len(mapping), KeywordMatcher(mapping.keys()))
+        _MATCHERS[id(mapping)] = cached
+    return cached[2]
+
+
 _BUDGET_PATTERN = re.compile(
     r'(?:moins de|max|maximum|budget|pas plus de|sous les?)\s*(\d+)\s*(?:€|euros?|eur)?',
     re.IGNORECASE
@@ -36,12 +53,17 @@ class QueryIntent:
     city: str = ""
     genres: list = field(default_factory=list)
     budget_max: float = 0
+    date_from: int = 0
+    date_to: int = 0
     semantic_query: str = ""
     raw_query: str = ""
 
     @staticmethod
-    def extract(query, city_coords, genre_keywords, api_key):
-        """Extract intent from user query via heuristics + GPT reformulation."""
+    def extract(query, city_coords, genre_keywords, api_key, cache=None):
+        """Extract intent from user query via heuristics + GPT reformulation.
+
+        cache: optional ReformulationCache; a hit skips the GPT call.
+        """
         log.info("--- Extraction d'intent ---")
         log.info("Requete brute : %s", query)
 
@@ -49,15 +71,13 @@ class QueryIntent:
         query_lower = query.lower()
 
         # A) Heuristic: city detection (longest match first to avoid partial matches)
-        for city_key in sorted(city_coords.keys(), key=len, reverse=True):
-            if city_key in query_lower:
-                intent.city = city_key
-                break
+        intent.city = _matcher_for(city_coords).longest(query_lower) or ""
 
         # A) Heuristic: genre detection
         seen = set()
-        for keyword, genre in genre_keywords.items():
-            if keyword in query_lower and genre not in seen:
+        for keyword in _matcher_for(genre_keywords).find_all(query_lower):
+            genre = genre_keywords[keyword]
+            if genre not in seen:
                 intent.genres.append(genre)
                 seen.add(genre)
 
@@ -66,71 +86,65 @@ class QueryIntent:
         if match:
             intent.budget_max = float(match.group(1))
 
-        log.info("Heuristique -> ville=%s, genres=%s, budget=%s",
-                 intent.city or "(aucune)", intent.genres or "(aucun)", intent.budget_max or "(aucun)")
+        # A) Heuristic: date window ("ce weekend", "demain", "du 15 au 20 mars"...)
+        intent.date_from, intent.date_to = resolve_date_window(query)
+
+        log.info("Heuristique -> ville=%s, genres=%s, budget=%s, dates=%s",
+                 intent.city or "(aucune)", intent.genres or "(aucun)", intent.budget_max or "(aucun)",
+                 f"{intent.date_from}..{intent.date_to}" if intent.date_to else "(aucune)")
 
         # B) GPT semantic reformulation for FAISS
-        system_msg = (
-            "Reformule cette recherche d'evenements en mots-cles riches, "
-            "dans le style d'une description d'evenement culturel. "
-            "Extrais : type, style/ambiance, thematiques, ville, periode. "
-            "Transforme les negations en positifs (\"pas classique\" -> \"contemporain, moderne\"). "
-            "Reponds UNIQUEMENT la reformulation. Max 50 mots."
-        )
-        messages = [
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": query},
-        ]
-
-        log.debug("GPT reformulation request",
-                  extra={"json_data": {"model": "gpt-3.5-turbo", "messages": messages,
-                                       "temperature": 0.3, "max_tokens": 100}})
-
-        try:
-            client = OpenAI(api_key=api_key)
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0.3,
-                max_tokens=100,
-            )
-            intent.semantic_query = response.choices[0].message.content.strip()
-
-            log.debug("GPT reformulation response",
-                      extra={"json_data": {
-                          "semantic_query": intent.semantic_query,
-                          "usage": {"prompt_tokens": response.usage.prompt_tokens,
-                                    "completion_tokens": response.usage.completion_tokens,
-                                    "total_tokens": response.usage.total_tokens}}})
-        except Exception as e:
-            log.error("GPT reformulation echouee : %s — fallback sur requete brute", e)
-            intent.semantic_query = query
+        cached = cache.get(query, REFORMULATION_MODEL) if cache else None
+        if cached is not None:
+            intent.semantic_query = cached
+            log.info("Reformulation en cache (%d hits, %d misses dans cette session)", cache.hits, cache.misses)
+        else:
+            intent.semantic_query = _reformulate(query, api_key)
+            if cache and intent.semantic_query != query:
+                cache.put(query, REFORMULATION_MODEL, intent.semantic_query)
 
         log.info("Intent final",
                  extra={"json_data": {"city": intent.city, "genres": intent.genres,
                                       "budget_max": intent.budget_max,
+                                      "date_from": intent.date_from, "date_to": intent.date_to,
                                       "semantic_query": intent.semantic_query,
                                       "raw_query": intent.raw_query}})
         return intent
 
     def to_filters(self):
-        """Passe 1 : criteres heuristiques → filtres durs (query-only)."""
+        """Passe 1 : criteres heuristiques → filtres durs (query-only).
+
+        Sans fenetre de dates, les evenements deja passes sont exclus
+        (ceux encore en cours, dont la fin est connue, restent).
+        """
         return Filters(
             city=self.city,
             max_distance_km=DEFAULT_RADIUS_KM if self.city else 0,
             genres=list(self.genres),
-            budget_max=self.budget_max)
+            budget_max=self.budget_max,
+            date_from=self.date_from or start_of_today(),
+            date_to=self.date_to)
 
     def to_filters_enriched(self, profile):
         """Passe 2b : fallback sur le profil pour les champs vides."""
         city = self.city or (profile.search_city if profile else "") or (profile.city if profile else "")
         genres = self.genres or (profile.preferred_genres if profile else [])
         budget = self.budget_max or (profile.budget_max if profile else 0)
+        date_from, date_to = self.date_from, self.date_to
+        if not date_to and profile:
+            date_from, date_to = resolve_date_window(profile.search_dates)
         return Filters(
             city=city,
             max_distance_km=DEFAULT_RADIUS_KM if city else 0,
             genres=list(genres),
-            budget_max=budget)
+            budget_max=budget,
+            date_from=date_from or start_of_today(),
+            date_to=date_to)
+
+
+# Built at import so that the first query doesn't pay for it
+_matcher_for(CITY_COORDS)
+_matcher_for(GENRE_KEYWORDS)
 
 
 def diagnose_missing(intent):
@@ -143,3 +157,43 @@ def diagnose_missing(intent):
     if not missing:
         return ""
     return "Tu n'as pas precise " + " ni ".join(missing)
+
+
+def _reformulate(query, api_key):
+    """GPT rewrite of the query in event-description style; the raw query on failure."""
+    system_msg = (
+        "Reformule cette recherche d'evenements en mots-cles riches, "
+        "dans le style d'une description d'evenement culturel. "
+        "Extrais : type, style/ambiance, thematiques, ville, periode. "
+        "Transforme les negations en positifs (\"pas classique\" -> \"contemporain, moderne\"). "
+        "Reponds UNIQUEMENT la reformulation. Max 50 mots."
+    )
+    messages = [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": query},
+    ]
+
+    log.debug("GPT reformulation request",
+              extra={"json_data": {"model": REFORMULATION_MODEL, "messages": messages,
+                                   "temperature": 0.3, "max_tokens": 100}})
+
+    try:
+        client = OpenAI(api_key=api_key)
+        response = client.chat.completions.create(
+            model=REFORMULATION_MODEL,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=100,
+        )
+        semantic_query = response.choices[0].message.content.strip()
+
+        log.debug("GPT reformulation response",
+                  extra={"json_data": {
+                      "semantic_query": semantic_query,
+                      "usage": {"prompt_tokens": response.usage.prompt_tokens,
+                                "completion_tokens": response.usage.completion_tokens,
+                                "total_tokens": response.usage.total_tokens}}})
+    except Exception as e:
+        log.error("GPT reformulation echouee : %s — fallback sur requete brute", e)
+        return query
+    return semantic_query
@@ -1,43 +1,99 @@
 import logging
 from rag.vector_store import VectorStore
-from rag.filters import apply_filters, evaluate_results, MAX_EVENTS
+from rag.filters import apply_filters, evaluate_results, matching_dates, MAX_EVENTS
+from rag.lexical_index import reciprocal_rank_fusion
 from rag.query_intent import QueryIntent, GENRE_KEYWORDS
-from geo.distance import CITY_COORDS
+from rag.reformulation_cache import ReformulationCache
+from geo.distance import CITY_COORDS, compute_distance
 
 log = logging.getLogger("culturai.rag_engine")
 
+FUSION_DEPTH = 100  # candidates taken from each ranking before fusion
+
 
 class RagEngine:
-    def __init__(self, vector_store: VectorStore, llm_client, api_key):
+    def __init__(self, vector_store: VectorStore, llm_client, api_key, reformulation_cache=None,
+                 filter_backend=None, lexical_index=None):
+        """filter_backend: optional SqlFilterBackend; by default filters run on the store's columns.
+        lexical_index: optional LexicalIndex over the store's rows, fused with FAISS ranking."""
         self.vector_store = vector_store
         self.llm_client = llm_client
         self.api_key = api_key
+        self.reformulation_cache = reformulation_cache or ReformulationCache()
+        self.filter_backend = filter_backend
+        self.lexical_index = lexical_index
+        if lexical_index is not None and lexical_index.n_rows != vector_store.event_map.n_rows:
+            log.warning("Index lexical desynchronise (%d lignes, store %d) -> recherche FAISS seule",
+                        lexical_index.n_rows, vector_store.event_map.n_rows)
+            self.lexical_index = None
 
     def search(self, intent, filters):
-        """Filter-then-rank: apply hard filters, then FAISS semantic ranking."""
+        """Filter-then-rank: apply hard filters, then FAISS semantic ranking,
+        fused with BM25 over the same candidates when a lexical index is set."""
         search_text = intent.semantic_query or intent.raw_query
         log.info("=== search() ===")
         log.info("Texte FAISS : %s", search_text)
         log.info("Filtres : %s", filters.describe())
 
-        if filters.is_empty:
-            log.info("Pas de filtres → recherche FAISS standard")
-            ranked = self.vector_store.query(search_text, top_k=MAX_EVENTS)
-            return ranked, {}
+        depth = MAX_EVENTS if self.lexical_index is None else FUSION_DEPTH
 
-        eligible_indices, distances_km = apply_filters(self.vector_store.event_map, filters)
+        # Always filtered: QueryIntent.to_filters applies at least the "not past" date floor
+        if self.filter_backend is not None:
+            eligible_indices, _ = self.filter_backend.apply(self.vector_store, filters)
+        else:
+            eligible_indices, _ = apply_filters(self.vector_store.filter_engine, filters)
 
-        if not eligible_indices:
+        if len(eligible_indices) == 0:
             log.info("Aucun evenement eligible apres filtrage")
-            return [], distances_km
-
-        ranked = self.vector_store.query_filtered(search_text, eligible_indices, top_k=MAX_EVENTS)
-        return ranked, distances_km
-
-    def generate_response(self, user_query, profile=None):
+            return [], {}
+
+        rows, l2_distances = self.vector_store.query_filtered_rows(search_text, eligible_indices, top_k=depth)
+        ranked = self._fuse(intent, rows.tolist(), l2_distances.tolist(), eligible_indices)
+        ranked = [(matching_dates(event, filters), d) for event, d in ranked]
+        return ranked, self._distances(ranked, filters)
+
+    def _fuse(self, intent, vector_rows, l2_distances, eligible_indices):
+        """(event, distance) list from the FAISS ranking (store rows, best first),
+        fused by reciprocal rank with BM25 on the raw query (where artist and
+        venue names are spelled as typed) when a lexical index is set. Events
+        found only by BM25 carry a NaN distance. Only the returned rows are decoded."""
+        event_map = self.vector_store.event_map
+        if self.lexical_index is None:
+            return [(event_map[row], d) for row, d in zip(vector_rows, l2_distances)]
+        lexical_rows, _ = self.lexical_index.search(intent.raw_query, rows=eligible_indices,
+                                                    top_k=FUSION_DEPTH)
+        fused = reciprocal_rank_fusion([vector_rows, lexical_rows.tolist()])
+
+        distances = dict(zip(vector_rows, l2_distances))
+        results = [(event_map[row], distances.get(row, float("nan")))
+                   for row in fused if row in event_map][:MAX_EVENTS]
+        log.info("Fusion RRF : %d FAISS + %d BM25 -> %d resultats (%d par BM25 seul)",
+                 len(vector_rows), len(lexical_rows), len(results),
+                 sum(1 for row in fused[:len(results)] if row not in distances))
+        return results
+
+    @staticmethod
+    def _distances(ranked, filters):
+        """{event id: km} for the events handed to the LLM."""
+        if not filters.city or filters.max_distance_km <= 0:
+            return {}
+        distances_km = {}
+        for event, _ in ranked:
+            d = compute_distance(filters.city, event)
+            if d is not None:
+                distances_km[event.id] = d
+        return distances_km
+
+    def _suggest(self, stream):
+        """stream: the LLM text comes back as a lazy iterator of chunks (no call
+        is made until it is iterated) instead of a string."""
+        return self.llm_client.stream_suggestion if stream else self.llm_client.generate_suggestion
+
+    def generate_response(self, user_query, profile=None, stream=False):
         """Pass 1: query-only. Returns (response, is_good, intent)."""
         log.info("========== PASSE 1 : query-only ==========")
-        intent = QueryIntent.extract(user_query, CITY_COORDS, GENRE_KEYWORDS, self.api_key)
+        intent = QueryIntent.extract(user_query, CITY_COORDS, GENRE_KEYWORDS, self.api_key,
+                                     cache=self.reformulation_cache)
 
         filters = intent.to_filters()
         log.info("Filtres passe 1 : %s (profil NON utilise)", filters.describe())
@@ -52,11 +108,11 @@ class RagEngine:
             return None, False, intent
 
         log.info("Appel LLM pour generation de recommandations...")
-        response = self.llm_client.generate_suggestion(
+        response = self._suggest(stream)(
             user_query, ranked_events, profile=profile, distances=distances_km)
         return response, is_good, intent
 
-    def generate_enriched_response(self, user_query, profile, original_intent):
+    def generate_enriched_response(self, user_query, profile, original_intent, stream=False):
         """Pass 2b: enrich intent with profile as fallback."""
         log.info("========== PASSE 2b : enrichissement profil ==========")
 
@@ -70,16 +126,17 @@ class RagEngine:
             return None
 
         log.info("Appel LLM pour generation de recommandations (enrichi)...")
-        return self.llm_client.generate_suggestion(
+        return self._suggest(stream)(
             user_query, ranked_events, profile=profile, distances=distances_km)
 
-    def generate_refined_response(self, original_query, refinement, profile=None):
+    def generate_refined_response(self, original_query, refinement, profile=None, stream=False):
         """Pass 2a: user refined their search."""
         combined_query = f"{original_query}. {refinement}"
         log.info("========== PASSE 2a : precision utilisateur ==========")
         log.info("Requete combinee : %s", combined_query)
 
-        intent = QueryIntent.extract(combined_query, CITY_COORDS, GENRE_KEYWORDS, self.api_key)
+        intent = QueryIntent.extract(combined_query, CITY_COORDS, GENRE_KEYWORDS, self.api_key,
+                                     cache=self.reformulation_cache)
 
         filters = intent.to_filters_enriched(profile) if profile else intent.to_filters()
         log.info("Filtres passe 2a : %s", filters.describe())
@@ -91,5 +148,5 @@ class RagEngine:
             return None
 
         log.info("Appel LLM pour generation de recommandations (affine)...")
-        return self.llm_client.generate_suggestion(
+        return self._suggest(stream)(
             combined_query, ranked_events, profile=profile, distances=distances_km)
@@ -0,0 +1,139 @@
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+import logging
+
+log = logging.getLogger("culturai.reformulation_cache")
+
+
+class ReformulationCache:
+    """Persistent cache of GPT query reformulations (SQLite, TTL + LRU eviction).
+
+    Keys are normalised queries (case, accents, punctuation spacing and
+    whitespace folded) plus the model name, so near-identical queries
+    share one entry and skip the network call.
+    """
+
+    DEFAULT_PATH = "db/cache.db"
+    DEFAULT_TTL = 7 * 24 * 3600
+    DEFAULT_MAX_ENTRIES = 10_000
+    FLUSH_EVERY = 32  # lookups buffered before their bookkeeping is written
+
+    CREATE_TABLE = """
+        CREATE TABLE IF NOT EXISTS reformulations (
+            key TEXT PRIMARY KEY,
+            reformulation TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL,
+            hits INTEGER DEFAULT 0
+        )
+    """
+    CREATE_STATS = """
+        CREATE TABLE IF NOT EXISTS reformulation_stats (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    """
+
+    def __init__(self, db_path=DEFAULT_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(self.CREATE_TABLE)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_reformulations_last_used ON reformulations(last_used)")
+        self.conn.execute(self.CREATE_STATS)
+        self.conn.commit()
+        # Counters for this process; totals across runs are in reformulation_stats
+        self.hits = 0
+        self.misses = 0
+        # Not yet written: key -> (last_used, hits) of the entries hit, and counter increments
+        self._pending_hits = {}
+        self._pending_counts = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def normalize(query):
+        text = unicodedata.normalize("NFKD", query.casefold())
+        text = "".join(c for c in text if not unicodedata.combining(c))
+        text = re.sub(r"[^\w€]+", " ", text)
+        return " ".join(text.split())
+
+    def _key(self, query, model):
+        return f"{model}\n{self.normalize(query)}"
+
+    def get(self, query, model):
+        """Cached reformulation or None. A lookup only reads: its bookkeeping
+        (last_used, hit counts) is written in batches, see flush()."""
+        key = self._key(query, model)
+        now = time.time()
+        row = self.conn.execute(
+            "SELECT reformulation, created_at FROM reformulations WHERE key = ?", (key,)).fetchone()
+
+        # An expired entry is left to be replaced by put() or evicted
+        hit = bool(row) and now - row[1] <= self.ttl
+        if hit:
+            _, hits = self._pending_hits.get(key, (now, 0))
+            self._pending_hits[key] = (now, hits + 1)
+            self.hits += 1
+        else:
+            self.misses += 1
+        self._pending_counts["hits" if hit else "misses"] += 1
+        if sum(self._pending_counts.values()) >= self.FLUSH_EVERY:
+            self.flush()
+        return row[0] if hit else None
+
+    def put(self, query, model, reformulation):
+        now = time.time()
+        # Recency of the entries hit so far counts for the eviction below
+        self._write_pending()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO reformulations (key, reformulation, created_at, last_used, hits) "
+            "VALUES (?, ?, ?, ?, 0)", (self._key(query, model), reformulation, now, now))
+        # LRU eviction beyond max_entries
+        self.conn.execute(
+            "DELETE FROM reformulations WHERE key IN ("
+            "SELECT key FROM reformulations ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,))
+        self.conn.commit()
+
+    def _write_pending(self):
+        self.conn.executemany(
+            "UPDATE reformulations SET last_used = ?, hits = hits + ? WHERE key = ?",
+            [(last_used, hits, key) for key, (last_used, hits) in self._pending_hits.items()])
+        self.conn.executemany(
+            "INSERT INTO reformulation_stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            [(name, n) for name, n in self._pending_counts.items() if n])
+        self._pending_hits.clear()
+        self._pending_counts = {"hits": 0, "misses": 0}
+
+    def flush(self):
+        """Write the buffered lookup bookkeeping in one transaction (also done
+        every FLUSH_EVERY lookups, and by put(), stats() and close())."""
+        self._write_pending()
+        self.conn.commit()
+
+    def stats(self):
+        """Hit/miss counters for this session and across all sessions."""
+        self.flush()
+        totals = dict(self.conn.execute("SELECT name, value FROM reformulation_stats").fetchall())
+        total_hits, total_misses = totals.get("hits", 0), totals.get("misses", 0)
+        size = self.conn.execute("SELECT COUNT(*) FROM reformulations").fetchone()[0]
+        return {
+            "hits": self.hits, "misses": self.misses,
+            "hit_rate": _rate(self.hits, self.misses),
+            "total_hits": total_hits, "total_misses": total_misses,
+            "total_hit_rate": _rate(total_hits, total_misses),
+            "size": size,
+        }
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def _rate(hits, misses):
+    return round(hits / (hits + misses), 3) if hits + misses else 0.0
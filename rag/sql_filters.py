@@ -0,0 +1,95 @@
+import logging
+import numpy as np
+from geo.distance import get_city_coords, haversine_array
+from geo.spatial import angular_extent, lon_ranges
+from rag.filters import _match_genre
+
+log = logging.getLogger("culturai.sql_filters")
+
+
+class SqlFilterBackend:
+    """Hard filters pushed down to SQLite (alternative to rag.filters.apply_filters).
+
+    Filters become one query over the indexed columns of EventDatabase; the
+    distance filter goes through the events_geo R*Tree (bounding box), and
+    only the located candidates it returns get the exact haversine check.
+    Same semantics as apply_filters: events without date, coordinates or
+    price pass the corresponding filter, and since the database holds one
+    row per date, a grouped show passes through any of its dates.
+    """
+
+    def __init__(self, db):
+        self.readers = db.readers()
+
+    def genres_matching(self, filter_genres):
+        """Distinct genres in the database matched by the filter (same rule as apply_filters)."""
+        rows = self.readers.query("SELECT DISTINCT genre FROM events WHERE genre != ''")
+        return [g for (g,) in rows if _match_genre(g, filter_genres)]
+
+    def query(self, filters):
+        """(sql, params) selecting id, latitude, longitude of the eligible events
+        (before the exact distance check)."""
+        clauses = ["e.stale = 0"]
+        params = []
+
+        if filters.date_from or filters.date_to:
+            # Started in the window, or earlier and still running (known end)
+            window = "(e.timestamp >= ? OR e.end_timestamp >= ?)"
+            params += [max(filters.date_from, 1)] * 2
+            if filters.date_to:
+                window += " AND e.timestamp <= ?"
+                params.append(filters.date_to)
+            clauses.append(f"(e.timestamp = 0 OR ({window}))")
+
+        origin = get_city_coords(filters.city) if filters.max_distance_km > 0 else None
+        if origin:
+            # Half a km of slack, as the distance filter compares rounded km
+            dlat, dlon = angular_extent(origin[0], filters.max_distance_km + 0.5)
+            ranges = lon_ranges(origin[1], dlon)
+            boxes = " OR ".join(["(g.max_lon >= ? AND g.min_lon <= ?)"] * len(ranges))
+            clauses.append(
+                "(e.latitude = 0 OR e.longitude = 0 OR e.rowid IN ("
+                f"SELECT g.id FROM events_geo g WHERE g.max_lat >= ? AND g.min_lat <= ? AND ({boxes})))")
+            params += [origin[0] - dlat, origin[0] + dlat]
+            params += [bound for lon_range in ranges for bound in lon_range]
+
+        if filters.genres:
+            genres = self.genres_matching(filters.genres)
+            clauses.append(f"e.genre IN ({','.join('?' * len(genres))})" if genres else "0")
+            params += genres
+
+        if filters.budget_max > 0:
+            clauses.append("(e.price = 0 OR e.price <= ?)")
+            params.append(filters.budget_max)
+
+        sql = "SELECT e.id, e.latitude, e.longitude FROM events e WHERE " + " AND ".join(clauses)
+        return sql, params
+
+    def apply(self, store, filters):
+        """Same contract as apply_filters: (eligible rows of store, distances_km aligned, NaN when
+        not computable), rows sorted."""
+        log.info("--- Application des filtres (SQL) ---")
+        log.info("Filtres : %s", filters.describe())
+
+        sql, params = self.query(filters)
+        rows = self.readers.query(sql, params)
+        ids = [r[0] for r in rows]
+        lats = np.array([r[1] or 0 for r in rows], dtype=np.float64)
+        lons = np.array([r[2] or 0 for r in rows], dtype=np.float64)
+
+        distances = np.full(len(ids), np.nan)
+        origin = get_city_coords(filters.city) if filters.max_distance_km > 0 else None
+        keep = np.ones(len(ids), dtype=bool)
+        if origin and ids:
+            located = (lats != 0) & (lons != 0)
+            d = np.rint(haversine_array(origin[0], origin[1], lats[located], lons[located]))
+            distances[located] = d
+            keep[located] = d <= filters.max_distance_km
+
+        store_rows = store.occurrence_rows
+        # Dates of one show map to the same row: keep one entry per row
+        pairs = sorted(dict((store_rows[i], dist) for i, dist, k in zip(ids, distances.tolist(), keep.tolist())
+                            if k and i in store_rows).items())
+        eligible = np.array([row for row, _ in pairs], dtype=np.int64)
+        log.info("Filtrage SQL termine : %d eligibles (%d candidats SQL)", len(eligible), len(ids))
+        return eligible, np.array([dist for _, dist in pairs], dtype=np.float64)
@@ -5,6 +5,9 @@ import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from data.event import Event
+from data.event_table import EventTable
+from rag.filters import FilterEngine
+from rag.query_embedding_cache import QueryEmbeddingCache
 
 log = logging.getLogger("culturai.vector_store")
 
@@ -12,47 +15,266 @@ log = logging.getLogger("culturai.vector_store")
 class VectorStore:
     DEFAULT_DIR = "db"
     INDEX_FILE = "faiss.index"
-    EVENTS_FILE = "events.json"
+    VECTORS_FILE = "vectors.npy"
+    EVENTS_FILE = "events.bin"
+    LEGACY_EVENTS_FILE = "events.json"
+    META_FILE = "index_meta.json"
 
-    def __init__(self, embedding_model="all-MiniLM-L6-v2", persist_dir=DEFAULT_DIR):
-        self.embedding_model = SentenceTransformer(embedding_model)
+    INDEX_TYPES = ("flat", "ivf", "ivfpq", "hnsw")
+    DEFAULT_NPROBE = 16
+    DEFAULT_EF_SEARCH = 64
+    HNSW_M = 32
+    PQ_M = 48           # sub-quantizers, must divide the embedding dimension
+    PQ_NBITS = 8        # bits per sub-quantizer code: 2**PQ_NBITS centroids each
+    MIN_POINTS_PER_LIST = 39  # FAISS k-means warns below this
+    COMPACT_RATIO = 0.25      # rebuild once this share of rows is tombstoned
+    SELECTOR_RATIO = 0.5      # broader filtered subsets go through the ANN index
+
+    def __init__(self, embedding_model="all-MiniLM-L6-v2", persist_dir=DEFAULT_DIR,
+                 index_type="flat", nlist=0, nprobe=DEFAULT_NPROBE, ef_search=DEFAULT_EF_SEARCH,
+                 query_cache=None):
+        if index_type not in self.INDEX_TYPES:
+            raise ValueError(f"index_type inconnu : {index_type} (attendu : {', '.join(self.INDEX_TYPES)})")
+        self.model_name = embedding_model if isinstance(embedding_model, str) else type(embedding_model).__name__
+        if isinstance(embedding_model, str):
+            embedding_model = SentenceTransformer(embedding_model)
+        self.embedding_model = embedding_model
         self.persist_dir = persist_dir
         self.index = None
-        self.event_map = {}
+        # Rows are stable FAISS ids. event_map holds live rows only; a row
+        # replaced or removed stays in the matrix as a tombstone until compact().
+        # It is columnar: an Event is only built when a row is read.
+        self.event_map = EventTable()
+        self._rows = {}  # event id -> row, built lazily after load()
+        self._filter_engine = None
+        self._occurrence_rows = None
+        # Contiguous copy of the embeddings (row i <-> event_map[i]) used for
+        # filtered ranking, plus their squared norms for the L2 expansion.
+        self.vectors = None
+        self.sq_norms = None
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        # Query vectors, shared by query() and query_filtered()
+        self.query_cache = query_cache if query_cache is not None else QueryEmbeddingCache()
+
+    def init_db(self, train_vectors=None):
+        """Build an empty index of self.index_type, trained on train_vectors if needed.
 
-    def init_db(self):
+        Falls back to a flat index when there are too few vectors to train
+        the requested quantizers: IVF needs MIN_POINTS_PER_LIST points per
+        list, and PQ as many per code centroid (39 * 2**8 = 9984 for 8-bit
+        codes), below which ivfpq is built as IVF-Flat instead.
+        """
         dim = self.embedding_model.get_sentence_embedding_dimension()
-        self.index = faiss.IndexFlatL2(dim)
+        n_train = 0 if train_vectors is None else len(train_vectors)
+        index_type = self.index_type
+
+        if index_type in ("ivf", "ivfpq"):
+            nlist = self.nlist or int(4 * np.sqrt(max(n_train, 1)))
+            nlist = min(nlist, n_train // self.MIN_POINTS_PER_LIST)
+            if nlist < 1:
+                log.warning("Pas assez de vecteurs (%d) pour un index %s -> index flat", n_train, index_type)
+                index_type = "flat"
+            else:
+                self.nlist = nlist
+        if index_type == "ivfpq" and (n_train < self.MIN_POINTS_PER_LIST * 2 ** self.PQ_NBITS or dim % self.PQ_M):
+            log.warning("Pas assez de vecteurs (%d) ou dimension %d incompatible pour PQ -> index IVF-Flat",
+                        n_train, dim)
+            index_type = "ivf"
+
+        if index_type == "ivf":
+            description = f"IVF{self.nlist},Flat"
+        elif index_type == "ivfpq":
+            description = f"IVF{self.nlist},PQ{self.PQ_M}x{self.PQ_NBITS}"
+        elif index_type == "hnsw":
+            # HNSW cannot remove ids: rows are positional and append-only,
+            # tombstones are skipped at query time.
+            description = f"HNSW{self.HNSW_M}"
+        else:
+            description = "IDMap2,Flat"
+
+        log.info("Creation de l'index FAISS : %s (dim=%d)", description, dim)
+        self.index_type = index_type
+        self.index = faiss.index_factory(dim, description)
+        if not self.index.is_trained:
+            self.index.train(np.ascontiguousarray(train_vectors, dtype="float32"))
+        self.set_search_params()
         return self.index
 
-    def add_events(self, events: [Event]):
+    def set_search_params(self, nprobe=None, ef_search=None):
+        """Tune the recall/latency trade-off of the approximate indexes at query time."""
+        if nprobe is not None:
+            self.nprobe = nprobe
+        if ef_search is not None:
+            self.ef_search = ef_search
+        if self.index is None:
+            return
+        if self.index_type in ("ivf", "ivfpq"):
+            faiss.extract_index_ivf(self.index).nprobe = self.nprobe
+        elif self.index_type == "hnsw":
+            faiss.downcast_index(self.index).hnsw.efSearch = self.ef_search
+
+    def _index_add(self, vectors, rows):
+        if self.index_type == "hnsw":
+            assert rows[0] == self.index.ntotal, "HNSW rows must be appended in order"
+            self.index.add(vectors)
+        else:
+            self.index.add_with_ids(vectors, rows)
+
+    def _index_remove(self, rows):
+        if self.index_type != "hnsw" and rows:
+            self.index.remove_ids(np.array(rows, dtype=np.int64))
+
+    def encode(self, texts):
+        return np.ascontiguousarray(self.embedding_model.encode(texts), dtype="float32")
+
+    def _encode_query(self, text):
+        """Query vector (1-D float32), through the query cache."""
+        vec = self.query_cache.get(self.model_name, text)
+        if vec is None:
+            vec = self.encode([text])[0]
+            self.query_cache.put(self.model_name, text, vec)
+        else:
+            log.debug("Vecteur de requete en cache")
+        return vec
+
+    def add_events(self, events: [Event], vectors=None):
+        """Index events. vectors: precomputed embeddings aligned with events (e.g. from EmbeddingCache)."""
+        self.upsert_events(events, vectors)
+
+    def upsert_events(self, events: [Event], vectors=None):
+        """Insert new events and replace existing ones (matched on Event.id)."""
         if not events:
             return
 
+        if vectors is None:
+            vectors = self.encode([e.to_text() for e in events])
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+
+        # Same id twice in one batch: the last occurrence wins
+        last = {e.id: i for i, e in enumerate(events)}
+        if len(last) < len(events):
+            keep = sorted(last.values())
+            events = [events[i] for i in keep]
+            vectors = vectors[keep]
+
         if self.index is None:
-            self.init_db()
+            self.init_db(vectors)
+
+        replaced = self._tombstone(e.id for e in events)
+
+        first_row = 0 if self.vectors is None else len(self.vectors)
+        rows = np.arange(first_row, first_row + len(events), dtype=np.int64)
+        self._index_add(vectors, rows)
+        self._append_vectors(vectors)
+
+        id_rows = self.rows
+        for row, event in zip(rows.tolist(), events):
+            self.event_map[row] = event
+            id_rows[event.id] = row
+        self._filter_engine = None
+        self._occurrence_rows = None
+
+        log.info("Upsert : %d evenements (%d remplaces)", len(events), replaced)
+        self._maybe_compact()
+
+    def remove_events(self, event_ids):
+        """Drop events (cancelled, past...) from the index. Returns how many were found."""
+        removed = self._tombstone(event_ids)
+        log.info("Suppression : %d evenements", removed)
+        self._maybe_compact()
+        return removed
+
+    @property
+    def filter_engine(self):
+        """Columns for rag.filters.apply_filters, rebuilt after any change to the events."""
+        if self._filter_engine is None:
+            self._filter_engine = FilterEngine.from_table(self.event_map)
+        return self._filter_engine
+
+    @property
+    def occurrence_rows(self):
+        """Listing id -> row: a grouped show's row is found from any of its dates."""
+        if self._occurrence_rows is None:
+            mapping = dict(self.rows)
+            for row, occurrences in self.event_map.occurrences():
+                for occurrence in occurrences:
+                    mapping[occurrence.id] = row
+            self._occurrence_rows = mapping
+        return self._occurrence_rows
 
-        texts = [e.to_text() for e in events]
-        vectors = self.embedding_model.encode(texts)
+    @property
+    def rows(self):
+        """event id -> row. Decoding every id is only paid when upserting/removing."""
+        if self._rows is None:
+            self._rows = self.event_map.ids()
+        return self._rows
 
-        self.index.add(np.array(vectors).astype("float32"))
+    def _tombstone(self, event_ids):
+        dead = []
+        for event_id in event_ids:
+            row = self.rows.pop(event_id, None)
+            if row is not None:
+                del self.event_map[row]
+                dead.append(row)
+        if dead:
+            self._filter_engine = None
+            self._occurrence_rows = None
+        self._index_remove(dead)
+        return len(dead)
 
-        for event in events:
-            self.event_map[len(self.event_map)] = event
+    @property
+    def tombstones(self):
+        return (0 if self.vectors is None else len(self.vectors)) - len(self.event_map)
+
+    def _maybe_compact(self):
+        if self.vectors is not None and self.tombstones > self.COMPACT_RATIO * len(self.vectors):
+            self.compact()
+
+    def compact(self):
+        """Rebuild the matrix and the index without tombstoned rows (ids are renumbered)."""
+        live = self.event_map.live_rows()
+        events = [self.event_map[row] for row in live.tolist()]
+        vectors = np.ascontiguousarray(self.vectors[live], dtype="float32")
+        log.info("Compaction : %d lignes supprimees, %d conservees", self.tombstones, len(live))
+
+        self.index = None
+        self.vectors = None
+        self.sq_norms = None
+        self.event_map = EventTable()
+        self._rows = {}
+        if events:
+            self.upsert_events(events, vectors)
+
+    def get(self, event_id):
+        row = self.rows.get(event_id)
+        return None if row is None else self.event_map[row]
+
+    def _append_vectors(self, vectors):
+        norms = np.einsum("ij,ij->i", vectors, vectors)
+        if self.vectors is None:
+            self.vectors, self.sq_norms = vectors, norms
+        else:
+            self.vectors = np.vstack([self.vectors, vectors])
+            self.sq_norms = np.concatenate([self.sq_norms, norms])
 
     def query(self, user_query: str, top_k=50):
         log.info("--- Recherche FAISS ---")
         log.info("Texte de recherche : %s", user_query)
-        log.info("top_k=%d, index_size=%d", top_k, self.count())
+        log.info("top_k=%d, index_size=%d, index=%s", top_k, self.count(), self.index_type)
 
-        query_vec = self.embedding_model.encode([user_query])
-        distances, indices = self.index.search(np.array(query_vec).astype("float32"), top_k)
+        query_vec = self._encode_query(user_query)
+        # Over-fetch so that tombstones still in the index don't shrink the result list
+        k = min(top_k + self.tombstones, self.index.ntotal)
+        distances, indices = self.index.search(query_vec[None, :], k)
 
         results = [
             (self.event_map[i], float(distances[0][rank]))
             for rank, i in enumerate(indices[0])
             if i in self.event_map
-        ]
+        ][:top_k]
 
         log.info("FAISS a retourne %d candidats", len(results))
         if results:
@@ -67,66 +289,150 @@ class VectorStore:
 
     def query_filtered(self, user_query, eligible_indices, top_k=20):
         """FAISS search restricted to a pre-filtered subset of indices."""
+        rows, l2_distances = self.query_filtered_rows(user_query, eligible_indices, top_k)
+        return [(self.event_map[row], dist) for row, dist in zip(rows.tolist(), l2_distances.tolist())]
+
+    def query_filtered_rows(self, user_query, eligible_indices, top_k=20):
+        """query_filtered as (rows, distances), best first: only the rows that
+        end up used need to be decoded."""
         log.info("--- Recherche FAISS filtree ---")
         log.info("Texte de recherche : %s", user_query)
         log.info("Candidats eligibles : %d, top_k=%d", len(eligible_indices), top_k)
 
-        query_vec = self.embedding_model.encode([user_query]).astype("float32")
-        vectors = np.array([self.index.reconstruct(i) for i in eligible_indices], dtype="float32")
-        l2_distances = np.sum((vectors - query_vec) ** 2, axis=1)
-        ranked_order = np.argsort(l2_distances)[:top_k]
-
-        results = [
-            (self.event_map[eligible_indices[rank]], float(l2_distances[rank]))
-            for rank in ranked_order
-        ]
+        query_vec = self._encode_query(user_query)
+        if self.index_type != "flat" and len(eligible_indices) >= self.SELECTOR_RATIO * len(self.event_map):
+            # Most of the catalogue is eligible (e.g. only the "not past" date floor):
+            # the approximate index with an ID selector beats an exact scan
+            rows, l2_distances = self.search_selected(query_vec, eligible_indices, top_k)
+        else:
+            rows, l2_distances = self.rank_subset(query_vec, eligible_indices, top_k)
 
-        log.info("FAISS filtre a retourne %d resultats", len(results))
-        if results:
+        log.info("FAISS filtre a retourne %d resultats", len(rows))
+        if len(rows) and log.isEnabledFor(logging.DEBUG):
+            top = [(self.event_map[row], d) for row, d in zip(rows[:10].tolist(), l2_distances[:10].tolist())]
             log.debug("Top 10 resultats FAISS filtres",
                       extra={"json_data": [
                           {"rank": r + 1, "id": e.id, "name": e.name,
                            "genre": e.genre, "city": e.city,
                            "l2_distance": round(d, 4)}
-                          for r, (e, d) in enumerate(results[:10])]})
+                          for r, (e, d) in enumerate(top)]})
 
-        return results
+        return rows, l2_distances
+
+    def rank_subset(self, query_vec, eligible_indices, top_k):
+        """Exact L2 top-k over a subset of rows. Returns (rows, distances), best first.
+
+        Uses ||v||^2 - 2 v.q + ||q||^2 on the contiguous matrix: one BLAS
+        mat-vec and one argpartition, no per-row Python work.
+        """
+        rows = np.asarray(eligible_indices, dtype=np.int64)
+        if rows.size == 0 or top_k <= 0:
+            return rows[:0], np.empty(0, dtype="float32")
+
+        # Broad subsets: a full mat-vec is cheaper than gathering the rows
+        if rows.size * 4 >= len(self.vectors):
+            dots = (self.vectors @ query_vec)[rows]
+        else:
+            dots = self.vectors[rows] @ query_vec
+        l2_distances = self.sq_norms[rows] - 2 * dots + float(query_vec @ query_vec)
+        np.maximum(l2_distances, 0, out=l2_distances)
+
+        if top_k < rows.size:
+            best = np.argpartition(l2_distances, top_k - 1)[:top_k]
+        else:
+            best = np.arange(rows.size)
+        best = best[np.argsort(l2_distances[best], kind="stable")]
+        return rows[best], l2_distances[best]
+
+    def search_selected(self, query_vec, eligible_indices, top_k):
+        """Approximate top-k through the FAISS index, restricted by an IDSelectorBitmap."""
+        mask = np.zeros(len(self.vectors), dtype=bool)
+        mask[np.asarray(eligible_indices, dtype=np.int64)] = True
+        bitmap = np.packbits(mask, bitorder="little")
+        selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+        if self.index_type == "hnsw":
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+        else:
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+
+        distances, indices = self.index.search(query_vec[None, :], top_k, params=params)
+        found = indices[0] >= 0
+        return indices[0][found], distances[0][found]
 
     def save(self):
         os.makedirs(self.persist_dir, exist_ok=True)
 
-        faiss.write_index(self.index, os.path.join(self.persist_dir, self.INDEX_FILE))
+        # Write-then-rename: vectors.npy may be memory-mapped by this very store
+        self._replace_file(self.INDEX_FILE, lambda path: faiss.write_index(self.index, path))
+        self._replace_file(self.VECTORS_FILE, self._write_vectors)
+
+        meta = {"index_type": self.index_type, "nlist": self.nlist,
+                "nprobe": self.nprobe, "ef_search": self.ef_search}
+        with open(os.path.join(self.persist_dir, self.META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        self._replace_file(self.EVENTS_FILE, self.event_map.save)
 
-        events_data = []
-        for idx in sorted(self.event_map.keys()):
-            e = self.event_map[idx]
-            events_data.append({
-                "id": e.id, "name": e.name, "description": e.description,
-                "date": e.date, "url": e.url, "venue": e.venue,
-                "city": e.city, "genre": e.genre, "price": e.price,
-                "latitude": e.latitude, "longitude": e.longitude,
-            })
+    def _replace_file(self, name, write):
+        path = os.path.join(self.persist_dir, name)
+        tmp_path = f"{path}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
 
-        with open(os.path.join(self.persist_dir, self.EVENTS_FILE), "w", encoding="utf-8") as f:
-            json.dump(events_data, f, ensure_ascii=False, indent=2)
+    def _write_vectors(self, path):
+        with open(path, "wb") as f:
+            np.save(f, self.vectors)
 
     def load(self):
         index_path = os.path.join(self.persist_dir, self.INDEX_FILE)
         events_path = os.path.join(self.persist_dir, self.EVENTS_FILE)
+        legacy_path = os.path.join(self.persist_dir, self.LEGACY_EVENTS_FILE)
 
-        if not os.path.exists(index_path) or not os.path.exists(events_path):
+        if not os.path.exists(index_path):
             return False
+        if not os.path.exists(events_path):
+            if not os.path.exists(legacy_path):
+                return False
+            log.info("Conversion de %s vers %s", self.LEGACY_EVENTS_FILE, self.EVENTS_FILE)
+            self._replace_file(self.EVENTS_FILE, EventTable.from_json(legacy_path).save)
 
         self.index = faiss.read_index(index_path)
 
-        with open(events_path, "r", encoding="utf-8") as f:
-            events_data = json.load(f)
+        meta_path = os.path.join(self.persist_dir, self.META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.index_type = meta.get("index_type", "flat")
+            self.nlist = meta.get("nlist", 0)
+            self.nprobe = meta.get("nprobe", self.nprobe)
+            self.ef_search = meta.get("ef_search", self.ef_search)
+        else:
+            self.index_type = "flat"
+        self.set_search_params()
+
+        self.event_map = EventTable.load(events_path)
+        self._rows = None
+        self._filter_engine = FilterEngine.from_table(self.event_map)
+        self._occurrence_rows = None
+
+        vectors_path = os.path.join(self.persist_dir, self.VECTORS_FILE)
+        if os.path.exists(vectors_path):
+            vectors = np.load(vectors_path, mmap_mode="r")
+        else:
+            # Index saved before vectors.npy existed: recover the matrix once
+            log.info("%s absent, reconstruction depuis l'index FAISS", self.VECTORS_FILE)
+            vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        self.vectors = None
+        self._append_vectors(np.asarray(vectors, dtype="float32"))
 
-        self.event_map = {}
-        for i, ed in enumerate(events_data):
-            self.event_map[i] = Event(**ed)
+        if self.index_type == "flat" and not isinstance(faiss.downcast_index(self.index), faiss.IndexIDMap2):
+            # Positional IndexFlatL2 from older ingests: re-key it by row
+            log.info("Index flat sans IDMap -> reconstruction avec identifiants stables")
+            live = self.event_map.live_rows().astype(np.int64)
+            self.index = faiss.index_factory(self.vectors.shape[1], "IDMap2,Flat")
+            self.index.add_with_ids(np.ascontiguousarray(self.vectors[live]), live)
 
         return True
 
     def count(self):
-        return self.index.ntotal if self.index else 0
+        return len(self.event_map) if self.index else 0
@@ -0,0 +1,89 @@
+"""
+Rapport recall@k vs latence des index FAISS approximatifs (IVF, IVF-PQ, HNSW)
+par rapport a la recherche exacte (flat).
+
+Par defaut sur des vecteurs synthetiques en clusters ; --vectors db/vectors.npy
+pour mesurer sur les vrais embeddings produits par ingest.py.
+
+Usage:
+    python -m tests.ann_recall_bench
+    python -m tests.ann_recall_bench --vectors db/vectors.npy --queries 500
+"""
+import argparse
+import time
+import faiss
+import numpy as np
+from rag.vector_store import VectorStore
+from tests.vector_store_bench import RandomEncoder
+
+CONFIGS = [
+    ("ivf", "nprobe", [1, 4, 16, 64]),
+    ("ivfpq", "nprobe", [4, 16, 64]),
+    ("hnsw", "ef_search", [16, 32, 64, 128]),
+]
+
+
+def clustered_vectors(size, dim, clusters, rng):
+    centers = rng.normal(size=(clusters, dim)).astype("float32")
+    labels = rng.integers(0, clusters, size)
+    return centers[labels] + 0.35 * rng.normal(size=(size, dim)).astype("float32")
+
+
+def build(vectors, index_type):
+    store = VectorStore(embedding_model=RandomEncoder(vectors.shape[1]), index_type=index_type)
+    start = time.perf_counter()
+    store.init_db(vectors)
+    store._index_add(vectors, np.arange(len(vectors), dtype=np.int64))
+    return store, time.perf_counter() - start
+
+
+def search_all(store, queries, top_k):
+    start = time.perf_counter()
+    found = [store.index.search(q[None, :], top_k)[1][0] for q in queries]
+    return np.array(found), (time.perf_counter() - start) / len(queries)
+
+
+def recall(found, truth):
+    k = truth.shape[1]
+    return np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k vs latence des index FAISS")
+    parser.add_argument("--vectors", help="Fichier .npy d'embeddings (defaut : synthetique)")
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)
+    rng = np.random.default_rng(0)
+    if args.vectors:
+        vectors = np.ascontiguousarray(np.load(args.vectors), dtype="float32")
+    else:
+        vectors = clustered_vectors(args.size, args.dim, clusters=max(args.size // 200, 1), rng=rng)
+    picks = rng.choice(len(vectors), args.queries, replace=False)
+    queries = vectors[picks] + 0.1 * rng.normal(size=(args.queries, vectors.shape[1])).astype("float32")
+
+    flat, build_s = build(vectors, "flat")
+    truth, flat_s = search_all(flat, queries, args.top_k)
+
+    print(f"{len(vectors):,} vecteurs dim={vectors.shape[1]}, {args.queries} requetes, "
+          f"recall@{args.top_k}, 1 thread")
+    print(f"{'index':<28} | {'build s':>7} | {'recall':>6} | {'ms/req':>7} | {'vs flat':>7}")
+    print(f"{'flat':<28} | {build_s:>7.1f} | {1.0:>6.3f} | {flat_s * 1000:>7.2f} | {1.0:>6.1f}x")
+
+    for index_type, param, values in CONFIGS:
+        store, build_s = build(vectors, index_type)
+        label = f"{index_type} ({store.nlist} listes)" if index_type != "hnsw" else index_type
+        for value in values:
+            store.set_search_params(**{param: value})
+            found, per_query = search_all(store, queries, args.top_k)
+            name = f"{label} {param}={value}"
+            print(f"{name:<28} | {build_s:>7.1f} | {recall(found, truth):>6.3f} | "
+                  f"{per_query * 1000:>7.2f} | {flat_s / per_query:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
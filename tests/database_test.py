@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from data.database import EventDatabase
+from data.event import Event, parse_event_time
+
+
+def make_events(n, city="Paris"):
+    return [Event(id=f"e{i}", name=f"Concert {i}", description="", date="2030-01-01 20:00:00",
+                  url="", city=city, genre="Rock" if i % 2 else "Jazz") for i in range(n)]
+
+
+class TestEventDatabase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = EventDatabase(os.path.join(self.tmp.name, "events.db"))
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_wal_and_indexes(self):
+        self.assertEqual(self.db.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        plan = self.db.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM events WHERE city = ?", ("Paris",)).fetchall()
+        self.assertIn("idx_events_city", " ".join(str(row) for row in plan))
+
+    def test_upsert_is_atomic_and_iterates(self):
+        self.db.upsert_events(make_events(2500), classification="music")
+        self.assertEqual(sum(1 for _ in self.db.iter_events("music")), 2500)
+
+        broken = make_events(3)
+        broken[2] = Event(id="e2", name=None, description="", date="", url="")
+        with self.assertRaises(Exception):
+            self.db.upsert_events(make_events(5, city="Lyon") + broken)
+        self.assertEqual(self.db.count(), 2500)
+        self.assertFalse(any(e.city == "Lyon" for e in self.db.iter_events()))
+
+    def test_readers_see_committed_data_during_a_write(self):
+        self.db.upsert_events(make_events(10))
+        readers = self.db.readers(size=2)
+        with self.db.transaction():
+            self.db.conn.execute("DELETE FROM events")
+            # A reader on another thread is not blocked and sees the last commit
+            result = []
+            thread = threading.Thread(
+                target=lambda: result.append(readers.query("SELECT COUNT(*) FROM events")[0][0]))
+            thread.start()
+            thread.join(timeout=5)
+            self.assertEqual(result, [10])
+        self.assertEqual(readers.query("SELECT COUNT(*) FROM events")[0][0], 0)
+
+    def test_migration_backfills_timestamps(self):
+        path = os.path.join(self.tmp.name, "legacy.db")
+        legacy = sqlite3.connect(path)
+        legacy.execute("CREATE TABLE events (id TEXT PRIMARY KEY, name TEXT NOT NULL, description TEXT DEFAULT '', "
+                       "date TEXT DEFAULT '', url TEXT DEFAULT '', venue TEXT DEFAULT '', city TEXT DEFAULT '', "
+                       "genre TEXT DEFAULT '', classification TEXT DEFAULT '', fetched_at TEXT NOT NULL)")
+        legacy.executemany("INSERT INTO events (id, name, date, fetched_at) VALUES (?, ?, ?, '2026-01-01')",
+                           [("a", "Dated", "2030-01-01 20:00:00"), ("b", "Undated", ""), ("c", "Bad", "bientot")])
+        legacy.commit()
+        legacy.close()
+
+        db = EventDatabase(path)
+        try:
+            timestamps = {e.id: e.timestamp for e in db.iter_events()}
+        finally:
+            db.close()
+        # Local Paris time, as at ingest
+        self.assertEqual(timestamps, {"a": parse_event_time("2030-01-01 20:00:00"), "b": 0, "c": 0})
+        self.assertEqual(timestamps["a"], 1893524400)
+
+
+if __name__ == "__main__":
+    unittest.main()
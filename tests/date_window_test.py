@@ -0,0 +1,43 @@
+import unittest
+from datetime import datetime
+from data.event import EVENT_TZ, parse_event_time
+from rag.date_window import resolve_date_window
+
+# Mercredi 14 octobre 2026, 15h
+NOW = datetime(2026, 10, 14, 15, 0, tzinfo=EVENT_TZ)
+
+
+def ts(*args):
+    return int(datetime(*args, tzinfo=EVENT_TZ).timestamp())
+
+
+class TestResolveDateWindow(unittest.TestCase):
+    def test_expressions(self):
+        cases = {
+            "concert ce soir": (ts(2026, 10, 14, 18), ts(2026, 10, 15) - 1),
+            "rock demain a Lyon": (ts(2026, 10, 15), ts(2026, 10, 16) - 1),
+            "un truc ce week-end": (ts(2026, 10, 16, 18), ts(2026, 10, 19) - 1),
+            "la semaine prochaine": (ts(2026, 10, 19), ts(2026, 10, 26) - 1),
+            "du 15 au 20 mars": (ts(2027, 3, 15), ts(2027, 3, 21) - 1),
+            "le 3 novembre": (ts(2026, 11, 3), ts(2026, 11, 4) - 1),
+            "en décembre": (ts(2026, 12, 1), ts(2027, 1, 1) - 1),
+            "jazz a Paris": (0, 0),
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(resolve_date_window(text, NOW), expected)
+
+    def test_weekend_seen_from_saturday_starts_today(self):
+        saturday = datetime(2026, 10, 17, 11, 0, tzinfo=EVENT_TZ)
+        self.assertEqual(resolve_date_window("ce weekend", saturday),
+                         (ts(2026, 10, 17), ts(2026, 10, 19) - 1))
+
+    def test_parse_event_time(self):
+        self.assertEqual(parse_event_time("2026-10-16 20:30:00"), ts(2026, 10, 16, 20, 30))
+        self.assertEqual(parse_event_time("2026-10-16"), ts(2026, 10, 16))
+        self.assertEqual(parse_event_time(""), 0)
+        self.assertEqual(parse_event_time("TBA"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from data.database import EventDatabase
+from data.dedup import Deduplicator, normalize
+from data.event import Event
+
+
+def event(event_id, name, date="2026-06-12 20:00:00", venue="", lat=0, lon=0, url=""):
+    return Event(id=event_id, name=name, description="", date=date, url=url,
+                 venue=venue, latitude=lat, longitude=lon)
+
+
+class TestDeduplicator(unittest.TestCase):
+    def setUp(self):
+        self.dedup = Deduplicator()
+        canonical, _ = self.dedup.resolve("ticketmaster", [
+            event("tm1", "Coldplay - Music of the Spheres World Tour", venue="Stade de France",
+                  lat=48.9245, lon=2.3602),
+            event("tm2", "Orelsan", venue="Accor Arena", lat=48.8386, lon=2.3785),
+            event("tm3", "Orelsan", date="2026-06-13 20:00:00", venue="Accor Arena", lat=48.8386, lon=2.3785),
+        ])
+        self.assertEqual([e.id for e in canonical], ["tm1", "tm2", "tm3"])
+
+    def test_cross_source_listing_is_linked(self):
+        canonical, links = self.dedup.resolve("eventbrite", [
+            event("eb1", "COLDPLAY : Music Of The Spheres", date="2026-06-12T20:30:00",
+                  venue="Stade de France - Saint-Denis", lat=48.9240, lon=2.3605, url="https://eb/1"),
+            event("eb2", "Orélsan", date="2026-06-13T20:00:00", venue="Accor Arena"),
+        ])
+        self.assertEqual(canonical, [])
+        self.assertEqual(links, [("eventbrite", "eb1", "tm1", "https://eb/1"), ("eventbrite", "eb2", "tm3", "")])
+        self.assertEqual(self.dedup.duplicates, 2)
+
+    def test_distinct_events_are_kept(self):
+        canonical, _ = self.dedup.resolve("eventbrite", [
+            # Same name, other place
+            event("eb1", "Orelsan", venue="Le Zenith", lat=45.76, lon=4.89),
+            # Same place and day, other show
+            event("eb2", "Atelier poterie", venue="Accor Arena", lat=48.8386, lon=2.3785),
+            # Same show, other day
+            event("eb3", "Orelsan", date="2026-06-20 20:00:00", venue="Accor Arena"),
+        ])
+        self.assertEqual([e.id for e in canonical], ["eventbrite:eb1", "eventbrite:eb2", "eventbrite:eb3"])
+
+    def test_same_source_is_never_merged(self):
+        canonical, _ = self.dedup.resolve("ticketmaster", [
+            event("tm4", "Orelsan", venue="Accor Arena", lat=48.8386, lon=2.3785)])
+        self.assertEqual([e.id for e in canonical], ["tm4"])
+
+    def test_higher_priority_source_takes_over(self):
+        dedup = Deduplicator()
+        dedup.resolve("eventbrite", [event("eb1", "Nuit du jazz", venue="New Morning")])
+        canonical, links = dedup.resolve("ticketmaster", [
+            event("tm9", "La Nuit du Jazz", venue="New Morning", url="https://tm/9")])
+        self.assertEqual([(e.id, e.url) for e in canonical], [("eventbrite:eb1", "https://tm/9")])
+        self.assertEqual(links, [("ticketmaster", "tm9", "eventbrite:eb1", "https://tm/9")])
+        # Eventbrite no longer supplies the fields
+        canonical, _ = dedup.resolve("eventbrite", [event("eb1", "Nuit du jazz", venue="New Morning")])
+        self.assertEqual(canonical, [])
+
+    def test_reloaded_from_database(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = EventDatabase(os.path.join(tmp, "events.db"))
+            first_run = Deduplicator()
+            for source, events in [("ticketmaster", [event("tm1", "Orelsan", venue="Accor Arena")]),
+                                   ("eventbrite", [event("eb1", "Orelsan", venue="Accor Arena")])]:
+                canonical, links = first_run.resolve(source, events)
+                db.upsert_events(canonical)
+                db.link_sources(links)
+
+            dedup = Deduplicator.from_db(db)
+            canonical, links = dedup.resolve("eventbrite", [event("eb1", "Orelsan", venue="Accor Arena")])
+            self.assertEqual(canonical, [])
+            self.assertEqual(links[0][2], "tm1")
+            self.assertEqual([s[0] for s in db.get_sources("tm1")], ["eventbrite", "ticketmaster"])
+            db.close()
+
+    def test_normalize(self):
+        self.assertEqual(normalize("  Théâtre du Châtelet—Paris! "), "theatre du chatelet paris")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from dataclasses import replace
+import numpy as np
+from data.database import EventDatabase
+from data.embedding_cache import EmbeddingCache
+from data.event import Event
+
+EVENTS = [Event(id=f"e{i}", name=f"Concert {i}", description="Rock", date="2030-01-01 20:00:00", url="")
+          for i in range(3)]
+
+
+class RecordingEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), i] for i, t in enumerate(texts)], dtype="float32")
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = EventDatabase(os.path.join(self.tmp.name, "events.db"))
+        self.encode = RecordingEncoder()
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_second_run_reads_vectors_back(self):
+        first = EmbeddingCache(self.db, "model").vectors_for(EVENTS, self.encode)
+        cache = EmbeddingCache(self.db, "model")
+        second = cache.vectors_for(EVENTS, self.encode)
+
+        self.assertEqual(len(self.encode.calls), 1)
+        np.testing.assert_array_equal(first, second)
+        self.assertEqual((cache.hits, cache.misses), (3, 0))
+
+    def test_changed_description_is_embedded_again(self):
+        EmbeddingCache(self.db, "model").vectors_for(EVENTS, self.encode)
+        changed = [EVENTS[0], replace(EVENTS[1], description="Jazz"), EVENTS[2]]
+        cache = EmbeddingCache(self.db, "model")
+        cache.vectors_for(changed, self.encode)
+
+        self.assertEqual(self.encode.calls[1], [changed[1].to_text()])
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        self.assertEqual(cache.cached_ids(changed), {"e0", "e1", "e2"})
+        # Another model invalidates every vector
+        self.assertEqual(EmbeddingCache(self.db, "other").cached_ids(changed), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import tempfile
+import unittest
+from data.event import Event
+from data.event_table import EventTable
+from rag.filters import FilterEngine
+
+
+def event(event_id, price):
+    return Event(id=event_id, name=f"Event {event_id}", description="", date="", url="",
+                 venue="Zenith", city="Paris", genre="Rock", price=price)
+
+
+class TestEventTable(unittest.TestCase):
+    def test_row_appended_then_deleted_after_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "events.bin")
+            EventTable.from_events([event("a", 10), event("b", 20)]).save(path)
+
+            table = EventTable.load(path)
+            table[2] = event("c", 30)
+            del table[2]
+            self.assertEqual(len(table.column("price")), table.n_rows)
+            self.assertEqual(len(table.column("name")), table.n_rows)
+            self.assertEqual(FilterEngine.from_table(table).occ_row.tolist(), [0, 1, 2])
+            self.assertEqual(list(table.occurrences()), [])
+
+            table[3] = event("d", 40)
+            table.save(path)
+            reloaded = EventTable.load(path)
+            self.assertEqual(reloaded.n_rows, 4)
+            self.assertEqual([reloaded[row].id for row in reloaded], ["a", "b", "d"])
+            self.assertEqual(reloaded.column("price").tolist(), [10, 20, 0, 40])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+"""Fixture events and filter cases shared by the filter backend tests
+(rag.filters in filters_test, rag.sql_filters in sql_filters_test)."""
+import random
+from data.event import Event
+from rag.filters import Filters
+
+GENRES = ["Rock", "Jazz", "Hip-Hop/Rap", "Theatre", "Children's Theatre", "Comedy", "", "Pop"]
+
+CASES = [
+    Filters(),
+    Filters(city="paris", max_distance_km=50),
+    Filters(city="lyon", max_distance_km=150, genres=["Rock", "Theatre"]),
+    Filters(genres=["rap"], budget_max=40),
+    Filters(city="marseille", max_distance_km=80, genres=["Comedy"], budget_max=30),
+    Filters(city="ville-inconnue", max_distance_km=50, budget_max=20),
+    Filters(genres=["opera"]),
+    Filters(date_from=1_750_000_000),
+    Filters(city="paris", max_distance_km=300, date_from=1_720_000_000, date_to=1_760_000_000),
+    Filters(genres=["Jazz"], date_to=1_710_000_000),
+]
+
+
+def random_events(n=2000, seed=42):
+    """Events spread over France, some without coordinates, price, date or end."""
+    rng = random.Random(seed)
+    events = []
+    for i in range(n):
+        has_coords = rng.random() > 0.1
+        timestamp = rng.choice([0, rng.randrange(1_700_000_000, 1_800_000_000)])
+        end = rng.choice([0, 0, timestamp + rng.randrange(86_400, 90 * 86_400)]) if timestamp else 0
+        events.append(Event(
+            id=str(i), name=f"Event {i}", description="", date="", url="",
+            genre=rng.choice(GENRES),
+            price=rng.choice([0, 0, 15, 35, 60, 120]),
+            latitude=rng.uniform(42.5, 51) if has_coords else 0,
+            longitude=rng.uniform(-4.5, 8) if has_coords else 0,
+            timestamp=timestamp, end_timestamp=end))
+    return events
@@ -0,0 +1,75 @@
+import unittest
+from data.event import Event
+from data.event_table import EventTable
+from geo.distance import compute_distance
+from rag.date_window import start_of_today
+from rag.filters import Filters, FilterEngine, apply_filters, _match_genre
+from rag.query_intent import QueryIntent
+from tests.filter_cases import CASES, random_events
+
+
+def reference_filter(events, filters):
+    """Per-event filter loop, as rag.filters.apply_filters used to do it."""
+    eligible = []
+    for idx, event in enumerate(events):
+        if (filters.date_from or filters.date_to) and event.timestamp:
+            last = max(event.timestamp, event.end_timestamp)
+            if last < filters.date_from or (filters.date_to and event.timestamp > filters.date_to):
+                continue
+        if filters.city and filters.max_distance_km > 0:
+            d = compute_distance(filters.city, event)
+            if d is not None and d > filters.max_distance_km:
+                continue
+        if filters.genres and not _match_genre(event.genre, filters.genres):
+            continue
+        if filters.budget_max > 0 and event.price and event.price > filters.budget_max:
+            continue
+        eligible.append(idx)
+    return eligible
+
+
+class TestFilterEngine(unittest.TestCase):
+    def setUp(self):
+        self.events = random_events()
+        self.engine = FilterEngine.from_table(EventTable.from_events(self.events))
+
+    def test_same_rows_as_reference(self):
+        for filters in CASES:
+            with self.subTest(filters=filters.describe()):
+                eligible, _ = apply_filters(self.engine, filters)
+                self.assertEqual(eligible.tolist(), reference_filter(self.events, filters))
+
+    def test_distances_aligned_with_eligible(self):
+        filters = Filters(city="paris", max_distance_km=200)
+        eligible, distances = apply_filters(self.engine, filters)
+        for row, d in zip(eligible.tolist(), distances.tolist()):
+            expected = compute_distance("paris", self.events[row])
+            if expected is None:
+                self.assertNotEqual(d, d)  # NaN
+            else:
+                self.assertEqual(d, expected)
+
+    def test_tombstoned_rows_are_skipped(self):
+        table = EventTable.from_events(self.events)
+        del table[0]
+        eligible, _ = apply_filters(FilterEngine.from_table(table), Filters())
+        self.assertNotIn(0, eligible.tolist())
+        self.assertEqual(len(eligible), len(self.events) - 1)
+
+    def test_ongoing_events_pass_the_default_date_floor(self):
+        today, day = start_of_today(), 86_400
+        events = [
+            Event(id="expo", name="Expo", description="", date="", url="",
+                  timestamp=today - day, end_timestamp=today + 7 * day),
+            Event(id="ended", name="Ended", description="", date="", url="",
+                  timestamp=today - 7 * day, end_timestamp=today - day),
+            Event(id="past", name="Past", description="", date="", url="", timestamp=today - day),
+            Event(id="next", name="Next", description="", date="", url="", timestamp=today + day),
+        ]
+        engine = FilterEngine.from_table(EventTable.from_events(events))
+        eligible, _ = apply_filters(engine, QueryIntent(raw_query="expo").to_filters())
+        self.assertEqual([events[row].id for row in eligible.tolist()], ["expo", "next"])
+
+
+if __name__ == "__main__":
+    unittest.main()
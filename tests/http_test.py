@@ -0,0 +1,70 @@
+import gzip
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from client.http import ApiSession
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers 503 `failures` times, then a gzip-encoded body."""
+
+    protocol_version = "HTTP/1.1"
+    failures = 0
+    calls = 0
+    ports = set()
+
+    def do_GET(self):
+        FlakyHandler.calls += 1
+        FlakyHandler.ports.add(self.client_address[1])
+        if FlakyHandler.calls <= FlakyHandler.failures:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = gzip.compress(b'{"ok": true}')
+        self.send_response(200)
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestApiSession(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FlakyHandler.calls = 0
+        FlakyHandler.ports = set()
+
+    def test_retries_transient_errors_on_one_connection(self):
+        FlakyHandler.failures = 2
+        http = ApiSession(backoff_base=0.01)
+        response = http.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"ok": True})
+        self.assertEqual((http.requests, http.retries), (3, 2))
+        self.assertEqual(len(FlakyHandler.ports), 1)  # keep-alive
+        http.close()
+
+    def test_gives_up_after_max_retries(self):
+        FlakyHandler.failures = 10
+        http = ApiSession(max_retries=2, backoff_base=0.01)
+        self.assertEqual(http.get(self.url).status_code, 503)
+        self.assertEqual(FlakyHandler.calls, 3)
+        http.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from geo.distance import CITY_COORDS
+from rag.keyword_matcher import KeywordMatcher
+from rag.query_intent import GENRE_KEYWORDS
+
+
+class TestKeywordMatcher(unittest.TestCase):
+    QUERIES = [
+        "concert rock a paris ce weekend",
+        "comedie musicale a marne la vallee cedex 4",
+        "du foot ou du football a saint-etienne",
+        "theatre ou théâtre a clermont-ferrand, pas plus de 40 euros",
+        "un humoriste sportif a toulouse cedex 5",
+        "trapeze et cirque a toulon",
+        "rien de special",
+    ]
+
+    def test_find_all_matches_substring_scan(self):
+        matcher = KeywordMatcher(GENRE_KEYWORDS)
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                expected = [k for k in GENRE_KEYWORDS if k in query]
+                self.assertEqual(matcher.find_all(query), expected)
+
+    def test_longest_matches_sorted_scan(self):
+        matcher = KeywordMatcher(CITY_COORDS)
+        by_length = sorted(CITY_COORDS, key=len, reverse=True)
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                expected = next((c for c in by_length if c in query), None)
+                self.assertEqual(matcher.longest(query), expected)
+
+    def test_empty_vocabulary(self):
+        self.assertEqual(KeywordMatcher([]).find_all("paris"), [])
+        self.assertIsNone(KeywordMatcher([]).longest("paris"))
+
+
+if __name__ == "__main__":
+    unittest.main()
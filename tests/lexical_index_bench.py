@@ -0,0 +1,93 @@
+"""
+Benchmark de l'index lexical BM25 (rag.lexical_index) : construction sur un catalogue
+synthetique, latence de recherche (p50/p95) sur tout le catalogue et sur un sous-ensemble
+filtre, comparee au budget LexicalIndex.BUDGET_MS.
+
+Usage:
+    python -m tests.lexical_index_bench
+    python -m tests.lexical_index_bench --events 200000 --queries 500 --eligible 0.2
+"""
+import argparse
+import logging
+import random
+import time
+import numpy as np
+from data.event import Event
+from data.event_table import EventTable
+from rag.lexical_index import LexicalIndex, reciprocal_rank_fusion
+
+SYLLABLES = ["ba", "bel", "di", "siz", "or", "el", "san", "ma", "ri", "jo", "lo", "ka", "zi",
+             "ne", "ta", "vo", "mu", "ra", "pe", "lu", "go", "ti", "da", "fe"]
+VENUE_TYPES = ["Zenith", "Olympia", "Theatre", "Salle", "Arena", "Cabaret", "Opera", "Stade"]
+WORDS = ["concert", "soiree", "spectacle", "tournee", "nouvel", "album", "live", "festival",
+         "musique", "scene", "humour", "danse", "famille", "creation", "orchestre", "rap", "jazz"]
+
+
+def word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+
+def catalogue(size, rng):
+    artists = [word(rng) for _ in range(max(size // 20, 10))]
+    venues = [f"{rng.choice(VENUE_TYPES)} {word(rng)}" for _ in range(max(size // 50, 10))]
+    events = []
+    for i in range(size):
+        description = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30)))
+        events.append(Event(id=str(i), name=f"{rng.choice(artists)} - {rng.choice(WORDS)}",
+                            description=description, date="", url="", venue=rng.choice(venues)))
+    return events, artists, venues
+
+
+def percentiles(samples_s):
+    ms = np.array(samples_s) * 1000
+    return np.percentile(ms, 50), np.percentile(ms, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark index lexical BM25")
+    parser.add_argument("--events", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--eligible", type=float, default=0.3, help="part du catalogue apres filtres")
+    args = parser.parse_args()
+    # The per-query log lines would dominate the timings
+    logging.getLogger("culturai.lexical_index").setLevel(logging.WARNING)
+
+    rng = random.Random(0)
+    events, artists, venues = catalogue(args.events, rng)
+    table = EventTable.from_events(events)
+
+    start = time.perf_counter()
+    index = LexicalIndex.build(table)
+    build_s = time.perf_counter() - start
+
+    queries = [f"{rng.choice(artists)} a l'{rng.choice(venues)}" for _ in range(args.queries)]
+    eligible = np.flatnonzero(np.random.default_rng(0).random(args.events) < args.eligible)
+
+    full, subset, fusion = [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        rows, _ = index.search(query)
+        full.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        rows, _ = index.search(query, rows=eligible)
+        subset.append(time.perf_counter() - start)
+
+        vector_rows = rng.sample(eligible.tolist(), min(100, len(eligible)))
+        start = time.perf_counter()
+        reciprocal_rank_fusion([vector_rows, rows.tolist()])
+        fusion.append(time.perf_counter() - start)
+
+    print(f"{args.events:,} evenements, {len(index.vocabulary):,} termes, {len(index.rows):,} postings")
+    print(f"Construction : {build_s * 1000:.0f} ms")
+    for label, samples in (("Catalogue complet", full), (f"Sous-ensemble {len(eligible):,}", subset),
+                           ("Fusion RRF", fusion)):
+        p50, p95 = percentiles(samples)
+        print(f"{label:<24}: p50 {p50:6.2f} ms, p95 {p95:6.2f} ms")
+    p95 = max(percentiles(full)[1], percentiles(subset)[1])
+    verdict = "respecte" if p95 <= LexicalIndex.BUDGET_MS else "DEPASSE"
+    print(f"Budget {LexicalIndex.BUDGET_MS} ms (p95) : {verdict}")
+
+
+if __name__ == "__main__":
+    main()
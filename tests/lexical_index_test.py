@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from data.event import Event
+from data.event_table import EventTable
+from rag.filters import Filters
+from rag.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+from rag.query_intent import QueryIntent
+from rag.rag_engine import RagEngine
+from rag.reformulation_cache import ReformulationCache
+from rag.vector_store import VectorStore
+from tests.vector_store_bench import RandomEncoder
+
+
+def event(event_id, name, venue, description="", genre="Rock", city="Paris"):
+    return Event(id=event_id, name=name, description=description, date="", url="",
+                 venue=venue, city=city, genre=genre)
+
+
+class TestLexicalIndex(unittest.TestCase):
+    def setUp(self):
+        self.events = [
+            event("disiz", "Disiz - L'Amour Tour", "L'Olympia", "Le rappeur en concert", genre="Hip-Hop/Rap"),
+            event("olympia", "Soiree jazz", "Olympia Bruno Coquatrix", "Jazz manouche"),
+            event("zenith", "Orelsan", "Zenith Paris", "Rap francais, avec des invites dont Disiz"),
+            event("opera", "La Traviata", "Opera Bastille", "Opera de Verdi", genre="Opera"),
+        ] + [event(f"filler{i}", f"Concert {i}", f"Salle {i % 7}", "Une soiree de concerts") for i in range(40)]
+        self.table = EventTable.from_events(self.events)
+        self.index = LexicalIndex.build(self.table)
+
+    def ids(self, rows):
+        return [self.events[row].id for row in rows.tolist()]
+
+    def test_tokenize_folds_accents_and_elisions(self):
+        self.assertEqual(tokenize("Disiz à l'Olympia"), ["disiz", "olympia"])
+        self.assertEqual(tokenize("Les Théâtres d’Opéra"), ["theatre", "opera"])
+        self.assertEqual(tokenize("jusqu'aux concerts"), ["concert"])
+
+    def test_name_match_ranks_first(self):
+        rows, scores = self.index.search("Disiz à l'Olympia")
+        # Name field outweighs a mention in another event's description
+        self.assertEqual(self.ids(rows)[:3], ["disiz", "olympia", "zenith"])
+        self.assertTrue((scores[:-1] >= scores[1:]).all())
+        self.assertEqual(len(self.index.search("aucun mot connu")[0]), 0)
+
+    def test_search_within_candidate_rows(self):
+        rows, _ = self.index.search("disiz olympia", rows=[1, 2, 3])
+        self.assertEqual(self.ids(rows), ["olympia", "zenith"])
+        self.assertEqual(len(self.index.search("disiz", rows=[])[0]), 0)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.index.save(tmp)
+            loaded = LexicalIndex.load(tmp)
+            self.assertIsNone(LexicalIndex.load(os.path.join(tmp, "absent")))
+        for query in ("disiz olympia", "opera verdi"):
+            self.assertEqual(loaded.search(query)[0].tolist(), self.index.search(query)[0].tolist())
+
+    def test_reciprocal_rank_fusion(self):
+        self.assertEqual(reciprocal_rank_fusion([[1, 2, 3], [3, 4]]), [3, 1, 2, 4])
+        self.assertEqual(reciprocal_rank_fusion([[5, 6], []]), [5, 6])
+
+    def test_rag_engine_fuses_rankings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = VectorStore(RandomEncoder(8), persist_dir=tmp)
+            store.add_events(self.events)
+            engine = RagEngine(store, None, api_key="test", lexical_index=self.index,
+                               reformulation_cache=ReformulationCache(os.path.join(tmp, "cache.db")))
+            intent = QueryIntent(semantic_query="concert de rap", raw_query="Disiz à l'Olympia")
+
+            ranked, _ = engine.search(intent, Filters())
+            # Random vectors: the exact-name match still makes the top ranks through BM25
+            self.assertIn("disiz", [e.id for e, _ in ranked[:3]])
+
+            ranked, _ = engine.search(intent, Filters(genres=["Rock"]))
+            self.assertNotIn("disiz", [e.id for e, _ in ranked])
+            self.assertEqual(ranked[0][0].id, "olympia")
+            engine.reformulation_cache.conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
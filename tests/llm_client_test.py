@@ -0,0 +1,84 @@
+import unittest
+from types import SimpleNamespace
+import httpx
+from openai import APIConnectionError
+from data.event import Event
+from llm.llm_client import LLMClient
+from llm.prompt_budget import TokenCounter, compact_descriptions
+
+EVENTS = [(Event(id="1", name="Disiz", description="Rap", date="2026-06-12 20:00:00", url="https://tm/1",
+                 venue="L'Olympia", city="Paris", genre="Hip-Hop/Rap"), 0.5)]
+USAGE = SimpleNamespace(prompt_tokens=100, completion_tokens=3, total_tokens=103)
+
+
+def chunk(text=None, usage=None):
+    choices = [] if text is None else [SimpleNamespace(delta=SimpleNamespace(content=text))]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class StubCompletions:
+    def __init__(self, stream_error=None):
+        self.stream_error = stream_error
+        self.calls = []
+
+    def create(self, stream=False, **kwargs):
+        self.calls.append(stream)
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=" Salut ! "))],
+                                   usage=USAGE)
+        if self.stream_error:
+            raise self.stream_error
+        return iter([chunk("Sal"), chunk(""), chunk("ut !"), chunk(usage=USAGE)])
+
+
+class TestStreaming(unittest.TestCase):
+    def client(self, completions):
+        client = LLMClient(api_key="test")
+        client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        return client
+
+    def test_chunks_are_yielded_as_they_arrive(self):
+        completions = StubCompletions()
+        stream = self.client(completions).stream_suggestion("rap", EVENTS)
+        self.assertEqual(completions.calls, [])  # nothing is sent until iterated
+        self.assertEqual(list(stream), ["Sal", "ut !"])
+        self.assertEqual(completions.calls, [True])
+
+    def test_falls_back_to_blocking_call(self):
+        error = APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))
+        completions = StubCompletions(stream_error=error)
+        client = self.client(completions)
+        self.assertEqual(list(client.stream_suggestion("rap", EVENTS)), ["Salut !"])
+        self.assertEqual(completions.calls, [True, False])
+        self.assertEqual(client.generate_suggestion("rap", EVENTS), "Salut !")
+
+
+class TestPromptBudget(unittest.TestCase):
+    def setUp(self):
+        boilerplate = "Billets en vente sur notre site. " * 30
+        self.ranked = [(Event(id=str(i), name=f"Concert {i}", description=boilerplate if i % 2 else f"Soiree {i}",
+                              date=f"2026-06-{10 + i} 20:00:00", url=f"https://tm/{i}", venue="Zenith",
+                              city="Paris", genre="Rock", price=30 + i), 0.1 * i) for i in range(20)]
+
+    def test_events_are_packed_in_rank_order(self):
+        client = LLMClient(api_key="test", prompt_budget=600)
+        prompt = client._build_prompt("rock", self.ranked)
+        lines = [line for line in prompt.splitlines() if line[:1].isdigit() and ". " in line]
+        self.assertGreater(len(lines), 1)
+        self.assertLess(len(lines), 20)
+        self.assertTrue(lines[0].startswith("1. Concert 0 | Rock | Zenith, Paris | 2026-06-10 20:00 | 30 EUR"))
+        self.assertLessEqual(client.count_tokens(prompt), 600)
+        self.assertIn(f"\n{len(lines)} evenements correspondent", prompt)
+        # A huge budget keeps everything
+        self.assertIn("20. Concert 19", LLMClient(api_key="test", prompt_budget=10**6)._build_prompt("rock", self.ranked))
+
+    def test_descriptions_are_shortened_and_deduplicated(self):
+        descriptions = compact_descriptions([e for e, _ in self.ranked])
+        self.assertEqual(descriptions[0], "Soiree 0")
+        self.assertTrue(descriptions[1].endswith("...") and len(descriptions[1]) <= 203)
+        self.assertEqual(descriptions[3], "")
+        self.assertGreater(TokenCounter("gpt-3.5-turbo")("un deux trois"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
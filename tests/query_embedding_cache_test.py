@@ -0,0 +1,35 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from rag.query_embedding_cache import QueryEmbeddingCache
+
+
+class TestQueryEmbeddingCache(unittest.TestCase):
+    def test_lru_bound(self):
+        cache = QueryEmbeddingCache(max_entries=2)
+        cache.put("m", "a", np.ones(4))
+        cache.put("m", "b", np.zeros(4))
+        cache.get("m", "a")
+        cache.put("m", "c", np.zeros(4))
+        self.assertIsNone(cache.get("m", "b"))
+        self.assertIsNotNone(cache.get("m", "a"))
+        self.assertIsNone(cache.get("other", "a"))
+        self.assertEqual(len(cache), 2)
+
+    def test_spill_survives_a_new_instance(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.db")
+            cache = QueryEmbeddingCache(spill_path=path)
+            cache.put("m", "concert rock", np.arange(4))
+            cache.close()
+
+            cache = QueryEmbeddingCache(spill_path=path)
+            vec = cache.get("m", "concert rock")
+            np.testing.assert_array_equal(vec, np.arange(4, dtype=np.float32))
+            self.assertEqual(cache.stats()["disk_hits"], 1)
+            cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Microbenchmark de la detection ville/genre de QueryIntent : boucle de sous-chaines
+(ancienne implementation) vs KeywordMatcher, sur un vocabulaire de ~35k communes
+synthetiques en plus des villes de geo.distance.
+
+Usage:
+    python -m tests.query_intent_bench
+    python -m tests.query_intent_bench --communes 35000 --queries 2000
+"""
+import argparse
+import random
+import time
+from geo.distance import CITY_COORDS
+from rag.keyword_matcher import KeywordMatcher
+from rag.query_intent import GENRE_KEYWORDS
+
+SYLLABLES = ["ba", "bel", "bo", "ca", "cha", "cour", "da", "fon", "gar", "gre", "la", "lan",
+             "ma", "mar", "mon", "mou", "na", "pe", "pon", "ri", "roc", "sa", "ser", "ta",
+             "tour", "va", "vil", "ve", "lle", "ne", "sac", "nac", "ville", "court", "gny"]
+PREFIXES = ["", "", "", "saint-", "sainte-", "le ", "la ", "les ", "villeneuve-"]
+SUFFIXES = ["", "", "", "-sur-mer", "-les-bains", "-en-provence", "-sur-loire", "-le-chateau"]
+QUERY_TEMPLATES = [
+    "concert rock a {} ce weekend",
+    "une piece de theatre pas trop chere vers {}",
+    "jazz ou blues a {} moins de 30 euros",
+    "je cherche un truc sympa a faire ce soir",
+    "spectacle pour enfant pres de {} en famille",
+]
+
+
+def commune_vocabulary(size, rng):
+    names = dict(CITY_COORDS)
+    while len(names) < size:
+        root = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        names[rng.choice(PREFIXES) + root + rng.choice(SUFFIXES)] = (0.0, 0.0)
+    return names
+
+
+def legacy_detect(query_lower, city_coords, genre_keywords):
+    city = ""
+    for city_key in sorted(city_coords.keys(), key=len, reverse=True):
+        if city_key in query_lower:
+            city = city_key
+            break
+    genres = []
+    for keyword, genre in genre_keywords.items():
+        if keyword in query_lower and genre not in genres:
+            genres.append(genre)
+    return city, genres
+
+
+def matcher_detect(query_lower, city_matcher, genre_matcher, genre_keywords):
+    city = city_matcher.longest(query_lower) or ""
+    genres = []
+    for keyword in genre_matcher.find_all(query_lower):
+        if genre_keywords[keyword] not in genres:
+            genres.append(genre_keywords[keyword])
+    return city, genres
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detection ville/genre")
+    parser.add_argument("--communes", type=int, default=35_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = commune_vocabulary(args.communes, rng)
+    names = list(vocabulary)
+    queries = [rng.choice(QUERY_TEMPLATES).format(rng.choice(names)) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    city_matcher = KeywordMatcher(vocabulary)
+    genre_matcher = KeywordMatcher(GENRE_KEYWORDS)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy = [legacy_detect(q, vocabulary, GENRE_KEYWORDS) for q in queries]
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = [matcher_detect(q, city_matcher, genre_matcher, GENRE_KEYWORDS) for q in queries]
+    matcher_s = time.perf_counter() - start
+
+    print(f"{len(vocabulary):,} villes, {len(GENRE_KEYWORDS)} mots-cles genre, {len(queries)} requetes")
+    print(f"Compilation (une fois, a l'import) : {build_s * 1000:.0f} ms")
+    print(f"Boucle de sous-chaines : {legacy_s / len(queries) * 1e6:>9.1f} us/requete")
+    print(f"KeywordMatcher         : {matcher_s / len(queries) * 1e6:>9.1f} us/requete "
+          f"({legacy_s / matcher_s:.0f}x)")
+    print(f"Resultats identiques : {legacy == compiled}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+from rag.reformulation_cache import ReformulationCache
+
+
+class TestReformulationCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_near_identical_queries_share_an_entry(self):
+        cache = ReformulationCache(self.path)
+        cache.put("Concert rock Paris ce week-end", "m", "concert rock paris")
+        self.assertEqual(cache.get("  concert ROCK paris   ce week end ", "m"), "concert rock paris")
+        self.assertEqual(cache.get("Théâtre à Lyon", "m"), None)
+        self.assertIsNone(cache.get("concert rock paris ce week-end", "other-model"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+        cache.close()
+
+        # Persists across instances
+        cache = ReformulationCache(self.path)
+        self.assertEqual(cache.get("concert rock paris ce week-end", "m"), "concert rock paris")
+        self.assertEqual(cache.stats()["total_hits"], 2)
+        cache.close()
+
+    def test_ttl_and_lru_eviction(self):
+        cache = ReformulationCache(self.path, ttl=100, max_entries=2)
+        with mock.patch("rag.reformulation_cache.time.time", return_value=1000.0):
+            cache.put("a", "m", "A")
+        with mock.patch("rag.reformulation_cache.time.time", return_value=1001.0):
+            cache.put("b", "m", "B")
+        with mock.patch("rag.reformulation_cache.time.time", return_value=1002.0):
+            self.assertEqual(cache.get("a", "m"), "A")  # "b" becomes least recently used
+            cache.put("c", "m", "C")
+            self.assertIsNone(cache.get("b", "m"))
+        with mock.patch("rag.reformulation_cache.time.time", return_value=1101.0):
+            self.assertIsNone(cache.get("a", "m"))      # expired
+            self.assertEqual(cache.get("c", "m"), "C")
+        cache.close()
+
+    def test_hits_are_written_in_batches(self):
+        cache = ReformulationCache(self.path)
+        cache.put("a", "m", "A")
+        other = sqlite3.connect(self.path)
+        hits = "SELECT hits FROM reformulations"
+        try:
+            for _ in range(ReformulationCache.FLUSH_EVERY - 1):
+                self.assertEqual(cache.get("a", "m"), "A")
+            self.assertFalse(cache.conn.in_transaction)
+            self.assertEqual(other.execute(hits).fetchone()[0], 0)
+            cache.get("a", "m")
+            self.assertEqual(other.execute(hits).fetchone()[0], ReformulationCache.FLUSH_EVERY)
+        finally:
+            other.close()
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
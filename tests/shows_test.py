@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+from data.event import Event
+from data.event_table import EventTable
+from data.shows import group_shows
+from llm.llm_client import LLMClient
+from rag.filters import Filters, FilterEngine, apply_filters, matching_dates
+
+
+def listing(event_id, name, date, price=0, venue="Theatre Mogador"):
+    return Event(id=event_id, name=name, description="", date=date, url=f"https://tm/{event_id}",
+                 venue=venue, city="Paris", genre="Theatre", price=price, latitude=48.8756, longitude=2.3317)
+
+
+class TestShows(unittest.TestCase):
+    def setUp(self):
+        self.listings = [
+            listing("m3", "Le Roi Lion", "2026-06-14 20:00:00", price=45),
+            listing("m1", "Le Roi Lion", "2026-06-12 20:00:00", price=120),
+            listing("solo", "Concert unique", "2026-06-13 21:00:00", price=30),
+            listing("m2", "LE ROI LION", "2026-06-13 15:00:00", price=0),
+            listing("other", "Le Roi Lion", "2026-06-12 20:00:00", venue="Zenith de Lille"),
+        ]
+        self.shows = group_shows(self.listings)
+
+    def test_dates_of_a_show_are_grouped(self):
+        self.assertEqual([e.id for e in self.shows], ["m1", "solo", "other"])
+        show = self.shows[0]
+        self.assertEqual([o.id for o in show.occurrences], ["m1", "m2", "m3"])
+        self.assertEqual(self.shows[1].occurrences, ())
+        # A listing already indexed (or cached) stays the representative
+        self.assertEqual(group_shows(self.listings, prefer=({"m3"},))[0].id, "m3")
+
+    def test_filters_apply_per_occurrence(self):
+        engine = FilterEngine.from_table(EventTable.from_events(self.shows))
+
+        def rows(**kwargs):
+            return apply_filters(engine, Filters(**kwargs))[0].tolist()
+
+        june_12 = dict(date_from=self.listings[1].timestamp - 3600, date_to=self.listings[1].timestamp + 3600)
+        june_14 = dict(date_from=self.listings[0].timestamp - 3600, date_to=self.listings[0].timestamp + 3600)
+        self.assertEqual(rows(**june_12), [0, 2])
+        self.assertEqual(rows(**june_14), [0])
+        # Within budget on some date, but not on the date asked for
+        self.assertEqual(rows(budget_max=50, **june_12), [2])
+        self.assertEqual(rows(budget_max=50, **june_14), [0])
+        self.assertEqual(rows(budget_max=40), [0, 1, 2])
+
+    def test_occurrences_survive_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "events.bin")
+            EventTable.from_events(self.shows).save(path)
+            table = EventTable.load(path)
+            self.assertEqual([table[row] for row in table], self.shows)
+            self.assertEqual([row for row, _ in table.occurrences()], [0])
+
+    def test_prompt_lists_dates_once(self):
+        entry = LLMClient(api_key="test")._format_event(self.shows[0])
+        self.assertIn("Dates (3 representations) : 2026-06-12 20:00:00, 2026-06-13 15:00:00, "
+                      "2026-06-14 20:00:00", entry)
+        self.assertIn("Prix : a partir de 45 EUR", entry)
+        self.assertEqual(entry.count("Titre"), 1)
+
+    def test_prompt_lists_only_dates_that_passed_the_filters(self):
+        client = LLMClient(api_key="test")
+        show = matching_dates(self.shows[0], Filters(budget_max=50))
+        entry = client._format_event(show)
+        self.assertIn("Dates (2 representations) : 2026-06-13 15:00:00, 2026-06-14 20:00:00", entry)
+        self.assertIn("Prix : a partir de 45 EUR", entry)
+
+        june_12 = self.listings[1].timestamp
+        show = matching_dates(self.shows[0], Filters(date_from=june_12 - 3600, date_to=june_12 + 3600))
+        line = client._compact_event(1, show, "")
+        self.assertIn("| 2026-06-12 20:00 | 120 EUR |", line)
+        self.assertNotIn("2026-06-14", line)
+        self.assertIs(matching_dates(self.shows[0], Filters()), self.shows[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
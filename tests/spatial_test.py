@@ -0,0 +1,33 @@
+import unittest
+import numpy as np
+from geo.distance import haversine
+from geo.spatial import GridIndex
+
+
+class TestGridIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.lats = rng.uniform(-80, 80, 5000)
+        self.lons = rng.uniform(-180, 180, 5000)
+        self.index = GridIndex(self.lats, self.lons, rows=np.arange(5000) + 100)
+
+    def brute_force(self, lat, lon, km):
+        return sorted(i + 100 for i in range(len(self.lats))
+                      if haversine(lat, lon, self.lats[i], self.lons[i]) <= km)
+
+    def test_matches_brute_force(self):
+        for lat, lon, km in [(48.8566, 2.3522, 50), (43.3, 5.37, 500), (-33.9, 151.2, 1200),
+                             (10, 179.9, 800), (78, -20, 2000), (0, 0, 0)]:
+            with self.subTest(lat=lat, lon=lon, km=km):
+                rows, distances = self.index.within_radius(lat, lon, km)
+                self.assertEqual(sorted(rows.tolist()), self.brute_force(lat, lon, km))
+                self.assertTrue(np.all(distances <= km))
+
+    def test_empty_index(self):
+        rows, distances = GridIndex([], []).within_radius(48.8, 2.3, 50)
+        self.assertEqual(len(rows), 0)
+        self.assertEqual(len(distances), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
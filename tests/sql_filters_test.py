@@ -0,0 +1,48 @@
+import os
+import random
+import tempfile
+import unittest
+from data.database import EventDatabase
+from data.event import Event
+from rag.filters import Filters, apply_filters
+from rag.sql_filters import SqlFilterBackend
+from rag.vector_store import VectorStore
+from tests.filter_cases import CASES, random_events
+from tests.vector_store_bench import RandomEncoder
+
+
+class TestSqlFilterBackend(unittest.TestCase):
+    def setUp(self):
+        events = random_events(1500, seed=7)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = EventDatabase(os.path.join(self.tmp.name, "events.db"))
+        self.db.upsert_events(events)
+        self.store = VectorStore(RandomEncoder(8), persist_dir=self.tmp.name)
+        # Shuffled so that store rows differ from database order
+        random.Random(7).shuffle(events)
+        self.store.add_events(events)
+        self.backend = SqlFilterBackend(self.db)
+
+    def tearDown(self):
+        self.backend.readers.close()
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_same_rows_and_distances_as_apply_filters(self):
+        for filters in CASES:
+            with self.subTest(filters=filters.describe()):
+                expected, expected_d = apply_filters(self.store.filter_engine, filters)
+                eligible, distances = self.backend.apply(self.store, filters)
+                self.assertEqual(eligible.tolist(), expected.tolist())
+                self.assertEqual([d if d == d else None for d in distances.tolist()],
+                                 [d if d == d else None for d in expected_d.tolist()])
+
+    def test_geo_index_follows_updates(self):
+        self.db.upsert_events([Event(id="0", name="Moved", description="", date="", url="",
+                                     latitude=48.8566, longitude=2.3522)])
+        sql, params = self.backend.query(Filters(city="paris", max_distance_km=5))
+        self.assertIn("0", [r[0] for r in self.backend.readers.query(sql, params)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,364 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from types import SimpleNamespace
+from client.eventbrite_client import EventbriteClient
+from client.rate_limiter import TokenBucket
+from client.ticketmaster_client import TicketmasterClient
+import numpy as np
+from data.database import EventDatabase
+from data.event import Event
+from data.embedding_cache import EmbeddingCache, BackgroundEmbedder
+from data.raw_archive import RawArchive, iter_records
+import ingest
+
+LATENCY = 0.05
+PAGE_SIZE = 2
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Discovery API stub over an in-memory catalogue.
+
+    Honours genreId, startDateTime/endDateTime, onsaleStartDateTime (only
+    events flagged "new" match), size/page and page.totalElements. Every
+    request costs LATENCY; the first request of genre g0 gets a 429.
+    """
+
+    catalogue = {}      # genre -> [(event id, start datetime, new)]
+    throttled = set()
+    dropped = set()     # event ids no longer listed
+    requests = []
+    active = 0
+    peak = 0            # most requests in flight at once
+    lock = threading.Lock()
+
+    def do_GET(self):
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        genre, page, size = params.get("genreId", ""), int(params["page"]), int(params["size"])
+        with self.lock:
+            StubHandler.active += 1
+            StubHandler.peak = max(StubHandler.peak, StubHandler.active)
+        time.sleep(LATENCY)
+        with self.lock:
+            StubHandler.active -= 1
+
+        with self.lock:
+            StubHandler.requests.append(params)
+            first = genre == "g0" and genre not in self.throttled
+            self.throttled.add(genre)
+        if first:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        start = _parse(params.get("startDateTime"))
+        end = _parse(params.get("endDateTime"))
+        delta = "onsaleStartDateTime" in params
+        matches = [(event_id, dt) for event_id, dt, new in self.catalogue.get(genre, [])
+                   if event_id not in self.dropped and (new or not delta)
+                   and (start is None or dt >= start) and (end is None or dt <= end)]
+        events = [{"id": event_id, "name": f"Event {event_id}",
+                   "dates": {"start": {"localDate": dt.strftime("%Y-%m-%d")}}}
+                  for event_id, dt in matches[page * size:(page + 1) * size]]
+        body = json.dumps({"_embedded": {"events": events} if events else None,
+                           "page": {"totalPages": -(-len(matches) // size),
+                                    "totalElements": len(matches)}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    # All fetch threads connect at once: the default backlog (5) drops SYNs
+    request_queue_size = 64
+
+
+def _parse(value):
+    return datetime.strptime(value, TIME_FORMAT).replace(tzinfo=timezone.utc) if value else None
+
+
+class RecordingDb(EventDatabase):
+    """EventDatabase in a temporary directory that records each upsert."""
+
+    def __init__(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        super().__init__(os.path.join(self.tmp.name, "events.db"))
+        self.upserts = []
+
+    def upsert_events(self, events, classification="", fetched_at=None):
+        self.upserts.append((classification, [e.id for e in events]))
+        super().upsert_events(events, classification, fetched_at)
+
+    def close(self):
+        super().close()
+        self.tmp.cleanup()
+
+
+class TestFetchAll(unittest.TestCase):
+    QUERIES = [("music", f"g{i}", {"genre_id": f"g{i}", "page_size": PAGE_SIZE}) for i in range(8)]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StubServer(("127.0.0.1", 0), StubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}/"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        soon = datetime.now(timezone.utc) + timedelta(days=3)
+        # 6 events per genre: 3 pages, within MAX_PAGE
+        StubHandler.catalogue = {f"g{i}": [(f"g{i}-{j}", soon + timedelta(days=j), False) for j in range(6)]
+                                 for i in range(8)}
+        StubHandler.throttled = set()
+        StubHandler.dropped = set()
+        StubHandler.requests = []
+
+    def client(self, max_page=TicketmasterClient.MAX_PAGE):
+        client = TicketmasterClient("key", base_url=self.base_url, rate_limiter=TokenBucket(500))
+        client.MAX_PAGE = max_page
+        return client
+
+    def run_fetch(self, workers):
+        StubHandler.throttled = set()
+        StubHandler.peak = 0
+        db = RecordingDb()
+        total = ingest.fetch_all(db, workers=workers, client=self.client(), queries=self.QUERIES)
+        upserted = sorted((cls, event_id) for cls, ids in db.upserts for event_id in ids)
+        db.close()
+        return total, upserted, StubHandler.peak
+
+    def test_concurrent_fetch_overlaps_requests_with_same_upserts(self):
+        total_seq, upserts_seq, peak_seq = self.run_fetch(workers=1)
+        total_par, upserts_par, peak_par = self.run_fetch(workers=8)
+
+        self.assertEqual(total_seq, 8 * 6)
+        self.assertEqual(total_par, total_seq)
+        self.assertEqual(upserts_par, upserts_seq)
+        # Requests in flight at the stub, not wall-clock time: stable on a loaded machine
+        self.assertEqual(peak_seq, 1)
+        self.assertGreater(peak_par, 1)
+
+    def test_large_query_is_split_by_date_range(self):
+        now = datetime.now(timezone.utc)
+        # 66 events, clustered: reachable per query is 2 pages of 2 = 4
+        events = [(f"big-{j}", now + timedelta(days=1 + j // 10, hours=j % 10), False) for j in range(50)]
+        events += [(f"far-{j}", now + timedelta(days=900 + j), False) for j in range(10)]
+        # Already under way (e.g. exhibitions): before any split window
+        events += [(f"running-{j}", now - timedelta(days=2 + j), False) for j in range(6)]
+        StubHandler.catalogue = {"big": events}
+        db = RecordingDb()
+        client = self.client(max_page=1)
+        ingest.fetch_all(db, client=client, queries=[("music", "big", {"genre_id": "big", "page_size": 2})])
+
+        fetched = {event_id for _, ids in db.upserts for event_id in ids}
+        db.close()
+        self.assertEqual(fetched, {event_id for event_id, _, _ in events})
+        self.assertTrue(all(int(r["page"]) <= client.MAX_PAGE for r in StubHandler.requests))
+
+    def test_incremental_sync_and_stale_reconciliation(self):
+        StubHandler.throttled = {"g0"}
+        client = self.client()
+        with tempfile.TemporaryDirectory() as tmp:
+            db = EventDatabase(os.path.join(tmp, "events.db"))
+            ingest.fetch_all(db, client=client, queries=self.QUERIES)
+            self.assertEqual(len(db.get_all_events()), 8 * 6)
+            key = ingest.query_key(self.QUERIES[3][2])
+            self.assertIsNotNone(db.get_last_sync(key))
+
+            # Incremental: only events put on sale since the last sync
+            StubHandler.catalogue["g3"].append(("g3-new", datetime.now(timezone.utc) + timedelta(days=1), True))
+            StubHandler.requests = []
+            ingest.fetch_all(db, client=client, queries=self.QUERIES, incremental=True)
+            self.assertEqual(len(StubHandler.requests), len(self.QUERIES))
+            self.assertTrue(all("onsaleStartDateTime" in r for r in StubHandler.requests))
+            self.assertIn("g3-new", {e.id for e in db.get_all_events()})
+
+            # Full run: events no longer listed become stale
+            StubHandler.dropped = {"g1-0", "g2-5"}
+            ingest.fetch_all(db, client=client, queries=self.QUERIES)
+            ids = {e.id for e in db.get_all_events()}
+            self.assertNotIn("g1-0", ids)
+            self.assertIn("g1-1", ids)
+            self.assertIn("g3-new", ids)
+            self.assertEqual(db.count_stale(), 2)
+
+            # Incremental runs in a row: the last one is forced to a full, reconciling run
+            StubHandler.dropped.add("g4-0")
+            for _ in range(ingest.MAX_INCREMENTAL_RUNS):
+                ingest.fetch_all(db, client=client, queries=self.QUERIES, incremental=True)
+            self.assertEqual(db.count_stale(), 2)
+            StubHandler.requests = []
+            ingest.fetch_all(db, client=client, queries=self.QUERIES, incremental=True)
+            self.assertFalse(any("onsaleStartDateTime" in r for r in StubHandler.requests))
+            self.assertEqual(db.count_stale(), 3)
+            db.close()
+
+    def test_resume_after_interruption(self):
+        class CrashingDb(RecordingDb):
+            def upsert_events(self, events, classification="", fetched_at=None):
+                if len(self.upserts) == 3 and not self.crashed:
+                    self.crashed = True
+                    raise KeyboardInterrupt
+                super().upsert_events(events, classification, fetched_at)
+
+        db = CrashingDb()
+        db.crashed = False
+        with self.assertRaises(KeyboardInterrupt):
+            ingest.fetch_all(db, workers=1, client=self.client(), queries=self.QUERIES)
+        self.assertTrue(db.get_checkpoints())
+
+        StubHandler.requests = []
+        ingest.fetch_all(db, workers=1, client=self.client(), queries=self.QUERIES, resume=True)
+        self.assertEqual({e.id for e in db.get_all_events()},
+                         {event_id for events in StubHandler.catalogue.values() for event_id, _, _ in events})
+        # Only what was not persisted is fetched again (a full run is 8 queries x 3 pages)
+        self.assertLess(len(StubHandler.requests), 8 * 3)
+        self.assertEqual(db.get_checkpoints(), [])
+        db.close()
+
+    def test_pages_stream_into_background_embedder(self):
+        batches = []
+
+        def encode(texts):
+            batches.append(len(texts))
+            return np.ones((len(texts), 4), dtype="float32")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            db = EventDatabase(os.path.join(tmp, "events.db"))
+            cache = EmbeddingCache(db, "model")
+            embedder = BackgroundEmbedder(cache, encode, batch_size=5)
+            ingest.fetch_all(db, client=self.client(), queries=self.QUERIES, embedder=embedder)
+            embedder.close()
+
+            self.assertEqual(db.count_embeddings(), 8 * 6)
+            self.assertTrue(all(n <= 5 for n in batches))
+            cache.vectors_for(db.get_all_events(), encode)
+            self.assertEqual(sum(batches), 8 * 6)  # nothing encoded twice
+            db.close()
+
+    def test_archive_and_offline_replay(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = EventDatabase(os.path.join(tmp, "events.db"))
+            archive = RawArchive(os.path.join(tmp, "raw", "run.jsonl.gz"))
+            ingest.fetch_all(db, client=self.client(), queries=self.QUERIES, archive=archive)
+            archive.close()
+            records = list(iter_records(os.path.join(tmp, "raw")))
+            self.assertEqual(len(records), archive.pages)
+            self.assertEqual({(r["label"], r["page"]) for r in records if r["label"] == "g1"},
+                             {("g1", 0), ("g1", 1), ("g1", 2)})
+
+            StubHandler.requests = []
+            replayed = EventDatabase(os.path.join(tmp, "replayed.db"))
+            self.assertEqual(ingest.replay(replayed, os.path.join(tmp, "raw")), 8 * 6)
+            self.assertEqual(StubHandler.requests, [])
+            self.assertEqual(sorted(replayed.get_all_events(), key=lambda e: e.id),
+                             sorted(db.get_all_events(), key=lambda e: e.id))
+            self.assertEqual(replayed.stats()["classifications"], db.stats()["classifications"])
+            # Rows carry the archived fetch time, not the replay time
+            self.assertEqual(replayed.get_events_fetched_since(records[-1]["fetched_at"] + "~"), [])
+            replayed.close()
+
+            # A listing dropped since the archive stays stale after replaying it
+            StubHandler.dropped = {"g1-0"}
+            ingest.fetch_all(db, client=self.client(), queries=self.QUERIES)
+            self.assertEqual(db.count_stale(), 1)
+            ingest.replay(db, os.path.join(tmp, "raw"))
+            self.assertEqual(db.count_stale(), 1)
+            self.assertNotIn("g1-0", {e.id for e in db.get_all_events()})
+            db.close()
+
+    def test_extra_source_is_deduplicated(self):
+        soon = StubHandler.catalogue["g2"][0][1]
+
+        class ListingSource:
+            name = "eventbrite"
+
+            def iter_pages(self, stop):
+                # The same show as g2-0, plus one Ticketmaster does not list
+                yield "music", [Event(id="eb1", name="EVENT G2-0", description="", url="https://eb/1",
+                                      date=soon.strftime("%Y-%m-%dT20:00:00")),
+                                Event(id="eb2", name="Atelier", description="", url="https://eb/2",
+                                      date=soon.strftime("%Y-%m-%dT10:00:00"))]
+                return True
+
+        with tempfile.TemporaryDirectory() as tmp:
+            db = EventDatabase(os.path.join(tmp, "events.db"))
+            ingest.fetch_all(db, client=self.client(), queries=self.QUERIES, sources=[ListingSource()])
+            ids = {e.id for e in db.get_all_events()}
+            self.assertEqual(len(ids), 8 * 6 + 1)
+            self.assertIn("eventbrite:eb2", ids)
+            # One canonical event (id of whichever listing came first) with both listings
+            owners = {(source, source_id): event_id for source, source_id, event_id in db.iter_source_links()}
+            self.assertEqual(owners[("eventbrite", "eb1")], owners[("ticketmaster", "g2-0")])
+            self.assertEqual(db.get_sources(owners[("eventbrite", "eb1")]),
+                             [("eventbrite", "eb1", "https://eb/1"), ("ticketmaster", "g2-0", "")])
+
+            # Ticketmaster-only run: Eventbrite listings are not reconciled
+            StubHandler.dropped = {"g2-0"}
+            ingest.fetch_all(db, client=self.client(), queries=self.QUERIES)
+            self.assertEqual(db.count_stale(), 0)
+            db.close()
+
+    def test_eventbrite_reconciled_only_when_read_in_full(self):
+        class SearchPages:
+            """Eventbrite search stub: one event per page."""
+            ids = ["eb1", "eb2", "eb3"]
+
+            def get(self, url, params):
+                page = params["page"]
+                events = [{"id": event_id, "name": {"text": f"Atelier {event_id}"}, "url": f"https://eb/{event_id}",
+                           "start": {"local": "2030-01-01T10:00:00"}} for event_id in self.ids[page - 1:page]]
+                data = {"events": events, "pagination": {"has_more_items": page < len(self.ids)}}
+                return SimpleNamespace(status_code=200, json=lambda: data)
+
+        eventbrite = EventbriteClient("token")
+        eventbrite.http = SearchPages()
+        queries = [("miscellaneous", "atelier", "France")]
+
+        def run(db, max_pages):
+            source = ingest.EventbriteSource(eventbrite, queries, max_pages=max_pages)
+            ingest.fetch_all(db, client=self.client(), queries=self.QUERIES, sources=[source])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            db = EventDatabase(os.path.join(tmp, "events.db"))
+            run(db, max_pages=None)
+            self.assertEqual(len(db.get_all_events()), 8 * 6 + 3)
+
+            # Search cut at max_pages: the listing gone from page 2 is not reconciled
+            SearchPages.ids = ["eb1", "eb3", "eb4"]
+            run(db, max_pages=2)
+            self.assertEqual(db.count_stale(), 0)
+
+            # Read to its end: it is
+            run(db, max_pages=None)
+            self.assertEqual(db.count_stale(), 1)
+            self.assertNotIn("eventbrite:eb2", {e.id for e in db.get_all_events()})
+            db.close()
+
+    def test_token_bucket_rate(self):
+        bucket = TokenBucket(50, capacity=1)
+        start = time.perf_counter()
+        for _ in range(11):
+            bucket.acquire()
+        self.assertGreaterEqual(time.perf_counter() - start, 0.18)
+
+
+if __name__ == "__main__":
+    unittest.main()
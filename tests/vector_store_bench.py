@@ -0,0 +1,86 @@
+"""
+Benchmark du classement FAISS filtre : reconstruct() ligne par ligne (ancienne
+implementation) vs matrice contigue (VectorStore.rank_subset).
+
+Usage:
+    python -m tests.vector_store_bench
+    python -m tests.vector_store_bench --sizes 10000 100000 --eligible 0.3
+"""
+import argparse
+import time
+import faiss
+import numpy as np
+from rag.vector_store import VectorStore
+
+
+class RandomEncoder:
+    """Stand-in for SentenceTransformer: only the dimension is needed here."""
+
+    def __init__(self, dim):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts):
+        return np.random.default_rng(len(texts)).random((len(texts), self.dim), dtype="float32")
+
+
+def legacy_query_filtered(index, query_vec, eligible_indices, top_k):
+    vectors = np.array([index.reconstruct(i) for i in eligible_indices], dtype="float32")
+    l2_distances = np.sum((vectors - query_vec) ** 2, axis=1)
+    ranked_order = np.argsort(l2_distances)[:top_k]
+    return [eligible_indices[r] for r in ranked_order]
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(size, dim, eligible_ratio, top_k, repeat):
+    rng = np.random.default_rng(0)
+    store = VectorStore(embedding_model=RandomEncoder(dim))
+    store.init_db()
+    vectors = rng.random((size, dim), dtype="float32")
+    store._index_add(vectors, np.arange(size, dtype=np.int64))
+    store._append_vectors(vectors)
+
+    eligible = np.flatnonzero(rng.random(size) < eligible_ratio)
+    eligible_list = eligible.tolist()
+    query_vec = rng.random(dim, dtype="float32")
+
+    legacy_s, legacy_rows = timed(
+        lambda: legacy_query_filtered(store.index, query_vec, eligible_list, top_k), repeat)
+    new_s, (new_rows, _) = timed(
+        lambda: store.rank_subset(query_vec, eligible, top_k), repeat)
+
+    same = legacy_rows == new_rows.tolist()
+    print(f"{size:>9,} | {len(eligible):>9,} | {legacy_s * 1000:>10.1f} | "
+          f"{new_s * 1000:>8.1f} | {legacy_s / new_s:>6.1f}x | {'ok' if same else 'DIFF'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark query_filtered")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--eligible", type=float, default=0.3,
+                        help="Fraction d'evenements qui passent les filtres")
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)
+    print(f"dim={args.dim}, eligible={args.eligible:.0%}, top_k={args.top_k}, best of {args.repeat}")
+    print(f"{'vecteurs':>9} | {'eligibles':>9} | {'legacy ms':>10} | {'new ms':>8} | {'gain':>7} | top-k")
+    for size in args.sizes:
+        run(size, args.dim, args.eligible, args.top_k, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
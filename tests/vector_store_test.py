@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+import unittest
+from dataclasses import asdict
+import numpy as np
+from data.event import Event
+from rag.vector_store import VectorStore
+from tests.vector_store_bench import RandomEncoder
+
+DIM = 8
+
+
+def event(event_id, name=None):
+    return Event(id=event_id, name=name or f"Event {event_id}", description="", date="", url="")
+
+
+class TestVectorStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def store(self, index_type="flat"):
+        return VectorStore(RandomEncoder(DIM), persist_dir=self.tmp.name, index_type=index_type)
+
+    def vectors(self, n):
+        return self.rng.random((n, DIM), dtype="float32")
+
+    def test_upsert_replaces_an_event(self):
+        store = self.store()
+        vectors = self.vectors(4)
+        store.add_events([event(i) for i in "abc"], vectors[:3])
+        store.upsert_events([event("a", "Renamed")], vectors[3:])
+
+        self.assertEqual(store.count(), 3)
+        self.assertEqual(store.tombstones, 1)
+        self.assertEqual(store.get("a").name, "Renamed")
+        self.assertEqual(store.index.ntotal, 3)
+        rows, _ = store.rank_subset(vectors[3], store.event_map.live_rows(), top_k=1)
+        self.assertEqual(store.event_map[int(rows[0])].id, "a")
+
+    def test_removed_event_is_hidden_from_selector_search(self):
+        store = self.store("ivf")
+        vectors = self.vectors(2000)
+        store.add_events([event(str(i)) for i in range(2000)], vectors)
+        self.assertEqual(store.index_type, "ivf")
+        row = store.rows["42"]
+        store.remove_events(["42"])
+
+        self.assertIsNone(store.get("42"))
+        # Even with its row selected, the removed id is no longer in the index
+        rows, _ = store.search_selected(vectors[42], np.arange(2000), top_k=5)
+        self.assertNotIn(row, rows.tolist())
+        self.assertEqual(len(rows), 5)
+
+    def test_compaction_keeps_ids_and_vectors(self):
+        store = self.store()
+        vectors = self.vectors(6)
+        ids = list("abcdef")
+        store.add_events([event(i) for i in ids], vectors)
+        store.remove_events(["b", "d"])  # 1/3 tombstoned: over COMPACT_RATIO
+
+        self.assertEqual(store.tombstones, 0)
+        self.assertEqual(len(store.vectors), 4)
+        for event_id in "acef":
+            row = store.rows[event_id]
+            self.assertEqual(store.event_map[row].id, event_id)
+            np.testing.assert_array_equal(store.vectors[row], vectors[ids.index(event_id)])
+        self.assertEqual(sorted(store.rows), list("acef"))
+
+    def test_save_load_keeps_tombstones_and_converts_legacy_events(self):
+        store = self.store()
+        events = [event(str(i)) for i in range(8)]
+        store.add_events(events, self.vectors(8))
+        store.remove_events(["3"])
+        store.save()
+
+        loaded = self.store()
+        self.assertTrue(loaded.load())
+        self.assertEqual((loaded.count(), loaded.tombstones), (7, 1))
+        self.assertIsNone(loaded.get("3"))
+        self.assertEqual(loaded.rows, store.rows)
+
+        # Former events.json: one entry per row, null for a tombstone
+        os.remove(os.path.join(self.tmp.name, VectorStore.EVENTS_FILE))
+        legacy = [None if e.id == "3" else {k: v for k, v in asdict(e).items() if k != "occurrences"}
+                  for e in events]
+        with open(os.path.join(self.tmp.name, VectorStore.LEGACY_EVENTS_FILE), "w", encoding="utf-8") as f:
+            json.dump(legacy, f)
+        converted = self.store()
+        self.assertTrue(converted.load())
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, VectorStore.EVENTS_FILE)))
+        self.assertEqual(converted.rows, store.rows)
+        self.assertEqual(converted.get("5"), events[5])
+
+    def test_ivfpq_falls_back_to_ivf_below_pq_training_size(self):
+        store = VectorStore(RandomEncoder(VectorStore.PQ_M), persist_dir=self.tmp.name, index_type="ivfpq")
+        store.init_db(self.rng.random((3000, VectorStore.PQ_M), dtype="float32"))
+        self.assertEqual(store.index_type, "ivf")
+        self.assertEqual(store.nlist, 3000 // VectorStore.MIN_POINTS_PER_LIST)
+
+
+if __name__ == "__main__":
+    unittest.main()